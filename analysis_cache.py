@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+import storage
+
+class AnalysisCache:
+    """
+    Persistent, content-addressed cache of final (post-RiskScorer) analyses.
+    Entries are keyed on the normalized contract text plus everything else that
+    changes the model output, and evicted by age and then least-recent use.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None,
+                 max_age_seconds: int = None, max_bytes: int = None):
+        self.path = path or config.CACHE_DB_PATH
+        self.max_entries = max_entries if max_entries is not None else config.CACHE_MAX_ENTRIES
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else config.CACHE_MAX_AGE_SECONDS
+        self.max_bytes = max_bytes if max_bytes is not None else config.CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_accessed ON analyses(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(contract_text: str, contract_type_hint: str, model_name: str, prompt_version: str) -> str:
+        """Hash of every input that determines the analysis."""
+        return storage.content_hash(
+            storage.normalize_text(contract_text),
+            contract_type_hint or "",
+            model_name or "",
+            str(prompt_version),
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached analysis for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if self.max_age_seconds and now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(payload)
+
+    def put(self, key: str, analysis: Dict[str, Any]):
+        """Store a successful analysis. Error results are never cached."""
+        if not analysis or "error" in analysis:
+            return
+        payload = json.dumps(analysis, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def evict(self):
+        """Apply the age and size limits now."""
+        with self._lock:
+            self._evict_locked(time.time())
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        # 1. Age-based expiry
+        if self.max_age_seconds:
+            self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.max_age_seconds,))
+
+        # 2. Entry-count limit, dropping least recently used first
+        if self.max_entries:
+            self._conn.execute("""
+                DELETE FROM analyses WHERE key IN (
+                    SELECT key FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+        # 3. Total payload size limit, also LRU
+        if self.max_bytes:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM analyses ORDER BY accessed_at ASC").fetchall()
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+            ).fetchone()
+        return {"entries": count, "bytes": total}
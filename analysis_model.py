@@ -0,0 +1,321 @@
+"""
+Typed, compact analysis results.
+
+The model's JSON answer is validated and coerced into ContractAnalysis /
+Clause objects (__slots__ classes, so no per-instance dict): ids become
+strings, risk levels one of Low/Medium/High, scores ints in 0-10, and list
+fields real lists of strings. to_dict() gives back the plain dict the rest of
+the app works with.
+
+For storage, dumps() encodes an analysis positionally (no repeated key names)
+with msgpack when it is installed, JSON otherwise; loads() reads either, and
+also the plain JSON dicts stored before. to_arrow() / clauses_frame() turn
+many analyses into columnar tables for fast aggregation and Parquet export.
+"""
+import json
+import re
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError: # Optional: falls back to compact JSON
+    msgpack = None
+
+RISK_LEVELS = ("Low", "Medium", "High")
+DEFAULT_RISK_LEVEL = "Medium" # What the dashboard assumes for a clause without a level
+
+_HIGH_WORDS = re.compile(r'high|critical|severe|major')
+_MEDIUM_WORDS = re.compile(r'med|moderate')
+_LOW_WORDS = re.compile(r'low|minor|minimal|none|negligible')
+
+def _array(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": items}
+
+# The answer the prompt asks for, as a response_schema for models with structured output
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "contract_type": {"type": "string"},
+        "summary": {"type": "string"},
+        "parties": _array({"type": "string"}),
+        "contract_date": {"type": "string"},
+        "jurisdiction": {"type": "string"},
+        "clauses": _array({
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in
+                           ("id", "title", "text", "type", "risk_level", "explanation", "recommendation")},
+            "required": ["id", "title", "text", "type", "risk_level", "explanation", "recommendation"],
+        }),
+        "overall_risk_factors": _array({"type": "string"}),
+    },
+    "required": ["contract_type", "summary", "parties", "contract_date", "jurisdiction", "clauses",
+                 "overall_risk_factors"],
+}
+
+FORMAT_MSGPACK = b"M"
+FORMAT_JSON = b"J"
+FORMAT_VERSION = 1
+
+def normalize_risk_level(value: Any) -> str:
+    """'HIGH', 'high risk', 'Critical' -> 'High'; unknown or missing -> DEFAULT_RISK_LEVEL."""
+    if value in RISK_LEVELS:
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if _HIGH_WORDS.search(lowered):
+            return "High"
+        if _MEDIUM_WORDS.search(lowered):
+            return "Medium"
+        if _LOW_WORDS.search(lowered):
+            return "Low"
+    return DEFAULT_RISK_LEVEL
+
+def normalize_id(value: Any) -> str:
+    """Clause ids as strings without a trailing period: 4 -> '4', 4.0 -> '4', ' 4.1. ' -> '4.1'."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().rstrip(".")
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+def _score(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return max(0, min(10, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return None
+
+def _string_list(value: Any) -> List[str]:
+    """Lists of names: a bare string becomes a one-item list, dicts contribute their 'name'."""
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    items = []
+    for item in value:
+        if isinstance(item, dict):
+            item = item.get("name")
+        if item:
+            items.append(_text(item).strip())
+    return items
+
+class Clause:
+    __slots__ = ("id", "title", "text", "type", "risk_level", "explanation", "recommendation",
+                 "risk_score", "extras")
+
+    FIELDS = ("id", "title", "text", "type", "risk_level", "explanation", "recommendation", "risk_score")
+
+    def __init__(self, id: str = "", title: str = "", text: str = "", type: str = "",
+                 risk_level: str = DEFAULT_RISK_LEVEL, explanation: str = "", recommendation: str = "",
+                 risk_score: Optional[int] = None, extras: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.title = title
+        self.text = text
+        self.type = type
+        self.risk_level = risk_level
+        self.explanation = explanation
+        self.recommendation = recommendation
+        self.risk_score = risk_score
+        self.extras = extras # Keys outside the schema (e.g. risk_terms), kept as is
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Clause":
+        extras = {key: data[key] for key in data.keys() - cls.FIELDS}
+        return cls(
+            id=normalize_id(data.get("id")),
+            title=_text(data.get("title")),
+            text=_text(data.get("text")),
+            # Clause types repeat across a portfolio; interned strings are stored once
+            type=sys.intern(_text(data.get("type")).strip()),
+            risk_level=normalize_risk_level(data.get("risk_level")),
+            explanation=_text(data.get("explanation")),
+            recommendation=_text(data.get("recommendation")),
+            risk_score=_score(data.get("risk_score")),
+            extras=extras or None,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        if self.risk_score is None:
+            del data["risk_score"] # Not scored yet
+        if self.extras:
+            data.update(self.extras)
+        return data
+
+    def to_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values) -> "Clause":
+        clause = cls(*values)
+        clause.type = sys.intern(clause.type)
+        return clause
+
+class RiskMetadata:
+    """The RiskScorer.calculate_composite_risk result."""
+    __slots__ = ("score", "level", "max_clause_score", "high_risk_clauses")
+
+    def __init__(self, score: float = 0, level: str = "Low", max_clause_score: int = 0, high_risk_clauses: int = 0):
+        self.score = score
+        self.level = level
+        self.max_clause_score = max_clause_score
+        self.high_risk_clauses = high_risk_clauses
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RiskMetadata":
+        return cls(
+            score=float(data.get("score") or 0),
+            level=normalize_risk_level(data.get("level")) if data.get("level") else "Low",
+            max_clause_score=int(data.get("max_clause_score") or 0),
+            high_risk_clauses=int(data.get("high_risk_clauses") or 0),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def to_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+class ContractAnalysis:
+    __slots__ = ("contract_type", "summary", "parties", "contract_date", "jurisdiction", "clauses",
+                 "overall_risk_factors", "risk_metadata", "extras")
+
+    HEADER_FIELDS = ("contract_type", "summary", "parties", "contract_date", "jurisdiction")
+
+    def __init__(self, contract_type: str = "", summary: str = "", parties: List[str] = None,
+                 contract_date: str = "", jurisdiction: str = "", clauses: List[Clause] = None,
+                 overall_risk_factors: List[str] = None, risk_metadata: Optional[RiskMetadata] = None,
+                 extras: Optional[Dict[str, Any]] = None):
+        self.contract_type = contract_type
+        self.summary = summary
+        self.parties = parties or []
+        self.contract_date = contract_date
+        self.jurisdiction = jurisdiction
+        self.clauses = clauses or []
+        self.overall_risk_factors = overall_risk_factors or []
+        self.risk_metadata = risk_metadata
+        self.extras = extras # e.g. analysis_mode, warnings, clause_reuse, revision
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ContractAnalysis":
+        """Validate and coerce a parsed model answer (or a stored analysis dict)."""
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        known = cls.__slots__[:-1]
+        extras = {key: value for key, value in data.items() if key not in known}
+        risk_meta = data.get("risk_metadata")
+        return cls(
+            contract_type=sys.intern(_text(data.get("contract_type")).strip()),
+            summary=_text(data.get("summary")),
+            parties=_string_list(data.get("parties")),
+            contract_date=_text(data.get("contract_date")),
+            jurisdiction=_text(data.get("jurisdiction")),
+            clauses=[Clause.from_dict(c) for c in data.get("clauses") or [] if isinstance(c, dict)],
+            overall_risk_factors=_string_list(data.get("overall_risk_factors")),
+            risk_metadata=RiskMetadata.from_dict(risk_meta) if isinstance(risk_meta, dict) else None,
+            extras=extras or None,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.HEADER_FIELDS}
+        data["parties"] = list(self.parties)
+        data["clauses"] = [clause.to_dict() for clause in self.clauses]
+        data["overall_risk_factors"] = list(self.overall_risk_factors)
+        if self.risk_metadata is not None:
+            data["risk_metadata"] = self.risk_metadata.to_dict()
+        if self.extras:
+            data.update(self.extras)
+        return data
+
+    def to_tuple(self) -> tuple:
+        return (
+            FORMAT_VERSION, self.contract_type, self.summary, self.parties, self.contract_date, self.jurisdiction,
+            [clause.to_tuple() for clause in self.clauses], self.overall_risk_factors,
+            self.risk_metadata.to_tuple() if self.risk_metadata is not None else None, self.extras,
+        )
+
+    @classmethod
+    def from_tuple(cls, values) -> "ContractAnalysis":
+        version, contract_type, summary, parties, date, jurisdiction, clauses, factors, risk_meta, extras = values
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported analysis format version {version}")
+        return cls(
+            sys.intern(contract_type), summary, list(parties), date, jurisdiction,
+            [Clause.from_tuple(c) for c in clauses], list(factors),
+            RiskMetadata(*risk_meta) if risk_meta is not None else None, extras,
+        )
+
+def coerce_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    """A parsed model answer with every field validated and normalized, as a plain dict."""
+    return ContractAnalysis.from_dict(data).to_dict()
+
+def dumps(analysis) -> bytes:
+    """Compact encoding of an analysis (ContractAnalysis or dict) for storage."""
+    if not isinstance(analysis, ContractAnalysis):
+        analysis = ContractAnalysis.from_dict(analysis)
+    if msgpack is not None:
+        return FORMAT_MSGPACK + msgpack.packb(analysis.to_tuple(), use_bin_type=True)
+    return FORMAT_JSON + json.dumps(analysis.to_tuple(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads(data) -> ContractAnalysis:
+    """Decode dumps() output, or a plain JSON dict stored as text."""
+    if isinstance(data, str):
+        return ContractAnalysis.from_dict(json.loads(data))
+    data = bytes(data)
+    if data[:1] == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise ImportError("This analysis was stored with msgpack; install it with 'pip install msgpack'.")
+        return ContractAnalysis.from_tuple(msgpack.unpackb(data[1:], raw=False))
+    if data[:1] == FORMAT_JSON:
+        return ContractAnalysis.from_tuple(json.loads(data[1:].decode("utf-8")))
+    return ContractAnalysis.from_dict(json.loads(data.decode("utf-8")))
+
+def _columns(analyses: Iterable[ContractAnalysis]) -> Tuple[Dict[str, list], Dict[str, list]]:
+    """Contract-level and clause-level columns; clause rows point at their contract by position."""
+    contracts = {name: [] for name in ("contract_id", "contract_type", "jurisdiction", "risk_score", "risk_level",
+                                       "high_risk_clauses", "clause_count")}
+    clauses = {name: [] for name in ("contract_id",) + Clause.FIELDS}
+    for index, analysis in enumerate(analyses):
+        risk_meta = analysis.risk_metadata or RiskMetadata()
+        for name, value in (("contract_id", index), ("contract_type", analysis.contract_type),
+                            ("jurisdiction", analysis.jurisdiction), ("risk_score", risk_meta.score),
+                            ("risk_level", risk_meta.level), ("high_risk_clauses", risk_meta.high_risk_clauses),
+                            ("clause_count", len(analysis.clauses))):
+            contracts[name].append(value)
+        for clause in analysis.clauses:
+            clauses["contract_id"].append(index)
+            for field in Clause.FIELDS:
+                clauses[field].append(getattr(clause, field))
+    return contracts, clauses
+
+def clauses_frame(analyses: Iterable[ContractAnalysis]):
+    """
+    One pandas row per clause (contract_id = position in analyses), built
+    column-wise; feed it to RiskScorer.score_frame / calculate_composite_risk_bulk.
+    """
+    import pandas as pd
+    _, clauses = _columns(analyses)
+    frame = pd.DataFrame(clauses)
+    for column in ("type", "risk_level"):
+        frame[column] = frame[column].astype("category")
+    return frame
+
+def to_arrow(analyses: Iterable[ContractAnalysis]):
+    """(contracts, clauses) pyarrow Tables, e.g. for pyarrow.parquet.write_table."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Arrow export requires pyarrow (pip install pyarrow).")
+    contracts, clauses = _columns(analyses)
+    clause_table = pa.table(clauses)
+    for column in ("type", "risk_level"):
+        index = clause_table.schema.get_field_index(column)
+        clause_table = clause_table.set_column(index, column, clause_table.column(column).dictionary_encode())
+    return pa.table(contracts), clause_table
@@ -11,11 +11,25 @@ st.set_page_config(
 
 import pandas as pd
 import plotly.express as px
-import utils
+import storage
+import metrics
+import prescreen
 from contract_analyzer import ContractAnalyzer
+from analysis_cache import AnalysisCache
+from audit_log import AuditLog
+from portfolio import PortfolioIndex
+from revisions import RevisionStore
+from job_queue import JobWorkers, QueueFull, analysis_modes, run_analysis
+from clause_store import ClauseStore
+from template_registry import BUILTIN_TEMPLATES, TemplateRegistry
+from translation import TranslationCache
+import translation
+from extraction_service import ExtractionService
+from request_scheduler import get_scheduler
 import template_generator
 import datetime
 import json
+import time
 
 # Custom CSS for professional look
 st.markdown("""
@@ -68,6 +82,22 @@ with st.sidebar:
     # Model Selection (Fix for 404 errors)
     model_options = ["gemini-1.5-flash", "gemini-pro", "gemini-1.5-pro-latest"]
     selected_model = st.selectbox("Select Model", model_options, index=0, help="Try switching if you get a 404 error.")
+    tiered_routing = st.checkbox("Tiered routing", value=False, help=f"Analyze the whole contract with {config.ROUTING_FAST_MODEL} first and re-analyze only the risky clauses with the selected model (or {config.ROUTING_ESCALATION_MODEL} if the fast model is selected).")
+    escalation_model = selected_model if selected_model != config.ROUTING_FAST_MODEL else None
+    queue_stats = get_scheduler(selected_model).stats()
+    if queue_stats["queue_depth"]:
+        st.caption(f"⏳ {queue_stats['queue_depth']} request(s) waiting for {selected_model} quota (avg wait {queue_stats['avg_wait_seconds']}s)")
+    stream_results = st.checkbox("Show clauses as they are analyzed", value=True, help="Stream the model response and render each clause as soon as it is ready.")
+    reuse_clauses = st.checkbox("Reuse known clause analyses", value=False, help="Clauses already analyzed in earlier contracts (including near-identical wording) are filled in from the local clause store; only new clauses are sent to Gemini.")
+    show_performance = st.checkbox("Show performance panel", value=False, help="Time spent per pipeline stage (extraction, model calls, parsing, scoring) and token usage for the last analysis.")
+    revision_document = st.text_input("Track revisions as", placeholder="e.g. Acme vendor agreement", help="Name the negotiation to keep each analyzed version. A new version is diffed against the previous one and only added or changed clauses are sent to Gemini.").strip()
+    background_jobs = st.checkbox("Run analyses in the background", value=False, help="Queue the analysis for a background worker. It keeps running if you refresh, click elsewhere or lose the connection; the page polls for the result.")
+    match_templates = st.checkbox("Match known templates", value=False, help="Compare the contract with the built-in and house templates. Clauses that only fill in a template's blanks ([Amount], [Date], ...) reuse its stored analysis; only deviating clauses are sent to Gemini.")
+    prescreen_locally = st.checkbox("Pre-screen locally", value=False, help="Score clauses with the local keyword rules first and only send risky clauses to Gemini. Low-risk contracts skip the API call entirely.")
+    used_mode, skipped_modes = analysis_modes({"match_templates": match_templates, "tiered_routing": tiered_routing,
+                                               "prescreen": prescreen_locally, "reuse_clauses": reuse_clauses})
+    if skipped_modes:
+        st.warning(f"{used_mode} takes precedence: {', '.join(mode.lower() for mode in skipped_modes)} will not be applied.")
             
     st.markdown("---")
     st.markdown("### 📝 How to Use")
@@ -92,6 +122,78 @@ with st.sidebar:
 st.markdown(f'<div class="main-header">{config.APP_TITLE}</div>', unsafe_allow_html=True)
 st.markdown("GenAI-powered legal assistant for Indian SMEs")
 
+@st.cache_resource
+def get_analysis_cache():
+    # One shared on-disk cache per server process, reused across reruns and sessions
+    return AnalysisCache()
+
+@st.cache_resource
+def get_audit_log():
+    # SQLite in WAL mode; safe to share between sessions and between app replicas
+    return AuditLog()
+
+@st.cache_resource
+def get_portfolio():
+    # Cross-contract search index, persisted under DATA_DIR
+    return PortfolioIndex()
+
+@st.cache_resource
+def get_revision_store():
+    # Earlier versions of negotiated contracts, keyed by the name in the sidebar
+    return RevisionStore()
+
+@st.cache_resource
+def get_clause_store():
+    # Clause analyses shared across contracts, sessions and reruns
+    return ClauseStore()
+
+@st.cache_resource
+def get_template_registry():
+    # Built-in and house templates with their precomputed clause patterns and analyses
+    return TemplateRegistry()
+
+@st.cache_resource
+def get_translation_cache():
+    # Translations of Hindi paragraphs, shared across contracts and sessions
+    return TranslationCache()
+
+@st.cache_resource
+def get_job_workers():
+    # Worker threads belong to the server process, not to a script run, so reruns don't stop them
+    return JobWorkers(cache=get_analysis_cache(), clause_store=get_clause_store(), revision_store=get_revision_store(),
+                      template_registry=get_template_registry(), translation_cache=get_translation_cache())
+
+@st.cache_resource
+def start_metrics_exporter():
+    # Prometheus /metrics endpoint, only when LEGALIS_METRICS_PORT is set
+    return metrics.start_http_server()
+
+start_metrics_exporter()
+
+@st.cache_resource
+def get_extraction_service():
+    # Process pool shared by all sessions; memoizes extracted text by file hash,
+    # so reruns with the same upload don't parse it again
+    return ExtractionService()
+
+def render_clause_card(c):
+    r_level = c.get("risk_level", "Medium")
+    css_class = "risk-high" if r_level.lower() == "high" else "risk-medium"
+    
+    with st.container():
+        st.markdown(f"""
+        <div class="{css_class}">
+            <h4>{c.get('title', 'Clause')} ({r_level} Risk)</h4>
+            <p><b>Text:</b> {c.get('text', '')}</p>
+            <p><b>Why it's risky:</b> {c.get('explanation', '')}</p>
+            <p><b>Recommendation:</b> {c.get('recommendation', '')}</p>
+        </div>
+        <br>
+        """, unsafe_allow_html=True)
+
+def is_risky(c):
+    return c.get("risk_level", "Low").lower() in ["high", "medium"] or c.get("risk_score", 0) > 4
+
 # Initialize Session State
 if "analysis_result" not in st.session_state:
     st.session_state.analysis_result = None
@@ -112,7 +214,9 @@ with col2:
 if uploaded_file or st.session_state.get("sample_loaded"):
     if uploaded_file:
         file_obj = uploaded_file
-        contract_text = utils.extract_text(uploaded_file)
+        with metrics.trace() as extract_trace:
+            contract_text = get_extraction_service().extract(uploaded_file)
+        st.session_state.extract_performance = extract_trace.summary()
     else:
         # Dummy text for sample
         file_obj = None
@@ -120,29 +224,145 @@ if uploaded_file or st.session_state.get("sample_loaded"):
         
     st.text_area("Contract Preview", contract_text[:1000] + "...", height=150)
     
-    # Language Detection
-    lang = utils.detect_language(contract_text)
-    if lang == "Hindi":
-        st.info("🇮🇳 Hindi Language Detected. The bot will translate and analyze in English.")
+    # Language Detection, per paragraph so bilingual contracts only translate their Hindi parts
+    languages = translation.language_summary(contract_text)
+    if languages["Hindi"]:
+        st.info(f"🇮🇳 Hindi detected in {languages['Hindi']} of {languages['Hindi'] + languages['English']} sections. "
+                "Those sections are translated to English (once; translations are cached) before analysis.")
+
+    if uploaded_file:
+        with st.expander("📐 Register as house template"):
+            house_templates = [name for name in get_template_registry().names() if name not in BUILTIN_TEMPLATES]
+            if house_templates:
+                st.caption(f"House templates: {', '.join(house_templates)}")
+            template_name = st.text_input("Template name", value=uploaded_file.name.rsplit(".", 1)[0]).strip()
+            if st.button("Register Template") and template_name:
+                # Blanks to fill in should be written as [Amount], [Date], [Party Name], ...
+                get_template_registry().register(template_name, contract_text)
+                st.success(f"'{template_name}' registered. Contracts that follow it only send deviating clauses to Gemini.")
     
     if st.button("🔍 Analyze Contract"):
+        # Identifies what was analyzed when the result is saved to the audit log
+        st.session_state.analysis_source = {
+            "content_hash": storage.content_hash(storage.normalize_text(contract_text)),
+            "name": file_obj.name if file_obj else "Sample contract",
+            "model": selected_model if api_key else "local pre-screen",
+        }
+        st.query_params.pop("job", None)
         if not api_key:
-            st.error("Please enter an API Key in the sidebar.")
+            # Without a key the local keyword pre-screen still gives a usable dashboard
+            st.session_state.analysis_result = prescreen.local_analysis(prescreen.prescreen_contract(contract_text))
+            st.info("No API Key configured: showing the local keyword pre-screen. Enter a key in the sidebar for the full AI analysis.")
+        elif background_jobs:
+            try:
+                st.session_state.job_id = get_job_workers().submit(
+                    contract_text, name=st.session_state.analysis_source["name"], api_key=api_key,
+                    model_name=selected_model, prescreen=prescreen_locally, reuse_clauses=reuse_clauses,
+                    tiered_routing=tiered_routing, escalation_model=escalation_model, match_templates=match_templates,
+                    revision_document=revision_document or None,
+                )
+                # A refresh or reconnect finds the job again through the URL
+                st.query_params["job"] = str(st.session_state.job_id)
+            except QueueFull as e:
+                st.error(f"Too many analyses queued: {e} Please try again in a few minutes.")
         else:
             with st.spinner("🤖 Beep Boop... analyzing risks and clauses..."):
-                analyzer = ContractAnalyzer(api_key, model_name=selected_model)
+                analyzer = ContractAnalyzer(api_key, model_name=selected_model, cache=get_analysis_cache(),
+                                            clause_store=get_clause_store() if reuse_clauses else None,
+                                            template_registry=get_template_registry() if match_templates else None,
+                                            translation_cache=get_translation_cache())
                 
                 # Double check to prevent using placeholder key if user forgot
                 if "YOUR_API_KEY" in analyzer.api_key:
                      st.error("Invalid API Key. Please update config.py or enter key in sidebar.")
                 else:
-                    result = analyzer.analyze_contract(contract_text)
+                    # Render risky clauses while the rest of the response is still generating
+                    live_placeholder = st.empty()
+                    live = live_placeholder.container()
+                    live_clauses = []
+
+                    def show_live_clause(clause):
+                        if not live_clauses:
+                            live.subheader("⚠️ Risk Analysis (live)")
+                        live_clauses.append(clause)
+                        if is_risky(clause):
+                            with live:
+                                render_clause_card(clause)
+
+                    options = {
+                        "prescreen": prescreen_locally, "tiered_routing": tiered_routing,
+                        "escalation_model": escalation_model, "revision_document": revision_document or None,
+                        "stream": stream_results,
+                    }
+                    with metrics.trace() as perf_trace:
+                        # Same text preparation and mode selection as the background workers
+                        result, meta = run_analysis(analyzer, contract_text, options, get_revision_store(),
+                                                    on_clause=show_live_clause)
+                    # The full dashboard below takes over once the analysis is complete
+                    live_placeholder.empty()
+                    st.session_state.performance = perf_trace.summary()
+                    metrics.write_prometheus()
                     
                     if "error" in result:
                         st.error(result["error"])
                     else:
                         st.session_state.analysis_result = result
-                        st.success("Analysis Complete!")
+                        prompt_stats = meta["prompt_stats"]
+                        if prompt_stats["tokens_saved"] > 0:
+                            st.caption(f"Prompt compaction saved ~{prompt_stats['tokens_saved']:,} of {prompt_stats['tokens_before']:,} input tokens.")
+                        translation_stats = meta["translation_stats"]
+                        if translation_stats["hindi_segments"]:
+                            st.caption(f"Translated {translation_stats['translated']} Hindi section(s); {translation_stats['cached']} came from the translation cache.")
+                        if meta.get("revision_version"):
+                            st.caption(f"Saved as version {meta['revision_version']} of '{revision_document}'.")
+                        if result.get("revision"):
+                            revision = result["revision"]
+                            st.success(f"Analysis Complete! ({revision['analyzed']} changed clauses analyzed, {revision['unchanged']} carried over)")
+                        elif result.get("analysis_mode") == "local":
+                            st.success("Analysis Complete! (no risky clauses found locally, AI call skipped)")
+                        elif meta["cache_hit"]:
+                            st.success("Analysis Complete! (served from cache)")
+                        elif result.get("clause_reuse", {}).get("reused"):
+                            reuse = result["clause_reuse"]
+                            st.success(f"Analysis Complete! ({reuse['reused']} known clauses reused, {reuse['analyzed']} analyzed)")
+                        else:
+                            st.success("Analysis Complete!")
+
+# Background Job Progress
+if st.query_params.get("job") and "job_id" not in st.session_state and st.session_state.get("loaded_job") != st.query_params["job"]:
+    st.session_state.job_id = int(st.query_params["job"])
+if st.session_state.get("job_id"):
+    job = get_job_workers().queue.get(st.session_state.job_id)
+    if job is None:
+        del st.session_state.job_id
+    elif job["status"] in ("queued", "running"):
+        state = f"number {job['queue_position']} in the queue" if job["status"] == "queued" else job["progress"]
+        st.info(f"⏳ Analysis job #{job['id']} ({job['name']}): {state}. You can leave this page; the analysis keeps running.")
+        if job["status"] == "queued" and st.button("Cancel Job"):
+            get_job_workers().queue.cancel(job["id"])
+        time.sleep(config.JOB_POLL_SECONDS)
+        st.rerun()
+    else:
+        del st.session_state.job_id
+        st.session_state.loaded_job = str(job["id"])
+        if job["status"] == "done":
+            st.session_state.analysis_result = job["result"]
+            st.session_state.analysis_source = {
+                "content_hash": job["content_hash"], "name": job["name"], "model": job["options"].get("model_name"),
+            }
+            meta = job["meta"] or {}
+            st.success(f"Analysis Complete! (job #{job['id']}{', served from cache' if meta.get('cache_hit') else ''})")
+            if meta.get("prompt_stats", {}).get("tokens_saved", 0) > 0:
+                st.caption(f"Prompt compaction saved ~{meta['prompt_stats']['tokens_saved']:,} input tokens.")
+            if (meta.get("translation_stats") or {}).get("hindi_segments"):
+                st.caption(f"Translated {meta['translation_stats']['translated']} Hindi section(s); "
+                           f"{meta['translation_stats']['cached']} came from the translation cache.")
+            if meta.get("revision_version"):
+                st.caption(f"Saved as version {meta['revision_version']} of '{job['options']['revision_document']}'.")
+        elif job["status"] == "error":
+            st.error(job["error"])
+        else:
+            st.warning(f"Analysis job #{job['id']} was cancelled.")
 
 # Results Display
 if st.session_state.analysis_result:
@@ -150,16 +370,48 @@ if st.session_state.analysis_result:
     
     # Dashboard Metrics
     st.markdown("## 📊 Risk Dashboard")
+    if res.get("analysis_mode") == "local":
+        st.caption("Based on the local keyword pre-screen only.")
+    elif res.get("analysis_mode") == "hybrid":
+        st.caption("Risky clauses analyzed by AI; the rest scored by the local keyword pre-screen.")
+    if res.get("routing"):
+        routing = res["routing"]
+        tiers = ", ".join(f"{tier['model']} {tier['seconds']}s" for tier in routing["tiers"].values())
+        st.caption(f"Tiered routing: {len(routing['escalated'])} risky clause(s) re-analyzed by {routing['escalation_model']}, "
+                   f"the rest by {routing['fast_model']} ({tiers}).")
+    if res.get("template_match"):
+        template_match = res["template_match"]
+        st.caption(f"Matches the {template_match['template']} template ({template_match['coverage']:.0%} of clauses): "
+                   f"{len(template_match['deviating'])} deviating clause(s) analyzed, {template_match['reused']} reused.")
+        if template_match["missing"]:
+            st.warning(f"Clauses of the {template_match['template']} template missing from this contract: "
+                       f"{', '.join(template_match['missing'])}")
     
+    for warning in res.get("warnings", []) or []:
+        st.warning(warning)
     risk_meta = res.get("risk_metadata", {})
     score = risk_meta.get("score", 0)
     level = risk_meta.get("level", "Unknown")
     
     m1, m2, m3 = st.columns(3)
-    m1.metric("Overall Risk Score", f"{score}/10", delta_color="inverse" if score > 6 else "normal")
+    revision = res.get("revision")
+    if revision:
+        m1.metric("Overall Risk Score", f"{score}/10", delta=revision["risk_delta"]["score_change"], delta_color="inverse")
+    else:
+        m1.metric("Overall Risk Score", f"{score}/10", delta_color="inverse" if score > 6 else "normal")
     m2.metric("Risk Level", level)
     m3.metric("High Risk Clauses", risk_meta.get("high_risk_clauses", 0))
     
+    if revision:
+        delta = revision["risk_delta"]
+        with st.expander(f"🔁 Changes since the previous version ({len(revision['changes'])})", expanded=True):
+            st.write(f"Risk score {delta['score_before']} → {delta['score_after']} ({delta['level_before']} → {delta['level_after']}), "
+                     f"high risk clauses {delta['high_risk_change']:+d}.")
+            if revision["changes"]:
+                st.dataframe(pd.DataFrame(revision["changes"]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No clause changes found.")
+
     # Tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📝 Summary", "⚠️ Risk Analysis", "📋 Clauses", "📉 Visuals"])
     
@@ -180,25 +432,13 @@ if st.session_state.analysis_result:
         st.subheader("Risk Assessment")
         
         clauses = res.get("clauses", [])
-        risky_clauses = [c for c in clauses if c.get("risk_level", "Low").lower() in ["high", "medium"] or c.get("risk_score", 0) > 4]
+        risky_clauses = [c for c in clauses if is_risky(c)]
         
         if not risky_clauses:
             st.success("No high risk clauses detected.")
         
         for c in risky_clauses:
-            r_level = c.get("risk_level", "Medium")
-            css_class = "risk-high" if r_level.lower() == "high" else "risk-medium"
-            
-            with st.container():
-                st.markdown(f"""
-                <div class="{css_class}">
-                    <h4>{c.get('title', 'Clause')} ({r_level} Risk)</h4>
-                    <p><b>Text:</b> {c.get('text', '')}</p>
-                    <p><b>Why it's risky:</b> {c.get('explanation', '')}</p>
-                    <p><b>Recommendation:</b> {c.get('recommendation', '')}</p>
-                </div>
-                <br>
-                """, unsafe_allow_html=True)
+            render_clause_card(c)
                 
     with tab3:
         st.subheader("Full Clause Analysis")
@@ -227,17 +467,137 @@ if st.session_state.analysis_result:
     st.markdown("---")
     st.header("🖨️ Actions")
     
-    # Audit Log logic (stored in local JSON as requested)
+    # Audit Log: append-only SQLite store with the full analysis
     if st.button("Save to Audit Log"):
-        log_entry = {
-            "timestamp": str(datetime.datetime.now()),
-            "score": score,
-            "summary": res.get("summary")
-        }
-        with open("audit_log.json", "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-        st.success("Analysis saved to audit log.")
+        source = st.session_state.get("analysis_source", {})
+        entry_id = get_audit_log().record(
+            res, content_hash=source.get("content_hash"), source=source.get("name"), model_name=source.get("model")
+        )
+        st.success(f"Analysis saved to audit log (entry #{entry_id}).")
+
+    if st.button("Add to Portfolio"):
+        source = st.session_state.get("analysis_source", {})
+        get_portfolio().add(res, source.get("content_hash") or storage.content_hash(json.dumps(res)), name=source.get("name"))
+        st.success("Contract added to the portfolio index.")
         
     # PDF Export Mock
     st.download_button("Export Report as PDF", data=json.dumps(res, indent=2), file_name="contract_analysis_report.json", mime="application/json", help="Download raw analysis data")
 
+# Performance Panel
+if show_performance:
+    st.markdown("---")
+    st.header("⏱️ Performance")
+    perf = st.session_state.get("performance")
+    extract_perf = st.session_state.get("extract_performance")
+    if not perf and not extract_perf:
+        st.info("Run an analysis to see its timing breakdown.")
+    else:
+        stages = dict((extract_perf or {}).get("stages", {}))
+        stages.update((perf or {}).get("stages", {}))
+        counters = (perf or {}).get("counters", {})
+        p1, p2, p3 = st.columns(3)
+        p1.metric("Analysis Wall Time", f"{(perf or {}).get('wall_seconds', 0):.2f}s")
+        p2.metric("Model Calls", int(counters.get("model_requests", 0)))
+        p3.metric("Tokens (in / out)", f"{int(counters.get('prompt_tokens', 0))} / {int(counters.get('output_tokens', 0))}")
+        if stages:
+            perf_df = pd.DataFrame([{"stage": name, **values} for name, values in stages.items()])
+            st.dataframe(perf_df.sort_values("total_seconds", ascending=False), use_container_width=True)
+            st.caption("Stage totals add up across parallel chunk requests, so they can exceed the wall time.")
+        with st.expander("Process totals since server start"):
+            st.json(metrics.registry.snapshot())
+
+# Portfolio Search
+st.markdown("---")
+st.header("🗂️ Portfolio")
+portfolio_index = get_portfolio()
+portfolio_stats = portfolio_index.stats()
+s1, s2, s3 = st.columns(3)
+s1.metric("Contracts", portfolio_stats["contracts"])
+s2.metric("High Risk Contracts", portfolio_stats["high_risk_contracts"])
+s3.metric("Indexed Clauses", portfolio_stats["clauses"])
+
+if portfolio_stats["contracts"]:
+    facets = portfolio_index.facets()
+    search_tab, contracts_tab = st.tabs(["🔎 Clause Search", "📁 Contracts"])
+    f1, f2, f3 = st.columns(3)
+    portfolio_filters = {
+        "text": st.text_input("Clause text contains", placeholder="e.g. unlimited indemnity"),
+        "clause_types": f1.multiselect("Clause Types", facets["clause_types"]),
+        "risk_levels": f2.multiselect("Clause Risk Level", ["High", "Medium", "Low"]),
+        "min_score": f3.slider("Min Clause Score", 0, 10, 0) or None,
+        "contract_type": f1.selectbox("Contract Type", [""] + facets["contract_types"]) or None,
+        "risk_factor": f2.selectbox("Risk Factor", [""] + facets["risk_factors"]) or None,
+        "status": f3.selectbox("Status", ["active", "expired", ""], format_func=lambda v: v or "any") or None,
+        "party": st.text_input("Party name contains") or None,
+    }
+    portfolio_page = st.number_input("Page", min_value=1, value=1, step=1)
+    page_args = {"limit": config.PORTFOLIO_PAGE_SIZE, "offset": (portfolio_page - 1) * config.PORTFOLIO_PAGE_SIZE}
+
+    with search_tab:
+        matches = portfolio_index.search_clauses(**page_args, **portfolio_filters)
+        if matches:
+            st.dataframe(pd.DataFrame(matches), use_container_width=True, hide_index=True)
+        else:
+            st.info("No clauses match these filters.")
+    with contracts_tab:
+        contracts = portfolio_index.search_contracts(**page_args, **portfolio_filters)
+        if contracts:
+            contracts_df = pd.DataFrame(contracts).drop(columns=["content_hash"])
+            contracts_df["added_at"] = pd.to_datetime(contracts_df["added_at"], unit="s")
+            st.dataframe(contracts_df, use_container_width=True, hide_index=True)
+            c1, c2 = st.columns(2)
+            selected_contract = c1.selectbox("Contract", [c["id"] for c in contracts],
+                                             format_func=lambda i: next(c["name"] or f"#{i}" for c in contracts if c["id"] == i))
+            new_status = c2.selectbox("Set status", ["active", "expired", "terminated"])
+            if c2.button("Update Status"):
+                portfolio_index.set_status(selected_contract, new_status)
+                st.rerun()
+            with st.expander("Stored analysis"):
+                st.json(portfolio_index.get(selected_contract), expanded=False)
+        else:
+            st.info("No contracts match these filters.")
+else:
+    st.info("No contracts indexed yet. Use 'Add to Portfolio' after an analysis, or batch_runner.py --portfolio.")
+
+# Audit History
+with st.expander("📜 Audit History"):
+    audit_log = get_audit_log()
+    h1, h2, h3 = st.columns(3)
+    history_level = h1.selectbox("Risk Level", ["All", "High", "Medium", "Low"])
+    history_type = h2.selectbox("Contract Type", ["All"] + audit_log.contract_types())
+    history_days = h3.selectbox("Saved In", ["Any time", "Last 24 hours", "Last 7 days", "Last 30 days"])
+    history_hash = st.text_input("Content Hash", help="Find every saved analysis of the same contract text")
+
+    days = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}.get(history_days)
+    history_filters = {
+        "risk_level": None if history_level == "All" else history_level,
+        "contract_type": None if history_type == "All" else history_type,
+        "start": datetime.datetime.now().timestamp() - days * 86400 if days else None,
+        "content_hash": history_hash.strip() or None,
+    }
+    # Keyset pagination: remember the last id of each page shown; reset when the filters change
+    filter_key = (history_level, history_type, history_days, history_filters["content_hash"])
+    if st.session_state.get("audit_filter_key") != filter_key:
+        st.session_state.audit_filter_key = filter_key
+        st.session_state.audit_cursors = [None]
+
+    entries = audit_log.query(before_id=st.session_state.audit_cursors[-1], limit=config.AUDIT_PAGE_SIZE, **history_filters)
+    st.caption(f"{audit_log.count(**history_filters)} matching entries · page {len(st.session_state.audit_cursors)}")
+    if entries:
+        history_df = pd.DataFrame(entries)
+        history_df["created_at"] = pd.to_datetime(history_df["created_at"], unit="s")
+        st.dataframe(history_df, use_container_width=True, hide_index=True)
+
+        nav_prev, nav_next = st.columns(2)
+        if nav_prev.button("⬅️ Newer", disabled=len(st.session_state.audit_cursors) == 1):
+            st.session_state.audit_cursors.pop()
+            st.rerun()
+        if nav_next.button("Older ➡️", disabled=len(entries) < config.AUDIT_PAGE_SIZE):
+            st.session_state.audit_cursors.append(entries[-1]["id"])
+            st.rerun()
+
+        entry_id = st.selectbox("Show full analysis of entry", [e["id"] for e in entries])
+        if entry_id is not None:
+            st.json(audit_log.get(entry_id)["analysis"], expanded=False)
+    else:
+        st.info("No saved analyses match these filters.")
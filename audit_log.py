@@ -0,0 +1,185 @@
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import config
+import storage
+
+# Columns returned by query(); the full analysis JSON is only loaded on request
+SUMMARY_COLUMNS = ("id", "created_at", "content_hash", "source", "contract_type", "risk_level",
+                   "risk_score", "model_name", "summary")
+
+class AuditLog:
+    """
+    Append-only audit trail of saved analyses, in SQLite (WAL mode).
+    Several app processes can write to the same file: each insert is its own
+    short transaction and writers wait on the busy timeout instead of
+    interleaving. Triggers reject UPDATE and DELETE so entries cannot be
+    rewritten. Queries by time range, risk level, contract type and content
+    hash use indexes and page by id (keyset pagination), so a page costs the
+    same no matter how deep into the history it is.
+    """
+
+    def __init__(self, path: str = None, legacy_path: str = None):
+        self.path = path or config.AUDIT_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS audit_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                content_hash TEXT,
+                source TEXT,
+                contract_type TEXT,
+                risk_level TEXT,
+                risk_score REAL,
+                model_name TEXT,
+                summary TEXT,
+                analysis TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_entries(created_at);
+            -- Single-column indexes end in the rowid (id), so "filter ... ORDER BY id DESC" needs no sort
+            CREATE INDEX IF NOT EXISTS idx_audit_level ON audit_entries(risk_level);
+            CREATE INDEX IF NOT EXISTS idx_audit_type ON audit_entries(contract_type);
+            CREATE INDEX IF NOT EXISTS idx_audit_hash ON audit_entries(content_hash);
+            CREATE TRIGGER IF NOT EXISTS audit_no_update BEFORE UPDATE ON audit_entries
+                BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+            CREATE TRIGGER IF NOT EXISTS audit_no_delete BEFORE DELETE ON audit_entries
+                BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+        """)
+        self._conn.commit()
+        self._import_legacy(legacy_path or config.AUDIT_LEGACY_JSON_PATH)
+
+    def _import_legacy(self, legacy_path: str):
+        """
+        Copy the entries of the JSON-lines audit_log.json written by older
+        versions into the store, once: only while the table is still empty.
+        """
+        if not os.path.exists(legacy_path):
+            return
+        # Take the write lock before checking, so two processes starting together import once
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._conn.execute("SELECT COUNT(*) FROM audit_entries").fetchone()[0] == 0:
+                imported = self.record_many(self.legacy_entries(legacy_path))
+                print(f"Imported {imported} entries from {legacy_path} into the audit log.")
+        finally:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+
+    @staticmethod
+    def legacy_entries(legacy_path: str) -> List[tuple]:
+        """Row values for each {"timestamp", "score", "summary"} line of an old audit_log.json."""
+        rows = []
+        with open(legacy_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    created_at = datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"Skipping line {line_number} of {legacy_path}: {e}")
+                    continue
+                rows.append((
+                    created_at, None, os.path.basename(legacy_path), None, None, entry.get("score"), None,
+                    entry.get("summary"), json.dumps(entry, ensure_ascii=False),
+                ))
+        return rows
+
+    @staticmethod
+    def make_entry(analysis: Dict[str, Any], contract_text: str = None, content_hash: str = None,
+                   source: str = None, model_name: str = None) -> tuple:
+        """Row values for one analysis. content_hash defaults to the hash of the normalized text."""
+        if content_hash is None and contract_text is not None:
+            content_hash = storage.content_hash(storage.normalize_text(contract_text))
+        risk_meta = analysis.get("risk_metadata", {})
+        return (
+            time.time(), content_hash, source, analysis.get("contract_type"), risk_meta.get("level"),
+            risk_meta.get("score"), model_name, analysis.get("summary"),
+            json.dumps(analysis, ensure_ascii=False),
+        )
+
+    def record(self, analysis: Dict[str, Any], contract_text: str = None, content_hash: str = None,
+               source: str = None, model_name: str = None) -> int:
+        """Append one analysis and return its entry id."""
+        row = self.make_entry(analysis, contract_text, content_hash, source, model_name)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO audit_entries (created_at, content_hash, source, contract_type, risk_level, "
+                "risk_score, model_name, summary, analysis) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def record_many(self, rows: Iterable[tuple]) -> int:
+        """Append many make_entry() rows in one transaction. Returns how many were written."""
+        rows = list(rows)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO audit_entries (created_at, content_hash, source, contract_type, risk_level, "
+                "risk_score, model_name, summary, analysis) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def _where(start: float = None, end: float = None, risk_level: str = None, contract_type: str = None,
+               content_hash: str = None, before_id: int = None):
+        clauses, params = [], []
+        for column, op, value in (("created_at", ">=", start), ("created_at", "<", end),
+                                  ("risk_level", "=", risk_level), ("contract_type", "=", contract_type),
+                                  ("content_hash", "=", content_hash), ("id", "<", before_id)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, start: float = None, end: float = None, risk_level: str = None, contract_type: str = None,
+              content_hash: str = None, before_id: int = None, limit: int = 50,
+              include_analysis: bool = False) -> List[Dict[str, Any]]:
+        """
+        Newest-first entries matching every given filter (start/end are Unix times).
+        For the next page pass before_id = the id of the last entry returned.
+        """
+        where, params = self._where(start, end, risk_level, contract_type, content_hash, before_id)
+        columns = SUMMARY_COLUMNS + (("analysis",) if include_analysis else ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM audit_entries{where} ORDER BY id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        entries = [dict(zip(columns, row)) for row in rows]
+        if include_analysis:
+            for entry in entries:
+                entry["analysis"] = json.loads(entry["analysis"])
+        return entries
+
+    def count(self, start: float = None, end: float = None, risk_level: str = None,
+              contract_type: str = None, content_hash: str = None) -> int:
+        where, params = self._where(start, end, risk_level, contract_type, content_hash)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM audit_entries{where}", params).fetchone()[0]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """One entry including its full analysis, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)}, analysis FROM audit_entries WHERE id = ?", (entry_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(SUMMARY_COLUMNS + ("analysis",), row))
+        entry["analysis"] = json.loads(entry["analysis"])
+        return entry
+
+    def contract_types(self) -> List[str]:
+        """Distinct contract types, for filter menus."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT contract_type FROM audit_entries WHERE contract_type IS NOT NULL ORDER BY contract_type"
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,303 @@
+"""
+Headless batch analysis of a folder (or list) of contracts.
+
+Usage:
+    python batch_runner.py contracts/ -o results.jsonl --concurrency 4 --rpm 60
+
+Results are appended as each file finishes, so an interrupted run can be
+restarted with the same command and already-analyzed files are skipped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, List, Set
+
+import config
+import storage
+import utils
+from analysis_cache import AnalysisCache
+from clause_store import ClauseStore
+from contract_analyzer import ContractAnalyzer
+from portfolio import PortfolioIndex
+from translation import TranslationCache
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+class LocalFile:
+    """Minimal stand-in for Streamlit's UploadedFile so utils.extract_text works on disk files."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._data = f.read()
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file in blocks without reading it all into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RateLimiter:
+    """Spaces out acquire() calls so no more than requests_per_minute pass per minute."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class JsonlSink:
+    """Appends one JSON record per line, flushed as soon as it is written."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed_hashes(self) -> Set[str]:
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # Partial line from an interrupted run
+                if record.get("status") == "ok":
+                    done.add(record["sha256"])
+        return done
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    """
+    Writes results as a directory of Parquet part files.
+    Records are buffered and flushed every flush_every rows, so finished
+    results reach disk while the batch is still running.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50):
+        try:
+            import pyarrow # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow), or use a .jsonl output.")
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def completed_hashes(self) -> Set[str]:
+        import pyarrow.parquet as pq
+        done = set()
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".parquet"):
+                table = pq.read_table(os.path.join(self.path, name), columns=["sha256", "status"])
+                for sha, status in zip(table.column("sha256").to_pylist(), table.column("status").to_pylist()):
+                    if status == "ok":
+                        done.add(sha)
+        return done
+
+    def write(self, record: dict):
+        row = dict(record)
+        row["analysis"] = json.dumps(row.get("analysis"), ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._buffer:
+            return
+        part = f"part-{int(time.time() * 1000)}-{os.getpid()}.parquet"
+        pq.write_table(pa.Table.from_pylist(self._buffer), os.path.join(self.path, part))
+        self._buffer = []
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+
+def iter_contract_files(paths: Iterable[str]) -> List[str]:
+    """Expand directories recursively into the supported contract files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        files.append(os.path.join(root, name))
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(path)
+    return files
+
+def run_batch(paths: Iterable[str], output: str, concurrency: int = 4, requests_per_minute: float = 60,
+              api_key: str = None, model_name: str = None, contract_type_hint: str = "General",
+              use_cache: bool = True, stream_pdfs: bool = False, reuse_clauses: bool = False,
+              model=None, index_portfolio: bool = False) -> dict:
+    """Analyze every contract under paths, streaming results to output. Returns throughput stats."""
+    sink = ParquetSink(output) if output.endswith(".parquet") else JsonlSink(output)
+    done = sink.completed_hashes()
+    limiter = RateLimiter(requests_per_minute)
+    cache = AnalysisCache() if use_cache else None
+    clause_store = ClauseStore() if reuse_clauses else None
+    portfolio = PortfolioIndex() if index_portfolio else None
+    translation_cache = TranslationCache()
+    local = threading.local()
+    stats = {"processed": 0, "skipped": 0, "failed": 0, "prompt_tokens": 0, "output_tokens": 0, "prompt_tokens_saved": 0}
+    stats_lock = threading.Lock()
+
+    def get_analyzer() -> ContractAnalyzer:
+        # One analyzer per worker thread so token accounting is per document
+        if not hasattr(local, "analyzer"):
+            local.analyzer = ContractAnalyzer(api_key, model_name=model_name, cache=cache,
+                                              clause_store=clause_store, model=model,
+                                              translation_cache=translation_cache)
+        return local.analyzer
+
+    def process(path: str):
+        started = time.monotonic()
+        # Every record has the same keys so JSONL and Parquet rows share one schema
+        record = {
+            "path": path, "sha256": None, "status": "ok", "error": None,
+            "contract_type": None, "risk_score": None, "risk_level": None, "cache_hit": False,
+            "prompt_tokens": 0, "output_tokens": 0, "prompt_tokens_saved": 0, "analysis": None,
+        }
+        try:
+            record["sha256"] = file_sha256(path)
+            if record["sha256"] in done:
+                with stats_lock:
+                    stats["skipped"] += 1
+                return
+
+            analyzer = get_analyzer()
+            before = dict(analyzer.token_usage)
+            contract_text = None
+            if stream_pdfs and path.lower().endswith(".pdf"):
+                # Page-by-page extraction feeding the chunked analysis; bounded memory, no cache
+                limiter.acquire()
+                pages = (text for _, text in utils.iter_pdf_pages(path))
+                analysis = analyzer.analyze_pages(pages, contract_type_hint)
+            else:
+                contract_text = utils.extract_text(LocalFile(path))
+                if utils.is_extraction_error(contract_text):
+                    # Recorded as an error so the file is retried on the next run, never analyzed
+                    raise ValueError(contract_text)
+                prepared_text = analyzer.prepare_text(contract_text)
+                record["prompt_tokens_saved"] = analyzer.last_prompt_stats["tokens_saved"]
+                # Only Hindi paragraphs are translated, and each only once across the batch
+                prepared_text = analyzer.translate_text(prepared_text)
+                if clause_store is not None:
+                    # Only clauses not seen in earlier contracts are sent to the model
+                    limiter.acquire()
+                    analysis = analyzer.analyze_with_clause_store(prepared_text, contract_type_hint)
+                else:
+                    analysis = analyzer.get_cached_analysis(prepared_text, contract_type_hint)
+                    if analysis is None:
+                        limiter.acquire()
+                        analysis = analyzer.analyze_long_contract(prepared_text, contract_type_hint)
+
+            record["prompt_tokens"] = analyzer.token_usage["prompt_tokens"] - before["prompt_tokens"]
+            record["output_tokens"] = analyzer.token_usage["output_tokens"] - before["output_tokens"]
+            record["cache_hit"] = analyzer.last_cache_hit
+            if "error" in analysis:
+                record["status"] = "error"
+                record["error"] = analysis["error"]
+            else:
+                risk_meta = analysis.get("risk_metadata", {})
+                record.update({
+                    "contract_type": analysis.get("contract_type"),
+                    "risk_score": risk_meta.get("score"),
+                    "risk_level": risk_meta.get("level"),
+                    "analysis": analysis,
+                })
+                if portfolio is not None:
+                    # Same key as the app uses when text is available, so a contract is indexed once
+                    content_hash = (storage.content_hash(storage.normalize_text(contract_text))
+                                    if contract_text is not None else record["sha256"])
+                    portfolio.add(analysis, content_hash, name=os.path.basename(path))
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+
+        record["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        sink.write(record)
+        with stats_lock:
+            stats["processed" if record["status"] == "ok" else "failed"] += 1
+            stats["prompt_tokens"] += record["prompt_tokens"]
+            stats["output_tokens"] += record["output_tokens"]
+            stats["prompt_tokens_saved"] += record["prompt_tokens_saved"]
+        print(f"[{record['status']}] {path} ({record['elapsed_seconds']}s)")
+
+    files = iter_contract_files(paths)
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in as_completed([pool.submit(process, path) for path in files]):
+                future.result()
+    finally:
+        sink.close()
+
+    elapsed_minutes = max(time.monotonic() - started, 1e-9) / 60
+    stats["elapsed_seconds"] = round(elapsed_minutes * 60, 2)
+    stats["docs_per_minute"] = round((stats["processed"] + stats["failed"]) / elapsed_minutes, 2)
+    stats["tokens_per_minute"] = round((stats["prompt_tokens"] + stats["output_tokens"]) / elapsed_minutes, 1)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch contract risk analysis")
+    parser.add_argument("paths", nargs="+", help="Contract files or directories (PDF, DOCX, TXT)")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl",
+                        help="Output .jsonl file, or a .parquet directory of part files")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Worker threads")
+    parser.add_argument("--rpm", type=float, default=60, help="Max analyses started per minute (0 = unlimited)")
+    parser.add_argument("--model", default=config.GEMINI_MODEL)
+    parser.add_argument("--api-key", default=None, help="Defaults to GOOGLE_API_KEY")
+    parser.add_argument("--type-hint", default="General", help="Contract type hint passed to the model")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local analysis cache")
+    parser.add_argument("--stream-pdfs", action="store_true",
+                        help="Extract and analyze PDFs page by page with bounded memory (skips the cache)")
+    parser.add_argument("--reuse-clauses", action="store_true",
+                        help="Fill clauses seen in earlier contracts from the clause store; only new clauses are sent to the model")
+    parser.add_argument("--portfolio", action="store_true",
+                        help="Add successful analyses to the portfolio index for cross-contract search")
+    args = parser.parse_args(argv)
+
+    stats = run_batch(
+        args.paths, args.output, concurrency=args.concurrency, requests_per_minute=args.rpm,
+        api_key=args.api_key, model_name=args.model, contract_type_hint=args.type_hint,
+        use_cache=not args.no_cache, stream_pdfs=args.stream_pdfs, reuse_clauses=args.reuse_clauses,
+        index_portfolio=args.portfolio
+    )
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Offline end-to-end pipeline benchmark; no API key or network needed.
+
+    python benchmarks/bench_pipeline.py --pages 1 10 100 500 --runs 5 -o results.json
+
+Synthetic contracts of each size are extracted (from a generated PDF),
+analyzed against a local stand-in for Gemini with configurable latency and
+failure rate, scored, and run through batch_runner. Each stage reports
+throughput, p50/p95 latency and peak traced memory as JSON, together with the
+git commit and environment, so runs can be compared between releases.
+"""
+import argparse
+import contextlib
+import copy
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import utils
+import batch_runner
+from contract_analyzer import ContractAnalyzer
+from extraction_service import ExtractionService
+from fake_model import FAKE_MODEL_NAME, FakeGenerativeModel
+import synthetic
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def measure(stage: str, pages: int, runs: int, fn: Callable[[], object], items_per_run: int = 1,
+            unit: str = "docs") -> Dict[str, object]:
+    """Time runs calls of fn, then one more under tracemalloc for peak memory (tracing slows it down)."""
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "stage": stage,
+        "pages": pages,
+        "runs": runs,
+        "throughput": round(runs * items_per_run / total, 3) if total else None,
+        "throughput_unit": f"{unit}/s",
+        "mean_seconds": round(total / runs, 4),
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "peak_memory_mb": round(peak / 2**20, 2),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=synthetic.ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(pages_list: List[int], runs: int, latency: float, jitter: float, failure_rate: float,
+        batch_docs: int, stages: List[str]) -> dict:
+    # The stand-in is not rate limited and retries should not dominate the timings
+    config.MODEL_RATE_LIMITS[FAKE_MODEL_NAME] = {"rpm": 10**9, "tpm": 10**12}
+    config.SCHEDULER_BASE_BACKOFF_SECONDS = min(config.SCHEDULER_BASE_BACKOFF_SECONDS, max(latency, 0.01))
+    model = FakeGenerativeModel(latency=latency, jitter=jitter, failure_rate=failure_rate)
+    analyzer = ContractAnalyzer("offline", model_name=FAKE_MODEL_NAME, model=model)
+
+    results = []
+    service = ExtractionService() if "extraction_pool" in stages else None
+    try:
+        for pages in pages_list:
+            text = synthetic.synthetic_contract(pages, seed=pages)
+            pdf = synthetic.MemoryFile(f"synthetic-{pages}.pdf", synthetic.to_pdf(text))
+
+            if "extraction" in stages:
+                results.append(measure("extraction", pages, runs, lambda: utils.extract_text(pdf),
+                                       items_per_run=pages, unit="pages"))
+            if service is not None:
+                copies = iter(range(10**9))
+
+                def extract_fresh():
+                    # A unique trailing comment defeats the memo: this measures parsing, not the cache
+                    data = pdf.getvalue() + b"%% copy %d\n" % next(copies)
+                    return service.extract(synthetic.MemoryFile(pdf.name, data))
+
+                extract_fresh() # Exclude worker start-up
+                results.append(measure("extraction_pool", pages, runs, extract_fresh, items_per_run=pages, unit="pages"))
+            if "analysis" in stages:
+                results.append(measure("analysis", pages, runs, lambda: analyzer.analyze_long_contract(text)))
+            if "scoring" in stages:
+                unscored = json.loads(model.answer(text))
+                results.append(measure("scoring", pages, runs,
+                                       lambda: analyzer.score_analysis(copy.deepcopy(unscored)),
+                                       items_per_run=len(unscored["clauses"]), unit="clauses"))
+            if "batch" in stages:
+                results.append(measure_batch(pages, runs, batch_docs, model))
+    finally:
+        if service is not None:
+            service.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model_latency_seconds": latency,
+            "model_jitter_seconds": jitter,
+            "model_failure_rate": failure_rate,
+            "model_calls": model.calls,
+            "model_failures": model.failures,
+        },
+        "results": results,
+    }
+
+def measure_batch(pages: int, runs: int, batch_docs: int, model: FakeGenerativeModel) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(batch_docs):
+            with open(os.path.join(folder, f"contract-{i:04d}.txt"), "w", encoding="utf-8") as f:
+                f.write(synthetic.synthetic_contract(pages, seed=i))
+        output = os.path.join(folder, "results.jsonl")
+        failed = []
+
+        def batch():
+            if os.path.exists(output):
+                os.remove(output) # Otherwise the rerun would skip every file
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = batch_runner.run_batch(
+                    [folder], output, concurrency=config.ANALYSIS_MAX_WORKERS, requests_per_minute=0,
+                    model_name=FAKE_MODEL_NAME, use_cache=False, model=model
+                )
+            failed.append(stats["failed"])
+
+        result = measure("batch", pages, runs, batch, items_per_run=batch_docs)
+        result["batch_docs"] = batch_docs
+        result["failed_docs"] = sum(failed)
+        return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500], help="Contract sizes in pages")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per stage and size")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per model call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Latency varies uniformly by +- this much")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of model calls that fail (retried)")
+    parser.add_argument("--batch-docs", type=int, default=20, help="Contracts per batch run")
+    parser.add_argument("--stages", nargs="+", default=["extraction", "extraction_pool", "analysis", "scoring", "batch"],
+                        choices=["extraction", "extraction_pool", "analysis", "scoring", "batch"])
+    parser.add_argument("-o", "--output", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.runs, args.latency, args.jitter, args.failure_rate, args.batch_docs, args.stages)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
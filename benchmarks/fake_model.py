@@ -0,0 +1,93 @@
+"""
+Offline stand-in for google.generativeai.GenerativeModel.
+
+Answers with canned JSON, or with a synthetic analysis of the clauses in the
+prompt, after a configurable delay, and fails a configurable share of calls
+with the same retryable errors the real API raises. Pass it to
+ContractAnalyzer(model=...) to run the pipeline without an API key.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator, List, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+import prescreen
+
+FAKE_MODEL_NAME = "benchmark-fake"
+
+class FakeResponse:
+    """Mimics a GenerateContentResponse: .text, .usage_metadata, and iteration over streamed chunks."""
+
+    def __init__(self, text: str, prompt_tokens: int, chunk_chars: int = 200):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 4)
+        self._chunk_chars = chunk_chars
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for start in range(0, len(self.text), self._chunk_chars):
+            yield SimpleNamespace(text=self.text[start:start + self._chunk_chars])
+
+class FakeGenerativeModel:
+    """
+    latency/jitter: seconds per call (uniform in latency +- jitter).
+    failure_rate: share of calls raising ServiceUnavailable or ResourceExhausted.
+    canned: optional list of JSON answers returned in turn instead of synthetic ones.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0,
+                 canned: List[str] = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.canned = canned
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next_call(self) -> Tuple[float, Optional[str]]:
+        """Count the call, maybe fail it, and return its delay and canned answer (if any)."""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            if self._rng.random() < self.failure_rate:
+                self.failures += 1
+                error = self._rng.choice([google_exceptions.ServiceUnavailable, google_exceptions.ResourceExhausted])
+                raise error("Simulated failure from the benchmark model")
+            canned = self.canned[(self.calls - 1) % len(self.canned)] if self.canned else None
+        return delay, canned
+
+    def answer(self, prompt: str) -> str:
+        """Synthetic analysis: one clause per heading of the contract text in the prompt."""
+        contract_text = prompt.split("Contract Text:", 1)[-1]
+        screen = prescreen.prescreen_contract(contract_text)
+        clauses = [
+            {key: clause[key] for key in ("id", "title", "type", "risk_level", "explanation", "recommendation")}
+            for clause in screen["clauses"] if clause["id"] != "preamble"
+        ]
+        for clause, seg in zip(clauses, (s for s in screen["segments"] if s["id"] != "preamble")):
+            clause["text"] = seg["text"][:300]
+        return json.dumps({
+            "contract_type": "Synthetic",
+            "summary": f"Synthetic analysis of {len(clauses)} clauses.",
+            "parties": ["Party A", "Party B"],
+            "contract_date": "2026-01-01",
+            "jurisdiction": "India",
+            "clauses": clauses,
+            "overall_risk_factors": sorted({t for c in screen["clauses"] for t in c["risk_terms"]}),
+        })
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs) -> FakeResponse:
+        delay, canned = self._next_call()
+        time.sleep(delay)
+        return FakeResponse(canned or self.answer(prompt), len(prompt) // 4)
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> FakeResponse:
+        delay, canned = self._next_call()
+        await asyncio.sleep(delay)
+        return FakeResponse(canned or self.answer(prompt), len(prompt) // 4)
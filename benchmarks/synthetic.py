@@ -0,0 +1,105 @@
+"""
+Synthetic contracts for benchmarks, built from the bundled templates and the
+*_sample.txt files, scaled to a target page count.
+"""
+import os
+import random
+import textwrap
+from typing import List
+
+import segmenter
+import template_generator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILES = ("employment_sample.txt", "vendor_sample.txt", "lease_sample.txt")
+
+LINE_WIDTH = 90
+LINES_PER_PAGE = 50 # ~1,700 characters of clause text per page
+
+class MemoryFile:
+    """In-memory stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+def source_texts() -> List[str]:
+    texts = [
+        template_generator.get_employment_agreement_template(),
+        template_generator.get_vendor_service_template(),
+        template_generator.get_lease_template(),
+    ]
+    for name in SAMPLE_FILES:
+        path = os.path.join(ROOT, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+    return texts
+
+def wrap_lines(text: str) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        lines.extend(textwrap.wrap(paragraph, LINE_WIDTH) or [""])
+    return lines
+
+def synthetic_contract(pages: int, seed: int = 0) -> str:
+    """
+    A contract of about `pages` pages: one source's preamble followed by clauses
+    drawn at random from all sources and renumbered in order.
+    """
+    rng = random.Random(seed)
+    sources = [segmenter.split_clauses(text) for text in source_texts()]
+    clauses = [seg for segments in sources for seg in segments if seg["id"] != "preamble"]
+    preambles = [seg["text"] for segments in sources for seg in segments if seg["id"] == "preamble"]
+
+    parts = [rng.choice(preambles)]
+    line_count = len(wrap_lines(parts[0]))
+    number = 1
+    while True:
+        seg = rng.choice(clauses)
+        body = seg["text"][len(seg["heading"]):].strip() if seg["text"].startswith(seg["heading"]) else seg["text"]
+        title = seg["heading"].lstrip("0123456789. ") or "GENERAL"
+        clause = f"{number}. {title}\n{body}"
+        clause_lines = len(wrap_lines(clause)) + 1 # Plus the blank line before it
+        if line_count + clause_lines > pages * LINES_PER_PAGE:
+            break # Stop on the last page rather than spilling onto a new one
+        parts.append(clause)
+        line_count += clause_lines
+        number += 1
+    return "\n\n".join(parts)
+
+def _pdf_escape(line: str) -> bytes:
+    escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("latin-1", errors="replace")
+
+def to_pdf(text: str) -> bytes:
+    """
+    Minimal text-only PDF (Helvetica, LINES_PER_PAGE lines per page), written
+    directly so the benchmarks need no PDF library beyond PyPDF2 for reading.
+    """
+    lines = wrap_lines(text)
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        stream = b"BT /F1 10 Tf 14 TL 40 800 Td\n" + b"".join(b"(" + _pdf_escape(line) + b") Tj T*\n" for line in page_lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+import storage
+
+# Fields of a model-produced clause that depend only on the clause wording
+STORED_FIELDS = ("title", "type", "risk_level", "explanation", "recommendation")
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8 # Two fingerprints within (BANDS - 1) bits agree on at least one band
+BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+NUMBERING_PATTERN = re.compile(r'^\s*(?:(?:article|section|clause)\s+)?[\divxlc]+(?:\.\d+)*[.)]?\s+', re.IGNORECASE)
+# Tokens that change what a clause means however few bits they move: numbers, money and negation
+SALIENT_PATTERN = re.compile(
+    r"\d+(?:[.,]\d+)*|[$₹€£%]|n't\b|\b(?:not|no|never|nor|neither|none|without|cannot|unless|except"
+    r"|rs|inr|usd|eur|lakhs?|crores?|percent|thousand|million|billion)\b"
+)
+
+def normalize_clause(text: str) -> str:
+    """Lowercased, whitespace-collapsed clause text without its leading clause number."""
+    return NUMBERING_PATTERN.sub("", storage.normalize_text(text).lower(), count=1)
+
+def simhash(text: str, shingle_size: int = 1) -> int:
+    """
+    64-bit SimHash over word shingles; near-identical texts differ in only a few bits.
+    Longer shingles make a one-word edit move more bits.
+    """
+    words = re.findall(r'\w+', text)
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+def salient_tokens(text: str) -> str:
+    """The numbers, money and negation tokens of a normalized clause, in order."""
+    return " ".join(SALIENT_PATTERN.findall(text))
+
+def _bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (i * BAND_BITS) & mask for i in range(SIMHASH_BANDS)]
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+class ClauseStore:
+    """
+    Persistent store of model analyses per clause, so boilerplate clauses seen
+    in earlier contracts are not sent to the model again.
+    Clauses are looked up by the exact hash of their normalized text first and
+    then by SimHash distance, which catches copies with small wording edits.
+    A near-duplicate is never reused when the two clauses differ in numbers,
+    money or negation. Entries are scoped to model name and prompt version.
+    """
+
+    def __init__(self, path: str = None, max_distance: int = None, shingle_size: int = None):
+        self.path = path or config.CLAUSE_STORE_PATH
+        self.max_distance = max_distance if max_distance is not None else config.CLAUSE_SIMHASH_MAX_DISTANCE
+        self.shingle_size = shingle_size or config.CLAUSE_SIMHASH_SHINGLE_SIZE
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS clauses (
+                hash TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                simhash INTEGER NOT NULL,
+                {bands},
+                payload TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                salient TEXT NOT NULL,
+                shingle_size INTEGER NOT NULL,
+                PRIMARY KEY (hash, scope)
+            )
+        """.format(bands=",\n                ".join(f"band{i} INTEGER NOT NULL" for i in range(SIMHASH_BANDS))))
+        for band in range(SIMHASH_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_clauses_band{band} ON clauses(scope, band{band})")
+        self._conn.commit()
+
+    def lookup(self, clause_text: str, scope: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Stored clause analyses for this text, or None if it has not been seen.
+        A list because the model may split one numbered clause into sub-clauses.
+        """
+        normalized = normalize_clause(clause_text)
+        key = storage.content_hash(normalized)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rowid, payload FROM clauses WHERE hash = ? AND scope = ?", (key, scope)
+            ).fetchone()
+            if row is None and self.max_distance:
+                row = self._nearest_locked(simhash(normalized, self.shingle_size), salient_tokens(normalized), scope)
+            if row is None:
+                return None
+            self._conn.execute("UPDATE clauses SET hits = hits + 1 WHERE rowid = ?", (row[0],))
+            self._conn.commit()
+        return json.loads(row[1])
+
+    def _nearest_locked(self, fingerprint: int, salient: str, scope: str):
+        bands = _bands(fingerprint)
+        where = " OR ".join(f"band{i} = ?" for i in range(SIMHASH_BANDS))
+        best, best_distance = None, self.max_distance + 1
+        for rowid, payload, candidate in self._conn.execute(
+            f"SELECT rowid, payload, simhash FROM clauses WHERE scope = ? AND salient = ? AND shingle_size = ? "
+            f"AND ({where})", (scope, salient, self.shingle_size, *bands)
+        ):
+            distance = bin(fingerprint ^ (candidate & ((1 << 64) - 1))).count("1")
+            if distance < best_distance:
+                best, best_distance = (rowid, payload), distance
+        return best
+
+    def put(self, clause_text: str, scope: str, clauses: List[Dict[str, Any]]):
+        """Remember the model's analysis of one clause (or its sub-clauses)."""
+        if not clauses:
+            return
+        normalized = normalize_clause(clause_text)
+        fingerprint = simhash(normalized, self.shingle_size)
+        payload = json.dumps(
+            [{field: clause.get(field, "") for field in ("id",) + STORED_FIELDS} for clause in clauses],
+            ensure_ascii=False
+        )
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO clauses (hash, scope, simhash, {', '.join(f'band{i}' for i in range(SIMHASH_BANDS))}, "
+                f"payload, created_at, salient, shingle_size) VALUES ({', '.join('?' * (SIMHASH_BANDS + 7))})",
+                (storage.content_hash(normalized), scope, _to_signed(fingerprint), *_bands(fingerprint), payload, time.time(),
+                 salient_tokens(normalized), self.shingle_size)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM clauses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM clauses").fetchone()
+        return {"entries": entries, "hits": hits}
@@ -11,3 +11,117 @@ GEMINI_MODEL = "gemini-1.5-flash" # Cost-effective and fast model suitable for h
 # App Settings
 APP_TITLE = "Legalis - AI Contract Risk Bot"
 APP_ICON = "⚖️"
+
+# Local Storage
+# All on-disk stores (caches, logs, indexes) live under this directory
+DATA_DIR = os.environ.get("LEGALIS_DATA_DIR", ".legalis")
+
+# Analysis Cache
+CACHE_DB_PATH = os.path.join(DATA_DIR, "analysis_cache.db")
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600 # Re-analyze after a week in case the model improved
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Audit Log
+AUDIT_DB_PATH = os.environ.get("LEGALIS_AUDIT_DB", os.path.join(DATA_DIR, "audit_log.db")) # Point replicas at one shared file
+AUDIT_PAGE_SIZE = 25 # Entries per page in the history view
+AUDIT_LEGACY_JSON_PATH = "audit_log.json" # JSON-lines log of older versions, imported once into an empty store
+
+# Long Document Mode
+# Contracts longer than this are split at clause boundaries and analyzed chunk by chunk
+LONG_DOC_THRESHOLD_CHARS = 30000
+CHUNK_MAX_CHARS = 24000
+CHUNK_OVERLAP_CHARS = 1500
+ANALYSIS_MAX_WORKERS = 4 # Concurrent Gemini requests per analysis
+MAX_CONCURRENT_REQUESTS = 8 # In-flight Gemini calls per AsyncContractAnalyzer
+
+# Text Extraction
+EXTRACTION_WORKERS = None # Process pool size; None = one per CPU core
+EXTRACTION_PAGES_PER_TASK = 25 # PDF pages parsed per worker task
+EXTRACTION_MEMO_SIZE = 32 # Extracted documents kept in memory, keyed by file hash
+
+# Request Scheduling
+# Per-model budgets (requests and tokens per minute); adjust to your Gemini quota tier
+MODEL_RATE_LIMITS = {
+    "gemini-1.5-flash": {"rpm": 15, "tpm": 1000000},
+    "gemini-pro": {"rpm": 60, "tpm": 120000},
+    "gemini-1.5-pro-latest": {"rpm": 2, "tpm": 32000},
+}
+DEFAULT_RATE_LIMITS = {"rpm": 15, "tpm": 1000000}
+EXPECTED_OUTPUT_TOKENS = 2048 # Added to the prompt estimate when reserving token budget
+SCHEDULER_MAX_RETRIES = 5
+SCHEDULER_BASE_BACKOFF_SECONDS = 1.0
+SCHEDULER_MAX_BACKOFF_SECONDS = 60.0
+SCHEDULER_MAX_WAIT_SECONDS = 300 # Give up (with an error) after queueing this long
+
+# spaCy Entity Extraction
+SPACY_MODEL = "en_core_web_sm"
+SPACY_MAX_CHARS = 100000 # Longer texts are split into pieces of this size
+SPACY_BATCH_SIZE = 32
+SPACY_N_PROCESS = -1 # -1 = one process per CPU core for large batches
+
+# Local Pre-screen
+PRESCREEN_THRESHOLD = 7 # Clause score (0-10) at which a clause is worth sending to the model
+PRESCREEN_FULL_FRACTION = 0.5 # Above this share of risky clauses, analyze the whole contract
+
+# Clause Store
+CLAUSE_STORE_PATH = os.path.join(DATA_DIR, "clause_store.db")
+CLAUSE_SIMHASH_MAX_DISTANCE = 2 # Max differing SimHash bits (up to 7) for a near-duplicate clause; 0 = exact matches only
+CLAUSE_SIMHASH_SHINGLE_SIZE = 2 # Words per SimHash shingle; pairs make a one-word edit move more bits
+
+# Instrumentation
+METRICS_LOG_PATH = os.environ.get("LEGALIS_METRICS_LOG") # JSON line per span/counter; unset = off
+METRICS_PROMETHEUS_FILE = os.environ.get("LEGALIS_METRICS_FILE") # Prometheus textfile written after each analysis; unset = off
+METRICS_PROMETHEUS_PORT = int(os.environ.get("LEGALIS_METRICS_PORT", "0")) # Serve /metrics on this port; 0 = off
+
+# Portfolio Index
+PORTFOLIO_DB_PATH = os.path.join(DATA_DIR, "portfolio.db")
+PORTFOLIO_PAGE_SIZE = 50 # Rows per page in the portfolio search
+
+# Revision Tracking
+REVISIONS_DB_PATH = os.path.join(DATA_DIR, "revisions.db") # Earlier versions of negotiated contracts, diffed by clause
+
+# Prompt Preparation
+# Max contract-text tokens per prompt; longer text is cut at a clause boundary
+PROMPT_TOKEN_BUDGETS = {
+    "gemini-1.5-flash": 30000,
+    "gemini-pro": 28000, # 30k-token context, minus room for the instructions
+    "gemini-1.5-pro-latest": 16000, # Small per-minute token quota
+}
+DEFAULT_PROMPT_TOKEN_BUDGET = 8000
+PROMPT_CHARS_PER_TOKEN = 4 # Estimate used before asking the model's count_tokens
+PROMPT_FURNITURE_MIN_REPEATS = 3 # A short line repeated this often is a running header/footer
+PROMPT_FURNITURE_MAX_CHARS = 100
+PROMPT_FURNITURE_MIN_GAP_LINES = 10 # ...at most once per this many lines, i.e. once per page
+PROMPT_DEDUPE_MIN_CHARS = 200 # Repeated paragraphs at least this long are sent once
+
+# Background Jobs
+JOB_DB_PATH = os.path.join(DATA_DIR, "jobs.db")
+JOB_WORKERS = 2 # Analyses run at once per app process; more uploads wait in the queue
+JOB_MAX_PENDING = 50 # Submissions beyond this many waiting jobs are refused
+JOB_POLL_SECONDS = 2 # How often the UI and idle workers check the queue
+JOB_STALE_SECONDS = 600 # A running job without a heartbeat this long is requeued
+JOB_MAX_ATTEMPTS = 2
+JOB_QUEUED_TTL_SECONDS = 3600 # A job still waiting after this long is failed instead of blocking the queue
+
+# Tiered Model Routing
+ROUTING_FAST_MODEL = "gemini-1.5-flash" # First pass over the whole contract
+ROUTING_ESCALATION_MODEL = "gemini-1.5-pro-latest" # Re-analyzes only the risky clauses
+ROUTING_ESCALATION_SCORE = 7 # Escalate clauses with a RiskScorer score at or above this...
+ROUTING_ESCALATION_LEVELS = ("High",) # ...or that the first pass rated at one of these levels
+
+# Template Registry
+TEMPLATE_DB_PATH = os.path.join(DATA_DIR, "templates.db") # Known templates with their cached analyses
+TEMPLATE_CANDIDATES = 3 # Templates nearest by fingerprint that are aligned clause by clause
+TEMPLATE_MIN_COVERAGE = 0.5 # Share of clauses that must conform before the template fast path is used
+TEMPLATE_MAX_FILL_CHARS = 60 # Longest name, title or place accepted in place of a placeholder like [Employer Name]
+
+# Structured Output
+STRUCTURED_OUTPUT = True # Request JSON with a response schema from models that support it
+STRUCTURED_OUTPUT_MODELS = ("gemini-1.5-flash", "gemini-1.5-pro-latest") # gemini-pro rejects response_mime_type
+JSON_REPAIR_MAX_REQUESTS = 2 # Follow-up requests for clauses lost from a malformed or cut-off answer
+
+# Translation
+TRANSLATION_DB_PATH = os.path.join(DATA_DIR, "translations.db") # English translations of Hindi paragraphs, by text hash
+TRANSLATION_MIN_RATIO = 0.3 # Share of a paragraph's letters in Devanagari for it to be translated
+TRANSLATION_BATCH_CHARS = 12000 # Hindi text sent per translation request
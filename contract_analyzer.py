@@ -1,18 +1,87 @@
+import asyncio
+import contextvars
 import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from google.api_core import exceptions as google_exceptions
 import config
+import analysis_model
+import metrics
+import revisions
+import storage
 from risk_scorer import RiskScorer
+import segmenter
+import prescreen
+import prompt_prep
+import translation
+from json_stream import AnswerRepair, ClauseStreamParser
+from request_scheduler import QueueTimeout, estimate_tokens, get_scheduler
+
+# Bump whenever the prompt or post-processing changes so cached analyses are not reused
+PROMPT_VERSION = "1"
+
+# One model per (api_key, model_name) and one pair of API clients per key, shared by every analyzer in the process
+_models = {}
+_clients = {}
+_models_lock = threading.Lock()
+
+def get_model(api_key: str, model_name: str):
+    """
+    Return the shared GenerativeModel for (api_key, model_name), creating it once.
+    The model is bound to its own key's sync and async clients instead of the
+    process-global genai.configure key, so analyses running at the same time
+    for different users never send a request under each other's key.
+    """
+    with _models_lock:
+        model = _models.get((api_key, model_name))
+        if model is None:
+            clients = _clients.get(api_key)
+            if clients is None:
+                options = {"api_key": api_key}
+                clients = (glm.GenerativeServiceClient(client_options=options),
+                           glm.GenerativeServiceAsyncClient(client_options=options))
+                _clients[api_key] = clients
+            model = genai.GenerativeModel(model_name)
+            # Without these the model falls back to the default clients of the last genai.configure call
+            model._client, model._async_client = clients
+            _models[(api_key, model_name)] = model
+        return model
+
+def generation_config(model_name: str):
+    """JSON mime type and response schema for models with structured output, else None."""
+    if not config.STRUCTURED_OUTPUT or model_name not in config.STRUCTURED_OUTPUT_MODELS:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": analysis_model.RESPONSE_SCHEMA}
 
 class ContractAnalyzer:
-    def __init__(self, api_key=None, model_name=None):
+    def __init__(self, api_key=None, model_name=None, cache=None, clause_store=None, model=None,
+                 template_registry=None, translation_cache=None):
         self.api_key = api_key or config.GOOGLE_API_KEY
         self.model_name = model_name or config.GEMINI_MODEL
-        self.model = None
-        if self.api_key and "YOUR_API_KEY" not in self.api_key:
+        # A model object passed in (anything with generate_content, e.g. the offline
+        # stand-in in benchmarks/) is used as is instead of configuring Gemini
+        self.model = model
+        self._model_injected = model is not None
+        self.cache = cache # Optional AnalysisCache
+        self.last_cache_hit = False
+        self.clause_store = clause_store # Optional ClauseStore
+        self.template_registry = template_registry # Optional TemplateRegistry
+        self.translation_cache = translation_cache # Optional TranslationCache
+        self.last_translation_stats = None # Set by translate_text
+        self.generation_config = generation_config(self.model_name)
+        # Shared per-model budget: requests queue instead of failing when the quota is hit
+        self.scheduler = get_scheduler(self.model_name)
+        # Running token totals from response usage metadata (shared by chunk threads)
+        self.token_usage = {"prompt_tokens": 0, "output_tokens": 0, "requests": 0}
+        self.last_prompt_stats = None # Set by prepare_text
+        self._usage_lock = threading.Lock()
+        if self.model is None and self.api_key and "YOUR_API_KEY" not in self.api_key:
              try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(self.model_name)
+                self.model = get_model(self.api_key, self.model_name)
              except Exception as e:
                  print(f"Error configuring Gemini: {e}")
                  
@@ -22,17 +91,260 @@ class ContractAnalyzer:
         """
         Analyze contract using Google Gemini API.
         Returns a dictionary with structured analysis.
+        If a cache is configured, a repeat of the same text/hint/model/prompt
+        returns the stored final analysis without calling the API.
+        """
+        return self._cached(
+            contract_text, contract_type_hint, PROMPT_VERSION,
+            lambda: self._analyze_uncached(contract_text, contract_type_hint)
+        )
+
+    def analyze_contract_stream(self, contract_text: str, contract_type_hint: str = "General") -> Iterator[Dict[str, Any]]:
         """
+        Streaming variant of analyze_contract.
+        Yields {"type": "clause", "clause": {...}} for each clause as soon as the model
+        has finished writing it (already carrying its risk_score), then a final
+        {"type": "result", "analysis": {...}} with the same dict analyze_contract returns.
+        """
+        self.last_cache_hit = False
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(contract_text, contract_type_hint, self.model_name, PROMPT_VERSION)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.last_cache_hit = True
+                for clause in cached.get("clauses", []):
+                    yield {"type": "clause", "clause": clause}
+                yield {"type": "result", "analysis": cached}
+                return
+
+        analysis = yield from self._stream_uncached(contract_text, contract_type_hint)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, analysis)
+        yield {"type": "result", "analysis": analysis}
+
+    def _stream_uncached(self, contract_text: str, contract_type_hint: str):
         if not self.model:
             return {
                 "error": "API Key not configured. Please provide a valid Google API Key."
             }
-            
-        prompt = f"""
+
+        parser = ClauseStreamParser()
+        prompt, warning = self._build_prompt(contract_text, contract_type_hint)
+        try:
+            # Only opening the stream is retried; a stream that fails midway surfaces as an error
+            response = self.scheduler.run(lambda: self._generate(prompt, stream=True), estimate_tokens(prompt))
+            # Includes the time the caller spends handling each yielded clause
+            with metrics.span("model_stream", model=self.model_name):
+                for chunk in response:
+                    for clause in parser.feed(chunk.text):
+                        clause = analysis_model.Clause.from_dict(clause).to_dict()
+                        clause["risk_score"] = self.scorer.calculate_clause_risk(
+                            clause.get("text", "") + " " + clause.get("title", ""),
+                            clause.get("type", "")
+                        )
+                        yield {"type": "clause", "clause": clause}
+            self._record_usage(response)
+            try:
+                analysis = parse_model_json(parser.text)
+            except json.JSONDecodeError:
+                # Keep the clauses already streamed and ask only for the ones that were lost
+                analysis = self._repair_analysis(prompt, parser.text)
+        except Exception as e:
+            return self._error_result(e, parser.text)
+
+        return self.score_analysis(_with_warning(analysis, warning))
+
+    def analyze_long_contract(self, contract_text: str, contract_type_hint: str = "General",
+                              max_workers: int = None) -> dict:
+        """
+        Long-document mode: split the contract at clause boundaries into overlapping
+        chunks, analyze the chunks concurrently and merge them into one analysis.
+        Contracts that fit in a single prompt go through analyze_contract unchanged.
+        """
+        if len(contract_text) <= config.LONG_DOC_THRESHOLD_CHARS:
+            return self.analyze_contract(contract_text, contract_type_hint)
+
+        return self._cached(
+            contract_text, contract_type_hint, f"{PROMPT_VERSION}/chunked",
+            lambda: self._analyze_chunked(contract_text, contract_type_hint, max_workers)
+        )
+
+    def analyze_pages(self, pages: Iterable[str], contract_type_hint: str = "General",
+                      max_workers: int = None) -> dict:
+        """
+        Long-document mode for text that arrives page by page (e.g. utils.iter_pdf_pages).
+        Chunks are sent to the model as soon as they are complete, while later pages
+        are still being extracted. The full text is never held in memory, so this
+        path does not use the analysis cache.
+        """
+        self.last_cache_hit = False
+        chunks = segmenter.iter_chunks(pages, config.CHUNK_MAX_CHARS, config.CHUNK_OVERLAP_CHARS)
+        return self._analyze_chunks(chunks, contract_type_hint, max_workers)
+
+    def get_cached_analysis(self, contract_text: str, contract_type_hint: str = "General"):
+        """Return the cached result analyze_long_contract would give, or None. Never calls the API."""
+        self.last_cache_hit = False
+        if self.cache is None:
+            return None
+        prompt_version = PROMPT_VERSION
+        if len(contract_text) > config.LONG_DOC_THRESHOLD_CHARS:
+            prompt_version = f"{PROMPT_VERSION}/chunked"
+        cached = self.cache.get(self.cache.make_key(contract_text, contract_type_hint, self.model_name, prompt_version))
+        self.last_cache_hit = cached is not None
+        return cached
+
+    def _cached(self, contract_text: str, contract_type_hint: str, prompt_version: str, compute) -> dict:
+        """Serve from self.cache if possible, otherwise compute and store the final analysis."""
+        self.last_cache_hit = False
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(contract_text, contract_type_hint, self.model_name, prompt_version)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.last_cache_hit = True
+                return cached
+
+        analysis = compute()
+
+        if cache_key is not None:
+            self.cache.put(cache_key, analysis)
+        return analysis
+
+    def build_prompt(self, contract_text: str, contract_type_hint: str = "General", excerpt_note: str = "") -> str:
+        return self._build_prompt(contract_text, contract_type_hint, excerpt_note)[0]
+
+    def _build_prompt(self, contract_text: str, contract_type_hint: str = "General",
+                      excerpt_note: str = "") -> Tuple[str, Optional[str]]:
+        """
+        The prompt, and a warning saying what was left out if the text had to be
+        cut (at a clause boundary) to fit the model's token budget.
+        """
+        with metrics.span("build_prompt"):
+            budget = prompt_prep.token_budget(self.model_name)
+            fitted, _ = prompt_prep.fit_to_budget(contract_text, budget, self.count_tokens)
+            warning = None
+            if len(fitted) < len(contract_text):
+                dropped = contract_text[len(fitted):]
+                heading = segmenter.HEADING_PATTERN.search(dropped)
+                where = f" from '{dropped[heading.start():].strip().splitlines()[0]}' on" if heading else ""
+                warning = (f"The text was cut to fit the {budget:,}-token prompt budget of {self.model_name}; "
+                           f"the last {len(dropped.strip()):,} characters{where} were not analyzed.")
+                metrics.increment("prompt_truncations", 1, model=self.model_name)
+            return self._format_prompt(fitted, contract_type_hint, excerpt_note), warning
+
+    def prepare_text(self, contract_text: str) -> str:
+        """
+        Prompt preparation stage, run once on freshly extracted text before it is
+        analyzed: strips page furniture, rejoins broken lines and drops duplicated
+        boilerplate (prompt_prep.compact_text). The tokens saved are kept in
+        last_prompt_stats and the prompt_tokens_saved metric, estimated locally:
+        this runs before the cache lookup, so a cache hit makes no network call.
+        """
+        with metrics.span("prepare_text"):
+            compacted = prompt_prep.compact_text(contract_text)
+        tokens_before = prompt_prep.estimate_tokens(contract_text)
+        tokens_after = prompt_prep.estimate_tokens(compacted)
+        self.last_prompt_stats = {
+            "chars_before": len(contract_text),
+            "chars_after": len(compacted),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+        }
+        metrics.increment("prompt_tokens_saved", tokens_before - tokens_after, model=self.model_name)
+        return compacted
+
+    def translate_text(self, contract_text: str) -> str:
+        """
+        Translation stage for Hindi and bilingual contracts, run after prepare_text.
+        Each paragraph is routed by script (translation.language_units); only
+        Hindi ones are translated to English, in batched requests, so the
+        analysis prompt stays smaller. Translations are kept in the translation
+        cache by paragraph hash; paragraphs that fail to translate stay in Hindi.
+        Counts go to last_translation_stats.
+        """
+        with metrics.span("detect_language"):
+            units = [unit for unit in translation.language_units(contract_text) if unit["language"] == "Hindi"]
+        stats = {"hindi_segments": len(units), "cached": 0, "translated": 0}
+        self.last_translation_stats = stats
+        if not units:
+            return contract_text
+
+        translations, pending = {}, []
+        for unit in units:
+            if unit["text"] in translations or unit["text"] in pending:
+                continue
+            cached = self.translation_cache.get(unit["text"]) if self.translation_cache is not None else None
+            if cached is not None:
+                translations[unit["text"]] = cached
+                stats["cached"] += 1
+            else:
+                pending.append(unit["text"])
+
+        if pending and self.model:
+            for source, translated in zip(pending, self._translate(pending)):
+                if translated:
+                    translations[source] = translated
+                    stats["translated"] += 1
+                    if self.translation_cache is not None:
+                        self.translation_cache.put(source, translated)
+        metrics.increment("translation_cache_hits", stats["cached"], model=self.model_name)
+        return translation.apply_translations(contract_text, units, translations)
+
+    def _translate(self, texts: List[str]) -> List[str]:
+        """English translations of texts (None where a batch failed), TRANSLATION_BATCH_CHARS per request."""
+        batches, batch, size = [], [], 0
+        for text in texts:
+            if batch and size + len(text) > config.TRANSLATION_BATCH_CHARS:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text)
+        batches.append(batch)
+
+        results = []
+        for batch in batches:
+            passages = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(batch, start=1))
+            prompt = (
+                "Translate each numbered passage of this Indian contract from Hindi to English. "
+                "Keep clause numbers, names, amounts and dates as they are. Return only a JSON array "
+                f"with {len(batch)} strings, the English translation of each passage in order.\n\n{passages}"
+            )
+            content = None
+            try:
+                response = self.scheduler.run(
+                    lambda: self._generate(prompt, generation_config={"response_mime_type": "application/json"}
+                                           if self.generation_config is not None else None),
+                    estimate_tokens(prompt)
+                )
+                self._record_usage(response)
+                content = response.text
+                translated = json.loads(strip_code_fences(content))
+                if not isinstance(translated, list) or len(translated) != len(batch):
+                    raise ValueError(f"expected {len(batch)} translations")
+                results.extend(str(text) if text else None for text in translated)
+            except Exception as e:
+                print(f"Translation failed, keeping the Hindi text: {e}")
+                results.extend([None] * len(batch))
+        return results
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens in text per the model's count_tokens, or a character estimate if that is unavailable."""
+        try:
+            with metrics.span("count_tokens", model=self.model_name):
+                return self.model.count_tokens(text).total_tokens
+        except Exception:
+            return prompt_prep.estimate_tokens(text)
+
+    def _format_prompt(self, contract_text: str, contract_type_hint: str, excerpt_note: str) -> str:
+        return f"""
         You are a legal contract analyst specializing in Indian SME contracts.
         
         Analyze this {contract_type_hint} contract text and provide a structured JSON output.
         Focus on identifying risks, obligations, and key terms.
+        {excerpt_note}
         
         Output format (STRICTLY JSON, no markdown code blocks, just the raw JSON):
         {{
@@ -56,23 +368,528 @@ class ContractAnalyzer:
         }}
         
         Contract Text:
-        {contract_text[:30000]} 
+        {contract_text}
         """
-        # Truncating to 30k chars to stay within safe limits, though Gemini has large context.
-        
+
+    def _analyze_uncached(self, contract_text: str, contract_type_hint: str) -> dict:
+        analysis = self._request_analysis(*self._build_prompt(contract_text, contract_type_hint))
+        if "error" in analysis:
+            return analysis
+        return self.score_analysis(analysis)
+
+    def _analyze_chunked(self, contract_text: str, contract_type_hint: str, max_workers: int = None) -> dict:
+        chunks = segmenter.chunk_text(contract_text, config.CHUNK_MAX_CHARS, config.CHUNK_OVERLAP_CHARS)
+        return self._analyze_chunks(chunks, contract_type_hint, max_workers)
+
+    def _analyze_chunks(self, chunks: Iterable[str], contract_type_hint: str, max_workers: int = None) -> dict:
+        """Analyze chunks on a bounded pool as they arrive, then merge and score once."""
+        analysis = self._request_chunks(chunks, contract_type_hint, max_workers)
+        if "error" in analysis:
+            return analysis
+        return self.score_analysis(analysis)
+
+    def _request_chunks(self, chunks: Iterable[str], contract_type_hint: str, max_workers: int = None,
+                        excerpt_note: str = None) -> dict:
+        """Send chunks to the model concurrently and merge the (unscored) results."""
+        max_workers = max_workers or config.ANALYSIS_MAX_WORKERS
+        results = {}
+        pending = {}
+        # Bounded pool: wall-clock grows with len(chunks) / max_workers rather than len(chunks)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for i, chunk in enumerate(chunks, start=1):
+                prompt, warning = self._build_prompt(chunk, contract_type_hint, excerpt_note=excerpt_note or (
+                    f"This is excerpt {i} from a longer contract. Analyze only the clauses "
+                    "in this excerpt and use the contract's own clause numbers as clause ids."
+                ))
+                # Copy the context so the worker's spans land in the caller's metrics trace
+                pending[pool.submit(contextvars.copy_context().run, self._request_analysis, prompt, warning)] = i
+                # Don't let a fast producer queue up the whole document in memory
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+            for future in pending:
+                results[pending[future]] = future.result()
+
+        return merge_chunk_results([results[i] for i in sorted(results)])
+
+    def analyze_segments(self, segments: List[dict], contract_type_hint: str = "General") -> dict:
+        """
+        Send only the given segmenter segments to the model.
+        Returns the unscored analysis, with clause ids matching the segment ids
+        so the result can be merged back with merge_segment_results.
+        """
+        if not segments:
+            return {"clauses": []}
+        note = (
+            "These are selected clauses from a longer contract, not the whole document. "
+            "Analyze only these clauses. Use the number at the start of each clause as its id, "
+            "and the id 'preamble' for text marked [preamble]."
+        )
+        texts = [seg["text"] if seg["id"] != "preamble" else f"[preamble]\n{seg['text']}" for seg in segments]
+        if sum(len(t) + 2 for t in texts) <= config.LONG_DOC_THRESHOLD_CHARS:
+            return self._request_analysis(*self._build_prompt("\n\n".join(texts), contract_type_hint, excerpt_note=note))
+        chunks = segmenter.chunk_segments([dict(seg, text=t) for seg, t in zip(segments, texts)], config.CHUNK_MAX_CHARS)
+        return self._request_chunks(chunks, contract_type_hint, excerpt_note=note)
+
+    def analyze_with_clause_store(self, contract_text: str, contract_type_hint: str = "General") -> dict:
+        """
+        Analyze only the clauses the clause store has not seen before.
+        Clauses whose normalized text (or a near-duplicate of it) was analyzed in an
+        earlier contract are filled in from the store; the rest, plus the preamble
+        (parties and dates are document specific), are sent to the model and their
+        analyses stored for next time. Falls back to analyze_long_contract when no
+        clause store is configured.
+        """
+        if self.clause_store is None:
+            return self.analyze_long_contract(contract_text, contract_type_hint)
+        return self._cached(
+            contract_text, contract_type_hint, f"{PROMPT_VERSION}/clauses",
+            lambda: self._analyze_with_clause_store(contract_text, contract_type_hint)
+        )
+
+    def _analyze_with_clause_store(self, contract_text: str, contract_type_hint: str) -> dict:
+        scope = f"{self.model_name}/{PROMPT_VERSION}"
+        segments = segmenter.split_clauses(contract_text)
+        known = {}
+        for seg in segments:
+            if seg["id"] == "preamble":
+                continue
+            stored = self.clause_store.lookup(seg["text"], scope)
+            if stored is not None:
+                # Stored ids are relative to the clause number ("" or a sub-id like ".1")
+                known[seg["id"]] = [dict(c, id=seg["id"] + c["id"], text=seg["text"]) for c in stored]
+        novel = [seg for seg in segments if seg["id"] not in known]
+
+        if novel:
+            if not self.model:
+                return {"error": "API Key not configured. Please provide a valid Google API Key."}
+            llm_analysis = self.analyze_segments(novel, contract_type_hint)
+            if "error" in llm_analysis:
+                return llm_analysis
+            by_segment, _ = match_segment_clauses(novel, llm_analysis.get("clauses", []) or [])
+            for seg in novel:
+                if seg["id"] != "preamble" and seg["id"] in by_segment:
+                    self.clause_store.put(seg["text"], scope, [
+                        dict(c, id=c["id"][len(seg["id"]):]) for c in by_segment[seg["id"]]
+                    ])
+        else:
+            llm_analysis = {
+                "contract_type": contract_type_hint,
+                "summary": f"All {len(known)} clauses match clauses analyzed in earlier contracts.",
+                "parties": [],
+                "contract_date": "",
+                "jurisdiction": "",
+                "overall_risk_factors": [],
+            }
+
+        analysis = merge_segment_results(segments, known, llm_analysis)
+        analysis["clause_reuse"] = {"reused": len(known), "analyzed": len(novel)}
+        return self.score_analysis(analysis)
+
+    def analyze_revision(self, contract_text: str, previous_text: str, previous_analysis: dict,
+                         contract_type_hint: str = "General") -> dict:
+        """
+        Re-analyze a revised version of a contract that was analyzed before.
+        Both versions are diffed clause by clause: unchanged clauses keep their
+        previous analysis and only added or modified clauses (and the preamble,
+        if it changed) are sent to the model. The merged clauses are re-scored,
+        and result["revision"] lists the changes and the risk delta against the
+        previous version.
+        """
+        return self._cached(
+            contract_text, contract_type_hint, f"{PROMPT_VERSION}/revision-{storage.content_hash(previous_text)[:16]}",
+            lambda: self._analyze_revision(contract_text, previous_text, previous_analysis, contract_type_hint)
+        )
+
+    def _analyze_revision(self, contract_text: str, previous_text: str, previous_analysis: dict,
+                          contract_type_hint: str) -> dict:
+        old_segments = segmenter.split_clauses(previous_text)
+        segments = segmenter.split_clauses(contract_text)
+        diff = revisions.diff_clauses(old_segments, segments)
+        old_clauses, unplaced = match_segment_clauses(old_segments, previous_analysis.get("clauses", []) or [])
+
+        carried = {}
+        for new_id, old_id in diff["unchanged"].items():
+            if old_id in old_clauses:
+                carried[new_id] = [dict(c, id=new_id + c["id"][len(old_id):]) for c in old_clauses[old_id]]
+            elif not unplaced:
+                # The model reported nothing for this clause last time, and it has not changed
+                carried[new_id] = []
+        # Unchanged clauses whose previous analysis cannot be located are re-analyzed too
+        changed = [seg for seg in segments if seg["id"] not in carried]
+
+        header = {key: previous_analysis.get(key) for key in
+                  ("contract_type", "summary", "parties", "contract_date", "jurisdiction")}
+        risk_factors = list(previous_analysis.get("overall_risk_factors", []) or [])
+        llm_clauses = []
+        if changed:
+            if not self.model:
+                return {"error": "API Key not configured. Please provide a valid Google API Key."}
+            llm_analysis = self.analyze_segments(changed, contract_type_hint)
+            if "error" in llm_analysis:
+                return llm_analysis
+            llm_clauses = llm_analysis.get("clauses", []) or []
+            if any(seg["id"] == "preamble" for seg in changed):
+                # Parties and dates live in the preamble, so take them from the new answer
+                for key in ("parties", "contract_date", "jurisdiction"):
+                    header[key] = llm_analysis.get(key) or header[key]
+            risk_factors += [f for f in llm_analysis.get("overall_risk_factors", []) or [] if f not in risk_factors]
+
+        analysis = merge_segment_results(segments, carried, dict(header, clauses=llm_clauses,
+                                                                  overall_risk_factors=risk_factors))
+        analysis = self.score_analysis(analysis)
+
+        new_clauses, _ = match_segment_clauses(segments, analysis["clauses"])
+        old_titles = {seg["id"]: seg["heading"] for seg in old_segments}
+        new_titles = {seg["id"]: seg["heading"] for seg in segments}
+
+        def top_score(clauses):
+            return max((c.get("risk_score", 0) for c in clauses), default=None)
+
+        changes = [
+            {"id": seg_id, "change": "modified", "title": new_titles[seg_id],
+             "score_before": top_score(old_clauses.get(old_id, [])), "score_after": top_score(new_clauses.get(seg_id, []))}
+            for seg_id, old_id in diff["modified"].items()
+        ] + [
+            {"id": seg_id, "change": "added", "title": new_titles[seg_id],
+             "score_before": None, "score_after": top_score(new_clauses.get(seg_id, []))}
+            for seg_id in diff["added"]
+        ] + [
+            {"id": seg_id, "change": "removed", "title": old_titles[seg_id],
+             "score_before": top_score(old_clauses.get(seg_id, [])), "score_after": None}
+            for seg_id in diff["removed"]
+        ]
+        analysis["revision"] = {
+            "unchanged": len(diff["unchanged"]),
+            "analyzed": len(changed),
+            "changes": changes,
+            "risk_delta": revisions.risk_delta(previous_analysis, analysis),
+        }
+        return analysis
+
+    def analyze_with_templates(self, contract_text: str, contract_type_hint: str = "General") -> dict:
+        """
+        Template-deviation fast path: align the contract to its closest known
+        template and send only the clauses that deviate from it to the model.
+        Clauses that match a template clause (with any values in its placeholders)
+        reuse the template's cached analysis, computed once per model; parties
+        and dates come from the placeholder fills. result["template_match"] names
+        the template and lists the deviating and missing clauses. Contracts that
+        match no template go through analyze_long_contract.
+        """
+        if self.template_registry is None:
+            return self.analyze_long_contract(contract_text, contract_type_hint)
+        return self._cached(
+            contract_text, contract_type_hint, f"{PROMPT_VERSION}/template",
+            lambda: self._analyze_with_templates(contract_text, contract_type_hint)
+        )
+
+    def _analyze_with_templates(self, contract_text: str, contract_type_hint: str) -> dict:
+        segments = segmenter.split_clauses(contract_text)
+        with metrics.span("template_match"):
+            match = self.template_registry.match(contract_text, segments)
+        if match is None:
+            return self.analyze_long_contract(contract_text, contract_type_hint)
+
+        template = self.template_registry.get(match["template"])
+        scope = f"{self.model_name}/{PROMPT_VERSION}"
+        template_analysis = self.template_registry.analysis(template["name"], scope)
+        if template_analysis is None:
+            if not self.model:
+                return {"error": "API Key not configured. Please provide a valid Google API Key."}
+            template_analysis = self.analyze_long_contract(template["text"], contract_type_hint)
+            if "error" in template_analysis:
+                return template_analysis
+            self.template_registry.store_analysis(template["name"], scope, template_analysis)
+
+        template_clauses, unplaced = match_segment_clauses(template["segments"],
+                                                           template_analysis.get("clauses", []) or [])
+        texts = {seg["id"]: seg["text"] for seg in segments}
+        kept = {}
+        for seg_id, template_id in match["conforming"].items():
+            if template_id in template_clauses:
+                kept[seg_id] = [dict(c, id=seg_id + c["id"][len(template_id):], text=texts[seg_id])
+                                for c in template_clauses[template_id]]
+            elif not unplaced:
+                # The model reported nothing for this template clause
+                kept[seg_id] = []
+        deviating = [seg for seg in segments if seg["id"] not in kept]
+
+        fills = match["fills"]
+        header = {key: template_analysis.get(key) for key in
+                  ("contract_type", "summary", "parties", "contract_date", "jurisdiction")}
+        header["parties"] = [value for name, value in fills.items() if "name" in name.lower()] or header["parties"]
+        header["contract_date"] = next((value for name, value in fills.items() if "date" in name.lower()),
+                                       header["contract_date"])
+        risk_factors = list(template_analysis.get("overall_risk_factors", []) or [])
+        llm_clauses = []
+        if deviating:
+            if not self.model:
+                return {"error": "API Key not configured. Please provide a valid Google API Key."}
+            llm_analysis = self.analyze_segments(deviating, contract_type_hint)
+            if "error" in llm_analysis:
+                return llm_analysis
+            llm_clauses = llm_analysis.get("clauses", []) or []
+            if any(seg["id"] == "preamble" for seg in deviating):
+                for key in ("parties", "contract_date", "jurisdiction"):
+                    header[key] = llm_analysis.get(key) or header[key]
+            risk_factors += [f for f in llm_analysis.get("overall_risk_factors", []) or [] if f not in risk_factors]
+        metrics.increment("template_clauses_reused", len(kept), model=self.model_name)
+
+        analysis = merge_segment_results(segments, kept, dict(header, clauses=llm_clauses,
+                                                               overall_risk_factors=risk_factors))
+        analysis["template_match"] = {
+            "template": match["template"],
+            "coverage": match["coverage"],
+            "reused": len(kept),
+            "deviating": [seg["id"] for seg in deviating],
+            "missing": match["missing"],
+        }
+        return self.score_analysis(analysis)
+
+    def analyze_tiered(self, contract_text: str, contract_type_hint: str = "General", fast_model: str = None,
+                       escalation_model: str = None, threshold: int = None) -> dict:
+        """
+        Tiered routing: analyze the whole contract with the fast model, then send
+        only the clauses that look risky (RiskScorer score >= threshold, or a risk
+        level in ROUTING_ESCALATION_LEVELS) to the larger model and merge its
+        answers back in place of the first-pass ones. result["routing"] records
+        which clauses were escalated and the time and requests spent per tier.
+        """
+        fast_model = fast_model or config.ROUTING_FAST_MODEL
+        escalation_model = escalation_model or config.ROUTING_ESCALATION_MODEL
+        threshold = threshold if threshold is not None else config.ROUTING_ESCALATION_SCORE
+        return self._cached(
+            contract_text, contract_type_hint, f"{PROMPT_VERSION}/tiered-{fast_model}-{escalation_model}-{threshold}",
+            lambda: self._analyze_tiered(contract_text, contract_type_hint, fast_model, escalation_model, threshold)
+        )
+
+    def _tier(self, model_name: str) -> "ContractAnalyzer":
+        """An analyzer for another model sharing this one's key and stores (and an injected model)."""
+        if model_name == self.model_name:
+            return self
+        return ContractAnalyzer(self.api_key, model_name=model_name, cache=self.cache, clause_store=self.clause_store,
+                                model=self.model if self._model_injected else None)
+
+    def _analyze_tiered(self, contract_text: str, contract_type_hint: str, fast_model: str,
+                        escalation_model: str, threshold: int) -> dict:
+        routing = {"fast_model": fast_model, "escalation_model": escalation_model, "threshold": threshold,
+                   "escalated": [], "tiers": {}}
+
+        def run_tier(tier: str, analyzer: "ContractAnalyzer", compute) -> dict:
+            requests_before = analyzer.token_usage["requests"]
+            started = time.perf_counter()
+            with metrics.span("routing_tier", tier=tier, model=analyzer.model_name):
+                result = compute()
+            routing["tiers"][tier] = {
+                "model": analyzer.model_name,
+                "seconds": round(time.perf_counter() - started, 3),
+                "requests": analyzer.token_usage["requests"] - requests_before,
+            }
+            if analyzer is not self:
+                with self._usage_lock:
+                    for key in self.token_usage:
+                        self.token_usage[key] += analyzer.token_usage[key]
+            return result
+
+        fast = self._tier(fast_model)
+        first = run_tier("fast", fast, lambda: fast.analyze_long_contract(contract_text, contract_type_hint))
+        if "error" in first:
+            return first
+        first_clauses = first.get("clauses", []) or []
+
+        # Group first-pass clauses by the segment they came from; clauses numbered
+        # differently from the text stand alone with their own reported text
+        segments = segmenter.split_clauses(contract_text)
+        by_segment, unmatched = match_segment_clauses(segments, first_clauses)
+        units = [(seg, by_segment[seg["id"]]) for seg in segments if seg["id"] in by_segment]
+        units += [({"id": str(c.get("id", "")), "heading": c.get("title", ""),
+                    "text": f"{c.get('id', '')}. {c.get('title', '')}\n{c.get('text', '')}"}, [c]) for c in unmatched]
+
+        def escalates(clause: dict) -> bool:
+            return (clause.get("risk_score", 0) >= threshold
+                    or clause.get("risk_level") in config.ROUTING_ESCALATION_LEVELS)
+
+        risky = [seg for seg, clauses in units if any(escalates(c) for c in clauses)]
+        routing["escalated"] = [seg["id"] for seg in risky]
+        metrics.increment("routing_escalated_segments", len(risky), model=escalation_model)
+
+        strong_by_segment, strong_unmatched = {}, []
+        if risky:
+            strong = self._tier(escalation_model)
+            second = run_tier("escalation", strong, lambda: strong.analyze_segments(risky, contract_type_hint))
+            if "error" in second:
+                # The first pass is still a complete analysis; keep it and say why nothing was escalated
+                first.setdefault("warnings", []).append(f"Escalation to {escalation_model} failed: {second['error']}")
+                routing["escalated"] = []
+            else:
+                strong_by_segment, strong_unmatched = match_segment_clauses(risky, second.get("clauses", []) or [])
+
+        clauses = []
+        for seg, fast_clauses in units:
+            if seg["id"] in strong_by_segment:
+                clauses.extend(dict(c, analyzed_by=escalation_model) for c in strong_by_segment[seg["id"]])
+            else:
+                clauses.extend(dict(c, analyzed_by=fast_model) for c in fast_clauses)
+        clauses.extend(dict(c, analyzed_by=escalation_model) for c in strong_unmatched)
+
+        analysis = dict(first, clauses=clauses, routing=routing)
+        return self.score_analysis(analysis)
+
+    def analyze_with_prescreen(self, contract_text: str, contract_type_hint: str = "General",
+                               threshold: int = None) -> dict:
+        """
+        Pre-screen the contract locally before spending an API call.
+        Clauses are scored with RiskScorer; if none reach the threshold the local
+        analysis is returned as is, if only some do just those are sent to the
+        model, and if most do the whole contract goes through analyze_long_contract.
+        Without a configured model the local analysis is always returned.
+        """
+        threshold = threshold if threshold is not None else config.PRESCREEN_THRESHOLD
+        screen = prescreen.prescreen_contract(contract_text, self.scorer, threshold)
+
+        if not self.model or screen["decision"] == "skip":
+            self.last_cache_hit = False
+            return prescreen.local_analysis(screen, contract_type_hint)
+        if screen["decision"] == "full":
+            return self.analyze_long_contract(contract_text, contract_type_hint)
+
+        def compute():
+            risky = [seg for seg in screen["segments"] if seg["id"] in screen["risky_ids"]]
+            llm_analysis = self.analyze_segments(risky, contract_type_hint)
+            if "error" in llm_analysis:
+                return llm_analysis
+            kept = {c["id"]: {k: v for k, v in c.items() if k != "risk_terms"}
+                    for c in screen["clauses"] if c["id"] not in screen["risky_ids"]}
+            analysis = merge_segment_results(screen["segments"], kept, llm_analysis)
+            analysis["analysis_mode"] = "hybrid"
+            return self.score_analysis(analysis)
+
+        return self._cached(contract_text, contract_type_hint, f"{PROMPT_VERSION}/prescreen-{threshold}", compute)
+
+    def _request_analysis(self, prompt: str, warning: str = None) -> dict:
+        """Send one prompt to the model and parse the JSON analysis (unscored), adding warning to it."""
+        if not self.model:
+            return {
+                "error": "API Key not configured. Please provide a valid Google API Key."
+            }
+
+        content = None
         try:
-            response = self.model.generate_content(prompt)
+            response = self.scheduler.run(lambda: self._generate(prompt), estimate_tokens(prompt))
+            self._record_usage(response)
             content = response.text
-            
-            # Simple cleaning if Gemini adds markdown blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-                
-            analysis = json.loads(content.strip())
-            
-            # Post-process with internal RiskScorer for consistent scoring verification
+            try:
+                return _with_warning(parse_model_json(content), warning)
+            except json.JSONDecodeError:
+                return _with_warning(self._repair_analysis(prompt, content), warning)
+        except Exception as e:
+            return self._error_result(e, content)
+
+    def _repair_analysis(self, prompt: str, content: str) -> dict:
+        """
+        Salvage a malformed or cut-off answer instead of failing the whole
+        analysis: every well-formed clause is kept, and up to
+        JSON_REPAIR_MAX_REQUESTS follow-up requests ask for only the clauses
+        that were lost. Raises json.JSONDecodeError if nothing was usable.
+        """
+        steps = self._repair_steps(prompt, content)
+        response = None
+        try:
+            while True:
+                follow_up = steps.send(response)
+                try:
+                    response = self.scheduler.run(lambda: self._generate(follow_up), estimate_tokens(follow_up))
+                except Exception as e:
+                    response = e
+        except StopIteration as done:
+            return done.value
+
+    def _repair_steps(self, prompt: str, content: str):
+        """
+        The repair loop of _repair_analysis and _repair_analysis_async, which
+        only differ in how the model is called: yields each follow-up prompt,
+        is sent the response (or the exception the request raised) and returns
+        the repaired analysis.
+        """
+        with metrics.span("json_repair", model=self.model_name):
+            repair = AnswerRepair(content)
+            for _ in range(config.JSON_REPAIR_MAX_REQUESTS):
+                note = repair.follow_up_note()
+                if note is None:
+                    break
+                response = yield prompt + note
+                if isinstance(response, Exception):
+                    # What was salvaged is still better than nothing; result() warns about the rest
+                    print(f"Follow-up request for lost clauses failed: {response}")
+                    break
+                self._record_usage(response)
+                metrics.increment("json_repair_requests", 1, model=self.model_name)
+                if not repair.add(response.text):
+                    break
+            metrics.increment("json_repaired_answers", 1, model=self.model_name)
+            return analysis_model.coerce_analysis(repair.result())
+
+    @staticmethod
+    def _error_result(e: Exception, content: str = None) -> dict:
+        """Map a failure from the model call or response parsing to a user-facing error dict."""
+        if isinstance(e, json.JSONDecodeError):
+            return {
+                "error": "Failed to parse AI response. The model might have returned unstructured text.",
+                "raw_response": content if content is not None else "No content"
+            }
+        if isinstance(e, google_exceptions.PermissionDenied):
+             return {
+                "error": "Authentication Failed: Invalid API Key. Please check your key in the sidebar."
+            }
+        if isinstance(e, google_exceptions.InvalidArgument):
+            return {
+                 "error": "Invalid Argument: The request was rejected. Check if the text is too long or malformed."
+            }
+        # The scheduler already retried these with backoff before giving up
+        if isinstance(e, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return {
+                "error": "Rate Limit Reached: The Gemini quota is exhausted right now. Please try again in a minute."
+            }
+        if isinstance(e, google_exceptions.DeadlineExceeded):
+            return {
+                "error": "Request Timed Out: Gemini took too long to respond. Please try again."
+            }
+        if isinstance(e, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+            return {
+                "error": "Service Unavailable: Gemini is temporarily unavailable. Please try again shortly."
+            }
+        if isinstance(e, QueueTimeout):
+            return {
+                "error": f"Too Many Requests: {str(e)} Please try again later."
+            }
+        return {
+            "error": f"Analysis failed: {str(e)}"
+        }
+
+    def _generate(self, prompt: str, **kwargs):
+        """One model call, timed (excluding time spent queued in the scheduler)."""
+        if self.generation_config is not None:
+            kwargs.setdefault("generation_config", self.generation_config)
+        with metrics.span("model_call", model=self.model_name):
+            return self.model.generate_content(prompt, **kwargs)
+
+    def _record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        with self._usage_lock:
+            self.token_usage["requests"] += 1
+            self.token_usage["prompt_tokens"] += prompt_tokens
+            self.token_usage["output_tokens"] += output_tokens
+        metrics.increment("model_requests", 1, model=self.model_name)
+        metrics.increment("prompt_tokens", prompt_tokens, model=self.model_name)
+        metrics.increment("output_tokens", output_tokens, model=self.model_name)
+
+    def score_analysis(self, analysis: dict) -> dict:
+        """Post-process with internal RiskScorer for consistent scoring verification."""
+        with metrics.span("score"):
             clauses = analysis.get("clauses", [])
             for clause in clauses:
                 # Augment with numeric score
@@ -80,27 +897,249 @@ class ContractAnalyzer:
                     clause.get("text", "") + " " + clause.get("title", ""),
                     clause.get("type", "")
                 )
-                
+
             # Calculate overall metrics
             composite_metrics = self.scorer.calculate_composite_risk(clauses)
             analysis["risk_metadata"] = composite_metrics
-            
-            return analysis
-            
-        except json.JSONDecodeError:
-            return {
-                "error": "Failed to parse AI response. The model might have returned unstructured text.",
-                "raw_response": content if 'content' in locals() else "No content"
-            }
-        except google_exceptions.PermissionDenied:
-             return {
-                "error": "Authentication Failed: Invalid API Key. Please check your key in the sidebar."
-            }
-        except google_exceptions.InvalidArgument:
-            return {
-                 "error": "Invalid Argument: The request was rejected. Check if the text is too long or malformed."
-            }
-        except Exception as e:
+
+        return analysis
+
+class AsyncContractAnalyzer(ContractAnalyzer):
+    """
+    asyncio variant of ContractAnalyzer.
+    Many contracts can be analyzed concurrently from one event loop without a
+    thread per request; a semaphore caps the number of in-flight model calls.
+    """
+
+    def __init__(self, api_key=None, model_name=None, cache=None, max_concurrency: int = None,
+                 clause_store=None, model=None, template_registry=None, translation_cache=None):
+        super().__init__(api_key, model_name=model_name, cache=cache, clause_store=clause_store, model=model,
+                         template_registry=template_registry, translation_cache=translation_cache)
+        self.max_concurrency = max_concurrency or config.MAX_CONCURRENT_REQUESTS
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to the loop they are used on; make a new one if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def analyze_contract_async(self, contract_text: str, contract_type_hint: str = "General") -> dict:
+        """
+        Async analyze_contract / analyze_long_contract: long contracts are chunked and
+        the chunks awaited concurrently. Uses and fills the cache like the sync methods.
+        """
+        long_document = len(contract_text) > config.LONG_DOC_THRESHOLD_CHARS
+        prompt_version = f"{PROMPT_VERSION}/chunked" if long_document else PROMPT_VERSION
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(contract_text, contract_type_hint, self.model_name, prompt_version)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if long_document:
+            chunks = segmenter.chunk_text(contract_text, config.CHUNK_MAX_CHARS, config.CHUNK_OVERLAP_CHARS)
+            parts = await asyncio.gather(*[
+                self._request_analysis_async(*self._build_prompt(chunk, contract_type_hint, excerpt_note=(
+                    f"This is excerpt {i} from a longer contract. Analyze only the clauses "
+                    "in this excerpt and use the contract's own clause numbers as clause ids."
+                )))
+                for i, chunk in enumerate(chunks, start=1)
+            ])
+            analysis = merge_chunk_results(parts)
+        else:
+            analysis = await self._request_analysis_async(*self._build_prompt(contract_text, contract_type_hint))
+
+        if "error" not in analysis:
+            analysis = self.score_analysis(analysis)
+        if cache_key is not None:
+            self.cache.put(cache_key, analysis)
+        return analysis
+
+    async def analyze_many(self, contract_texts: Iterable[str], contract_type_hint: str = "General") -> List[dict]:
+        """Analyze several contracts concurrently; results are in input order."""
+        return await asyncio.gather(*[
+            self.analyze_contract_async(text, contract_type_hint) for text in contract_texts
+        ])
+
+    async def _generate_async(self, prompt: str):
+        kwargs = {"generation_config": self.generation_config} if self.generation_config is not None else {}
+        with metrics.span("model_call", model=self.model_name):
+            return await self.model.generate_content_async(prompt, **kwargs)
+
+    async def _request_analysis_async(self, prompt: str, warning: str = None) -> dict:
+        if not self.model:
             return {
-                "error": f"Analysis failed: {str(e)}"
+                "error": "API Key not configured. Please provide a valid Google API Key."
             }
+
+        content = None
+        async with self._get_semaphore():
+            try:
+                response = await self.scheduler.run_async(
+                    lambda: self._generate_async(prompt), estimate_tokens(prompt)
+                )
+                self._record_usage(response)
+                content = response.text
+                try:
+                    return _with_warning(parse_model_json(content), warning)
+                except json.JSONDecodeError:
+                    return _with_warning(await self._repair_analysis_async(prompt, content), warning)
+            except Exception as e:
+                return self._error_result(e, content)
+
+    async def _repair_analysis_async(self, prompt: str, content: str) -> dict:
+        """Async _repair_analysis: follow-up requests are awaited instead of blocking the loop."""
+        steps = self._repair_steps(prompt, content)
+        response = None
+        try:
+            while True:
+                follow_up = steps.send(response)
+                try:
+                    response = await self.scheduler.run_async(lambda: self._generate_async(follow_up),
+                                                              estimate_tokens(follow_up))
+                except Exception as e:
+                    response = e
+        except StopIteration as done:
+            return done.value
+
+def _with_warning(analysis: dict, warning: Optional[str]) -> dict:
+    """Add warning (if any) to a successful analysis's warnings."""
+    if warning and "error" not in analysis:
+        analysis.setdefault("warnings", []).append(warning)
+    return analysis
+
+def parse_model_json(content: str) -> dict:
+    """
+    Parse the model's JSON answer, tolerating markdown code fences around it,
+    and validate/coerce it (analysis_model) so consumers can rely on its types.
+    """
+    with metrics.span("parse_json"):
+        return analysis_model.coerce_analysis(json.loads(strip_code_fences(content)))
+
+def strip_code_fences(content: str) -> str:
+    """The JSON inside a markdown code block, if Gemini wrapped its answer in one."""
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0]
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0]
+    return content.strip()
+
+def merge_segment_results(segments: List[dict], kept: Dict[str, dict], llm_analysis: dict) -> dict:
+    """
+    Combine clauses that were not sent to the model (kept, keyed by segment id;
+    a clause dict or a list of them) with the model's analysis of the rest, in
+    document order.
+    Model clauses are placed at the segment whose id they carry (or a sub-id
+    like 4.1 of segment 4); any the model numbered differently go at the end.
+    Header fields (summary, parties, ...) come from the model's answer.
+    """
+    merged = {key: value for key, value in llm_analysis.items() if key != "clauses"}
+    by_segment, unmatched = match_segment_clauses(
+        [seg for seg in segments if seg["id"] not in kept], llm_analysis.get("clauses", []) or []
+    )
+    clauses = []
+    for seg in segments:
+        if seg["id"] in kept:
+            kept_clauses = kept[seg["id"]]
+            clauses.extend(kept_clauses if isinstance(kept_clauses, list) else [kept_clauses])
+        else:
+            clauses.extend(by_segment.get(seg["id"], []))
+    merged["clauses"] = clauses + unmatched
+    return merged
+
+def match_segment_clauses(segments: List[dict], llm_clauses: List[dict]):
+    """
+    Assign model clauses to the segments they were written for, by id (or sub-id).
+    Returns ({segment id: [clauses]}, [clauses that matched no segment]).
+    """
+    used = set()
+    by_segment = {}
+    for seg in segments:
+        for i, clause in enumerate(llm_clauses):
+            clause_id = str(clause.get("id", "")).strip().rstrip(".")
+            if i not in used and (clause_id == seg["id"] or clause_id.startswith(seg["id"] + ".")):
+                used.add(i)
+                by_segment.setdefault(seg["id"], []).append(dict(clause, id=clause_id))
+    return by_segment, [c for i, c in enumerate(llm_clauses) if i not in used]
+
+def merge_chunk_results(parts: List[dict]) -> dict:
+    """Merge per-chunk results, noting failed chunks as warnings; an error only if every chunk failed."""
+    if not parts:
+        return {"error": "No text could be extracted from the document."}
+
+    succeeded = [p for p in parts if "error" not in p]
+    if not succeeded:
+        return parts[0]
+
+    analysis = merge_analyses(succeeded)
+    failed = [p["error"] for p in parts if "error" in p]
+    if failed:
+        analysis.setdefault("warnings", []).append(f"{len(failed)} of {len(parts)} sections could not be analyzed: {failed[0]}")
+    return analysis
+
+def merge_analyses(parts: List[dict]) -> dict:
+    """
+    Merge per-chunk analyses into one.
+    Header fields come from the first chunk that has them, parties and
+    overall_risk_factors are unioned, and clauses repeated by overlapping chunks
+    are deduplicated so every clause id in the result is unique.
+    """
+    merged = {
+        "contract_type": "",
+        "summary": "",
+        "parties": [],
+        "contract_date": "",
+        "jurisdiction": "",
+        "clauses": [],
+        "overall_risk_factors": []
+    }
+    seen_parties = set()
+    seen_factors = set()
+    clause_index = {} # (id, title) -> position in merged["clauses"]
+    used_ids = set()
+
+    for part in parts:
+        for key in ("contract_type", "summary", "contract_date", "jurisdiction"):
+            if not merged[key] and part.get(key):
+                merged[key] = part[key]
+
+        for party in part.get("parties", []) or []:
+            if str(party).strip().lower() not in seen_parties:
+                seen_parties.add(str(party).strip().lower())
+                merged["parties"].append(party)
+
+        for warning in part.get("warnings", []) or []:
+            if warning not in merged.setdefault("warnings", []):
+                merged["warnings"].append(warning)
+
+        for factor in part.get("overall_risk_factors", []) or []:
+            if str(factor).strip().lower() not in seen_factors:
+                seen_factors.add(str(factor).strip().lower())
+                merged["overall_risk_factors"].append(factor)
+
+        for clause in part.get("clauses", []) or []:
+            clause_id = str(clause.get("id", "")).strip().rstrip(".")
+            key = (clause_id, str(clause.get("title", "")).strip().lower())
+            if key in clause_index:
+                # Same clause seen in the overlap region; keep the more complete copy
+                existing = merged["clauses"][clause_index[key]]
+                if len(clause.get("text", "")) > len(existing.get("text", "")):
+                    clause = dict(clause, id=existing["id"])
+                    merged["clauses"][clause_index[key]] = clause
+                continue
+
+            unique_id = clause_id or str(len(merged["clauses"]) + 1)
+            suffix = 2
+            while unique_id in used_ids:
+                unique_id = f"{clause_id or 'clause'}-{suffix}"
+                suffix += 1
+            used_ids.add(unique_id)
+            clause_index[key] = len(merged["clauses"])
+            merged["clauses"].append(dict(clause, id=unique_id))
+
+    return merged
@@ -0,0 +1,185 @@
+import hashlib
+import io
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+import PyPDF2
+import docx
+
+import config
+import metrics
+
+# Worker functions run in child processes. They only import the parsing
+# libraries, not utils, so a worker never pays for streamlit or spaCy.
+
+def _pdf_page_count(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return len(PyPDF2.PdfReader(mapped).pages)
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of the PDF at path."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        pages = PyPDF2.PdfReader(mapped).pages
+        return [pages[i].extract_text() or "" for i in range(start, stop)]
+
+def _extract_docx(file_bytes: bytes) -> str:
+    doc = docx.Document(io.BytesIO(file_bytes))
+    return "".join(para.text + "\n" for para in doc.paragraphs)
+
+class ExtractionService:
+    """
+    Text extraction on a process pool, memoized by file content hash.
+    PDFs are split into page ranges that are parsed in parallel across cores.
+    Results match utils.extract_text, including its "Error reading ..." strings;
+    errors are returned but not memoized, so a transient failure is retried.
+    """
+
+    def __init__(self, max_workers: int = None, pages_per_task: int = None, memo_size: int = None):
+        self.pages_per_task = pages_per_task or config.EXTRACTION_PAGES_PER_TASK
+        self.memo_size = memo_size or config.EXTRACTION_MEMO_SIZE
+        self.max_workers = max_workers or config.EXTRACTION_WORKERS
+        self._pool = self._new_pool()
+        self._memo = OrderedDict() # file hash -> text, least recently used first
+        self._inflight = {} # file hash -> Future, so concurrent reruns share one extraction
+        self._lock = threading.Lock()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: forking a multi-threaded server process (Streamlit) is unsafe
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, fn, *args) -> Future:
+        try:
+            return self._pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; start a fresh one for this and later files
+            with self._lock:
+                self._pool = self._new_pool()
+            return self._pool.submit(fn, *args)
+
+    def extract(self, file_obj) -> str:
+        """Blocking extraction; instant when the same file content was seen before."""
+        with metrics.span("extract_text"):
+            return self.submit(file_obj).result()
+
+    def submit(self, file_obj) -> Future:
+        """Start extracting file_obj (anything with .name and .getvalue()) and return a Future[str]."""
+        name = file_obj.name.lower()
+        data = file_obj.getvalue()
+        key = hashlib.sha256(data).hexdigest() + os.path.splitext(name)[1]
+
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                done = Future()
+                done.set_result(self._memo[key])
+                return done
+            if key in self._inflight:
+                return self._inflight[key]
+            result = Future()
+            self._inflight[key] = result
+
+        def finish(text: str, memoize: bool = True):
+            with self._lock:
+                self._inflight.pop(key, None)
+                if memoize:
+                    self._memo[key] = text
+                    self._memo.move_to_end(key)
+                    while len(self._memo) > self.memo_size:
+                        self._memo.popitem(last=False)
+            result.set_result(text)
+
+        def fail(error_prefix: str, e: Exception):
+            finish(f"{error_prefix}: {str(e)}", memoize=False)
+
+        try:
+            if name.endswith(".pdf"):
+                self._extract_pdf(data, finish, fail)
+            elif name.endswith(".docx"):
+                self._run_single(_extract_docx, data, "Error reading DOCX", finish, fail)
+            elif name.endswith(".txt"):
+                finish(data.decode("utf-8", errors="replace"))
+            else:
+                finish("Unsupported file format.")
+        except Exception as e:
+            # e.g. the pool was shut down; resolve the shared future so later callers don't wait forever
+            if not result.done():
+                fail("Error reading file", e)
+        return result
+
+    def _run_single(self, fn, data: bytes, error_prefix: str, finish, fail):
+        def done(future):
+            try:
+                text = future.result()
+            except Exception as e:
+                fail(error_prefix, e)
+                return
+            finish(text)
+        self._submit(fn, data).add_done_callback(done)
+
+    def _extract_pdf(self, data: bytes, finish, fail):
+        # Workers memory-map one temp copy instead of each receiving the bytes
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        def cleanup():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        try:
+            page_count = _pdf_page_count(path)
+        except Exception as e:
+            cleanup()
+            fail("Error reading PDF", e)
+            return
+
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        if not ranges:
+            cleanup()
+            finish("")
+            return
+
+        parts = [None] * len(ranges)
+        remaining = [len(ranges)]
+        errors = []
+        gather_lock = threading.Lock()
+
+        def collect(index, future, error=None):
+            try:
+                if error is not None:
+                    raise error
+                parts[index] = future.result()
+            except Exception as e:
+                errors.append(e)
+            with gather_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            cleanup()
+            if errors:
+                fail("Error reading PDF", errors[0])
+            else:
+                finish("".join(text + "\n" for part in parts for text in part))
+
+        for index, (start, stop) in enumerate(ranges):
+            try:
+                future = self._submit(_extract_pdf_range, path, start, stop)
+            except Exception as e:
+                # Count this and every range not yet submitted as failed, so the result still resolves
+                for rest in range(index, len(ranges)):
+                    collect(rest, None, e)
+                return
+            future.add_done_callback(lambda f, index=index: collect(index, f))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,415 @@
+"""
+Background analysis jobs.
+
+Contracts are submitted to a SQLite-backed queue and analyzed by a fixed
+number of worker threads outside the Streamlit script thread, so an analysis
+keeps running (and its API spend is kept) when the page reruns, refreshes or
+disconnects. The app polls the job for progress and picks up the stored result.
+
+Standalone workers can serve the same queue from another process:
+    GOOGLE_API_KEY=... python job_queue.py --workers 4
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+import storage
+from analysis_cache import AnalysisCache
+from clause_store import ClauseStore
+from contract_analyzer import ContractAnalyzer
+from revisions import RevisionStore
+from template_registry import TemplateRegistry
+from translation import TranslationCache
+
+# Columns returned by get() / recent(); the contract text is only read by the worker that claims the job
+JOB_COLUMNS = ("id", "status", "name", "content_hash", "options", "progress", "result", "meta", "error",
+               "attempts", "created_at", "started_at", "finished_at")
+
+class QueueFull(Exception):
+    """Raised when the queue already holds the maximum number of waiting jobs."""
+
+class JobQueue:
+    """
+    Persistent queue of analysis jobs (queued -> running -> done / error / cancelled).
+    Claiming a job is a single IMMEDIATE transaction, so any number of worker
+    threads and processes can share one database file without running a job
+    twice. Running jobs whose worker stopped sending heartbeats are requeued.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.JOB_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.isolation_level = None # Explicit BEGIN/COMMIT below
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL,
+                owner TEXT,
+                name TEXT,
+                content_hash TEXT,
+                contract_text TEXT NOT NULL,
+                options TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                meta TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+
+    def submit(self, contract_text: str, name: str = None, owner: str = None, **options) -> int:
+        """
+        Queue a contract and return its job id. owner restricts the job to workers
+        of that owner (e.g. the process holding the session's API key).
+        Raises QueueFull when JOB_MAX_PENDING jobs are already waiting.
+        """
+        with self._lock:
+            pending = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if pending >= config.JOB_MAX_PENDING:
+                raise QueueFull(f"{pending} analyses are already waiting.")
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (status, owner, name, content_hash, contract_text, options, progress, created_at) "
+                "VALUES ('queued', ?, ?, ?, ?, ?, 'Waiting for a worker', ?)",
+                (owner, name, storage.content_hash(storage.normalize_text(contract_text)), contract_text,
+                 json.dumps(options), time.time())
+            )
+        return cursor.lastrowid
+
+    def claim(self, worker: str, owner: str = None) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job this worker may run (including its text), or None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, contract_text, options, owner FROM jobs WHERE status = 'queued' "
+                    "AND (owner IS NULL OR owner = ?) ORDER BY id LIMIT 1", (owner,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, "
+                        "heartbeat_at = ?, progress = 'Starting' WHERE id = ?", (worker, now, now, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "contract_text": row[1], "options": json.loads(row[2]), "owner": row[3]}
+
+    def update_progress(self, job_id: int, progress: str):
+        """Record a progress message; doubles as the worker's heartbeat."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                (progress, time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id: int):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def finish(self, job_id: int, result: Dict[str, Any], meta: Dict[str, Any] = None):
+        """Store the result; analyses that came back as {"error": ...} mark the job failed."""
+        status, error = ("error", result["error"]) if "error" in result else ("done", None)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, meta = ?, error = ?, progress = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (status, json.dumps(result, ensure_ascii=False), json.dumps(meta or {}), error,
+                 "Finished" if status == "done" else "Failed", time.time(), job_id)
+            )
+
+    def fail(self, job_id: int, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, progress = 'Failed', finished_at = ? "
+                "WHERE id = ? AND status = 'running'", (error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that no worker has started yet. Returns whether it was cancelled."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', progress = 'Cancelled', finished_at = ? "
+                "WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def owner_heartbeat(self, owner: str):
+        """Record that the process owning jobs submitted with a session key is still alive."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO owners (owner, heartbeat_at) VALUES (?, ?)", (owner, time.time()))
+
+    def requeue_stale(self, stale_seconds: float = None) -> int:
+        """
+        Put running jobs without a recent heartbeat back in the queue (or fail
+        them after JOB_MAX_ATTEMPTS). Queued jobs whose owning process stopped
+        (its session key is gone with it) or that waited longer than
+        JOB_QUEUED_TTL_SECONDS are failed, so they stop counting toward
+        JOB_MAX_PENDING and the page polling them gets an answer.
+        """
+        now = time.time()
+        cutoff = now - (stale_seconds or config.JOB_STALE_SECONDS)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = 'The app restarted before this analysis started. Please submit it again.', "
+                "progress = 'Failed', finished_at = ? WHERE status = 'queued' AND owner IS NOT NULL "
+                "AND owner NOT IN (SELECT owner FROM owners WHERE heartbeat_at >= ?)",
+                (now, cutoff)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = 'No worker picked up this analysis in time. Please submit it again.', "
+                "progress = 'Failed', finished_at = ? WHERE status = 'queued' AND created_at < ?",
+                (now, now - config.JOB_QUEUED_TTL_SECONDS)
+            )
+            self._conn.execute("DELETE FROM owners WHERE heartbeat_at < ?", (cutoff,))
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = 'The worker running this analysis stopped.', "
+                "progress = 'Failed', finished_at = ? WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), cutoff, config.JOB_MAX_ATTEMPTS)
+            )
+            # The session key died with its worker, so any worker (using the configured key) may retry
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, progress = 'Waiting for a worker (retry)' "
+                "WHERE status = 'running' AND heartbeat_at < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """A job's status, progress and (once finished) result, plus its place in the queue."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            ahead = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND id < ?", (job_id,)
+            ).fetchone()[0]
+        if row is None:
+            return None
+        job = self._decode(row)
+        job["queue_position"] = ahead + 1 if job["status"] == "queued" else None
+        return job
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest jobs first, without their results."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(self._decode(row), result=None) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "error": 0, "cancelled": 0}
+        counts.update(dict(rows))
+        return counts
+
+    @staticmethod
+    def _decode(row: tuple) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        for key in ("options", "result", "meta"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+# Analysis modes in the order run_analysis picks them; only the first one requested is applied
+ANALYSIS_MODES = (("match_templates", "Template matching"), ("tiered_routing", "Tiered routing"),
+                  ("prescreen", "The local pre-screen"), ("reuse_clauses", "Clause reuse"))
+
+def analysis_modes(options: Dict[str, Any]) -> Tuple[Optional[str], List[str]]:
+    """The mode run_analysis applies for these options, and the requested modes it has to leave out."""
+    requested = [label for key, label in ANALYSIS_MODES if options.get(key)]
+    return (requested[0], requested[1:]) if requested else (None, [])
+
+def run_analysis(analyzer: ContractAnalyzer, contract_text: str, options: Dict[str, Any],
+                 revision_store: RevisionStore = None,
+                 progress: Callable[[str], None] = lambda message: None,
+                 on_clause: Callable[[dict], None] = None) -> Tuple[dict, dict]:
+    """
+    The app's analysis, run from a worker or the page itself: prepare the text,
+    then analyze it as a revision, against known templates, with tiered routing,
+    with the pre-screen, with clause reuse or in full, per options. These modes
+    do not combine: requested modes that were left out are named in a warning.
+    A full analysis streams, calling on_clause with each clause as it arrives,
+    unless options["stream"] is false.
+    Returns (analysis, meta) where meta holds what the app shows next to the result.
+    """
+    hint = options.get("contract_type_hint", "General")
+    progress("Preparing text")
+    contract_text = analyzer.prepare_text(contract_text)
+    progress("Translating Hindi sections, if any")
+    contract_text = analyzer.translate_text(contract_text)
+    meta = {"prompt_stats": analyzer.last_prompt_stats, "translation_stats": analyzer.last_translation_stats}
+
+    document = options.get("revision_document")
+    previous = revision_store.get(document) if revision_store is not None and document else None
+    if previous and previous["content_hash"] == storage.content_hash(storage.normalize_text(contract_text)):
+        previous = None # Same text as the stored version: a plain (cached) analysis
+
+    used, skipped = analysis_modes(dict(options, match_templates=analyzer.template_registry is not None,
+                                        reuse_clauses=analyzer.clause_store is not None))
+    if previous:
+        used, skipped = "Revision diffing", ([used] if used else []) + skipped
+
+    if previous:
+        progress(f"Analyzing changes since version {previous['version']}")
+        result = analyzer.analyze_revision(contract_text, previous["text"], previous["analysis"], hint)
+    elif analyzer.template_registry is not None:
+        progress("Comparing with known templates")
+        result = analyzer.analyze_with_templates(contract_text, hint)
+    elif options.get("tiered_routing"):
+        progress("Analyzing with the fast model, then escalating risky clauses")
+        result = analyzer.analyze_tiered(contract_text, hint, escalation_model=options.get("escalation_model"))
+    elif options.get("prescreen"):
+        progress("Pre-screening clauses")
+        result = analyzer.analyze_with_prescreen(contract_text, hint)
+    elif analyzer.clause_store is not None:
+        progress("Analyzing new clauses")
+        result = analyzer.analyze_with_clause_store(contract_text, hint)
+    elif options.get("stream", True) and len(contract_text) <= config.LONG_DOC_THRESHOLD_CHARS:
+        result = {"error": "The model returned no result."}
+        clauses = 0
+        progress("Analyzing")
+        for event in analyzer.analyze_contract_stream(contract_text, hint):
+            if event["type"] == "clause":
+                clauses += 1
+                progress(f"Analyzing ({clauses} clauses so far)")
+                if on_clause is not None:
+                    on_clause(event["clause"])
+            else:
+                result = event["analysis"]
+    else:
+        progress("Analyzing long contract in sections")
+        result = analyzer.analyze_long_contract(contract_text, hint)
+
+    if skipped and "error" not in result:
+        result.setdefault("warnings", []).append(
+            f"{used} was used for this analysis; {', '.join(mode.lower() for mode in skipped)} "
+            "cannot be combined with it and {} not applied.".format("was" if len(skipped) == 1 else "were")
+        )
+    meta["cache_hit"] = analyzer.last_cache_hit
+    if "error" not in result and revision_store is not None and document:
+        meta["revision_version"] = revision_store.add(document, contract_text, result)
+    return result, meta
+
+class JobWorkers:
+    """
+    Fixed-size pool of worker threads serving a JobQueue. API keys given to
+    submit() stay in memory only; those jobs are owned by this process, while
+    jobs submitted without a key run with config.GOOGLE_API_KEY on any worker.
+    """
+
+    def __init__(self, queue: JobQueue = None, workers: int = None, cache: AnalysisCache = None,
+                 clause_store: ClauseStore = None, revision_store: RevisionStore = None,
+                 template_registry: TemplateRegistry = None, translation_cache: TranslationCache = None, model=None):
+        self.queue = queue or JobQueue()
+        self.cache = cache
+        self.clause_store = clause_store
+        self.revision_store = revision_store
+        self.template_registry = template_registry
+        self.translation_cache = translation_cache
+        self.model = model # Passed to ContractAnalyzer, e.g. the offline stand-in in benchmarks/
+        self.owner = uuid.uuid4().hex
+        self.queue.owner_heartbeat(self.owner)
+        self._keys = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(f"{self.owner[:8]}-{i}",), daemon=True, name=f"job-worker-{i}")
+            for i in range(workers or config.JOB_WORKERS)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, contract_text: str, name: str = None, api_key: str = None, **options) -> int:
+        """Queue a contract for analysis and return its job id (raises QueueFull under back-pressure)."""
+        owner = self.owner if api_key else None
+        job_id = self.queue.submit(contract_text, name=name, owner=owner, **options)
+        if api_key:
+            self._keys[job_id] = api_key
+        self._wake.set()
+        return job_id
+
+    def shutdown(self):
+        """Stop taking new jobs; running jobs finish in their daemon threads."""
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self, worker: str):
+        last_sweep = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_sweep > config.JOB_STALE_SECONDS / 4:
+                self.queue.owner_heartbeat(self.owner)
+                self.queue.requeue_stale()
+                last_sweep = time.monotonic()
+            job = self.queue.claim(worker, self.owner)
+            if job is None:
+                self._wake.wait(config.JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        options = job["options"]
+        api_key = self._keys.pop(job_id, None) or config.GOOGLE_API_KEY
+        # Long model calls report no progress; keep the job from looking abandoned meanwhile
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(config.JOB_STALE_SECONDS / 4):
+                self.queue.heartbeat(job_id)
+
+        threading.Thread(target=beat, daemon=True).start()
+        try:
+            analyzer = ContractAnalyzer(
+                api_key, model_name=options.get("model_name"), cache=self.cache,
+                clause_store=self.clause_store if options.get("reuse_clauses") else None, model=self.model,
+                template_registry=self.template_registry if options.get("match_templates") else None,
+                translation_cache=self.translation_cache
+            )
+            result, meta = run_analysis(analyzer, job["contract_text"], options, self.revision_store,
+                                        lambda message: self.queue.update_progress(job_id, message))
+            self.queue.finish(job_id, result, meta)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.queue.fail(job_id, f"Analysis failed: {str(e)}")
+        finally:
+            done.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the background analysis queue")
+    parser.add_argument("--workers", type=int, default=config.JOB_WORKERS, help="Concurrent analyses")
+    parser.add_argument("--db", default=config.JOB_DB_PATH, help="Job queue database")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the analysis cache")
+    args = parser.parse_args(argv)
+
+    workers = JobWorkers(JobQueue(args.db), workers=args.workers,
+                         cache=None if args.no_cache else AnalysisCache(),
+                         clause_store=ClauseStore(), revision_store=RevisionStore(),
+                         template_registry=TemplateRegistry(), translation_cache=TranslationCache())
+    print(f"Serving {args.db} with {args.workers} worker(s). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(workers.queue.stats()))
+    except KeyboardInterrupt:
+        workers.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+HEADER_FIELDS = ("contract_type", "summary", "parties", "contract_date", "jurisdiction", "overall_risk_factors")
+_ID_PATTERN = re.compile(r'"id"\s*:\s*"?([^",}\s]+)')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_decoder = json.JSONDecoder(strict=False)
+
+def loads_lenient(raw: str) -> Any:
+    """json.loads that also accepts raw newlines inside strings and trailing commas."""
+    try:
+        return json.loads(raw, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r'\1', raw), strict=False)
+
+class ClauseStreamParser:
+    """
+    Incremental scanner for a streamed analysis JSON document.
+    feed() accepts arbitrary text fragments and returns every object of the
+    top-level "clauses" array that became complete, so clauses can be shown
+    while the model is still generating the rest of the answer.
+    Text outside the JSON (e.g. ```json fences) is ignored.
+    """
+
+    def __init__(self):
+        self._pieces = [] # Everything fed so far, joined only on demand
+        self._stack = [] # Open containers: '{' or '['
+        self._in_string = False
+        self._escape = False
+        self._string_chars = None # Characters of the current top-level string, to recognise the key
+        self._last_key = None
+        self._after_colon = False
+        self._clauses_depth = None # Stack depth of the "clauses" array once it is open
+        self._clause_chars = None # Characters of the clause object being captured
+        self.clauses = [] # All clauses emitted so far
+        self.malformed = [] # (position among the clause objects, id if readable) of objects that did not parse
+        self.clauses_closed = False # The "clauses" array was complete
+        self._objects = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._pieces)
+
+    def feed(self, fragment: str) -> List[dict]:
+        self._pieces.append(fragment)
+        completed = []
+        for ch in fragment:
+            if self._clause_chars is not None:
+                self._clause_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string_chars is not None:
+                        self._last_key = "".join(self._string_chars)
+                        self._string_chars = None
+                elif self._string_chars is not None:
+                    self._string_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                # Only strings directly inside the top-level object can be the "clauses" key
+                self._string_chars = [] if self._stack == ["{"] and not self._after_colon else None
+            elif ch == ":":
+                self._after_colon = True
+            elif ch == ",":
+                self._after_colon = False
+                self._last_key = None
+            elif ch in "{[":
+                if (ch == "[" and self._stack == ["{"] and self._after_colon
+                        and self._last_key == "clauses"):
+                    self._clauses_depth = len(self._stack) + 1
+                elif ch == "{" and self._clauses_depth is not None and len(self._stack) == self._clauses_depth:
+                    self._clause_chars = ["{"]
+                self._stack.append(ch)
+                self._after_colon = False
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if (ch == "}" and self._clause_chars is not None
+                        and len(self._stack) == self._clauses_depth):
+                    clause = self._finish_clause()
+                    if clause is not None:
+                        completed.append(clause)
+                elif ch == "]" and self._clauses_depth is not None and len(self._stack) < self._clauses_depth:
+                    self._clauses_depth = None
+                    self.clauses_closed = True
+        self.clauses.extend(completed)
+        return completed
+
+    def _finish_clause(self):
+        raw = "".join(self._clause_chars)
+        self._clause_chars = None
+        position = self._objects
+        self._objects += 1
+        try:
+            clause = loads_lenient(raw)
+        except json.JSONDecodeError:
+            clause = None
+        if not isinstance(clause, dict):
+            found = _ID_PATTERN.search(raw)
+            self.malformed.append((position, found.group(1).rstrip(".") if found else None))
+            return None
+        return clause
+
+def salvage_analysis(text: str) -> Tuple[Dict[str, Any], List[Tuple[int, Optional[str]]], bool]:
+    """
+    Recover what is usable from a malformed or truncated analysis answer: every
+    header field whose value parses on its own and every well-formed clause.
+    Returns (analysis, malformed clause objects as (position, id), whether the
+    clauses array was complete).
+    """
+    parser = ClauseStreamParser()
+    parser.feed(text)
+    analysis = {}
+    for key in HEADER_FIELDS:
+        found = re.search(rf'"{key}"\s*:\s*', text)
+        if found:
+            try:
+                analysis[key], _ = _decoder.raw_decode(text, found.end())
+            except json.JSONDecodeError:
+                pass
+    analysis["clauses"] = parser.clauses
+    return analysis, parser.malformed, parser.clauses_closed
+
+class AnswerRepair:
+    """
+    Rebuilds an analysis from a malformed or cut-off model answer instead of
+    discarding it. Well-formed clauses are kept in place; follow_up_note() says
+    which clauses were lost (by id, or everything after the last one) so only
+    those are requested again, and add() merges the follow-up answers in.
+    """
+
+    def __init__(self, text: str):
+        self.analysis = {}
+        self._slots = [] # Clause dicts in answer order; None where a clause was lost
+        self._missing = {} # slot index -> id of a lost clause
+        self.complete = False
+        self.add(text)
+
+    def add(self, text: str) -> int:
+        """Merge an answer (the first one or a follow-up); returns how many clauses it contributed."""
+        analysis, malformed, complete = salvage_analysis(text)
+        for key in HEADER_FIELDS:
+            if key in analysis and not self.analysis.get(key):
+                self.analysis[key] = analysis[key]
+
+        # This answer's clause objects in order, lost ones as (id,) where they were
+        objects = list(analysis["clauses"])
+        for position, clause_id in malformed:
+            objects.insert(position, (clause_id,))
+
+        wanted = {clause_id: index for index, clause_id in self._missing.items() if clause_id}
+        present = {str(c.get("id", "")).strip().rstrip(".") for c in self._slots if c is not None}
+        contributed = 0
+        for item in objects:
+            if isinstance(item, tuple):
+                if item[0] is None or item[0] not in wanted:
+                    self._missing[len(self._slots)] = item[0]
+                    self._slots.append(None)
+                continue
+            clause_id = str(item.get("id", "")).strip().rstrip(".")
+            if clause_id in wanted:
+                index = wanted.pop(clause_id)
+                self._slots[index] = item
+                del self._missing[index]
+                contributed += 1
+            elif clause_id not in present:
+                self._slots.append(item)
+                contributed += 1
+            present.add(clause_id)
+        # A follow-up for lost clauses only does not reopen an answer whose clause list was complete
+        self.complete = self.complete or complete
+        return contributed
+
+    def last_id(self) -> Optional[str]:
+        for index in range(len(self._slots) - 1, -1, -1):
+            clause = self._slots[index]
+            clause_id = self._missing.get(index) if clause is None else str(clause.get("id", "")).strip()
+            if clause_id:
+                return clause_id
+        return None
+
+    def follow_up_note(self) -> Optional[str]:
+        """Text to append to the original prompt to get only the lost clauses, or None if nothing was lost."""
+        missing_ids = [clause_id for clause_id in self._missing.values() if clause_id]
+        if not missing_ids and self.complete:
+            return None
+        wanted = []
+        if missing_ids:
+            wanted.append(f"the clauses with ids {', '.join(missing_ids)}")
+        if not self.complete:
+            last_id = self.last_id()
+            wanted.append(f"every clause after clause {last_id}" if last_id else "every clause")
+        return (
+            "\n\nYour previous answer to this request was cut off or contained malformed JSON. "
+            f"Answer again in the same JSON format, but put only {' and '.join(wanted)} in \"clauses\" "
+            "and do not repeat any other clause."
+        )
+
+    def result(self) -> Dict[str, Any]:
+        """
+        The repaired analysis, with a warning if clauses are still missing.
+        Raises json.JSONDecodeError if nothing usable was recovered at all.
+        """
+        clauses = [clause for clause in self._slots if clause is not None]
+        if not clauses and not self.analysis:
+            raise json.JSONDecodeError("No usable analysis in the model's answer", "", 0)
+        analysis = dict(self.analysis, clauses=clauses)
+        if self._missing or not self.complete:
+            lost = f"{len(self._missing)} clause(s)" if self._missing else "Some clauses"
+            analysis["warnings"] = [f"{lost} could not be recovered from a malformed or cut-off model answer."]
+        return analysis
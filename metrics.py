@@ -0,0 +1,218 @@
+"""
+Lightweight timing spans and counters for the analysis pipeline.
+
+    with metrics.trace() as t:            # collect everything one analysis does
+        with metrics.span("model_call"):
+            ...
+    t.summary()                           # per-stage totals for the UI
+
+Every span is also added to a process-wide registry that can be exported in
+the Prometheus text format, and written as a JSON line to METRICS_LOG_PATH
+when that is set.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Tuple
+
+import config
+
+# Histogram bucket upper bounds in seconds, from a cache hit to a long model call
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Trace:
+    """Spans and counters recorded while this trace is active, e.g. one contract analysis."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = [] # (name, seconds)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def add_count(self, name: str, value: float):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage call count and total/max seconds, plus counters and wall-clock time."""
+        stages = {}
+        with self._lock:
+            for name, seconds in self.spans:
+                stage = stages.setdefault(name, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                stage["calls"] += 1
+                stage["total_seconds"] += seconds
+                stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            counters = dict(self.counters)
+        for stage in stages.values():
+            stage["total_seconds"] = round(stage["total_seconds"], 4)
+            stage["max_seconds"] = round(stage["max_seconds"], 4)
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": stages,
+            "counters": counters,
+        }
+
+class Registry:
+    """Process-wide histograms of span durations and counter totals, keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {} # (name, labels) -> [bucket counts..., count, sum]
+        self._counters = {} # (name, labels) -> total
+
+    def observe(self, name: str, labels: Tuple, seconds: float):
+        with self._lock:
+            hist = self._histograms.get((name, labels))
+            if hist is None:
+                hist = self._histograms[(name, labels)] = [0] * len(BUCKETS) + [0, 0.0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += seconds
+
+    def increment(self, name: str, labels: Tuple, value: float):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current totals, for the UI and JSON export."""
+        with self._lock:
+            spans = [
+                {"name": name, "labels": dict(labels), "count": hist[-2], "total_seconds": round(hist[-1], 4),
+                 "avg_seconds": round(hist[-1] / hist[-2], 4) if hist[-2] else 0.0}
+                for (name, labels), hist in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"spans": spans, "counters": counters}
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = ["# TYPE legalis_stage_seconds histogram"]
+        with self._lock:
+            for (name, labels), hist in sorted(self._histograms.items()):
+                stage_labels = (("stage", name),) + labels
+                base = _label_text(stage_labels)
+                for bound, count in zip(BUCKETS, hist):
+                    lines.append(f"legalis_stage_seconds_bucket{_label_text(stage_labels + (('le', str(bound)),))} {count}")
+                lines.append(f"legalis_stage_seconds_bucket{_label_text(stage_labels + (('le', '+Inf'),))} {hist[-2]}")
+                lines.append(f"legalis_stage_seconds_count{base} {hist[-2]}")
+                lines.append(f"legalis_stage_seconds_sum{base} {hist[-1]:.6f}")
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE legalis_{name}_total counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"legalis_{name}_total{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+def _label_text(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+registry = Registry()
+_current_trace = contextvars.ContextVar("legalis_trace", default=None)
+_log_lock = threading.Lock()
+
+def _log(record: Dict[str, Any]):
+    if not config.METRICS_LOG_PATH:
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _log_lock:
+        try:
+            with open(config.METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Error writing metrics log: {e}")
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect the spans and counters of everything run inside this block (and its copied contexts)."""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str, **labels):
+    """Time a pipeline stage. Recorded even when the block raises."""
+    label_items = tuple(sorted((key, str(value)) for key, value in labels.items()))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        registry.observe(name, label_items, seconds)
+        current = _current_trace.get()
+        if current is not None:
+            current.add_span(name, seconds)
+        _log({"ts": time.time(), "type": "span", "name": name, "seconds": round(seconds, 6), **dict(label_items)})
+
+def increment(name: str, value: float = 1, **labels):
+    """Add to a counter, e.g. tokens used."""
+    label_items = tuple(sorted((key, str(label)) for key, label in labels.items()))
+    registry.increment(name, label_items, value)
+    current = _current_trace.get()
+    if current is not None:
+        current.add_count(name, value)
+    _log({"ts": time.time(), "type": "counter", "name": name, "value": value, **dict(label_items)})
+
+def write_prometheus(path: str = None):
+    """Write the registry to a file, e.g. for the node_exporter textfile collector."""
+    path = path or config.METRICS_PROMETHEUS_FILE
+    if path:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(registry.render_prometheus())
+        # Atomic replace so a scraper never reads a half-written file
+        os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would flood the console
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_http_server(port: int = None):
+    """Serve /metrics for Prometheus on a daemon thread. Safe to call more than once."""
+    global _server
+    port = port or config.METRICS_PROMETHEUS_PORT
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
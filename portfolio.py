@@ -0,0 +1,303 @@
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import analysis_model
+import config
+import storage
+
+CONTRACT_COLUMNS = ("id", "name", "content_hash", "contract_type", "jurisdiction", "status",
+                    "risk_score", "risk_level", "summary", "added_at")
+CLAUSE_COLUMNS = ("contract_id", "clause_id", "title", "type", "risk_level", "risk_score", "text")
+
+class PortfolioIndex:
+    """
+    Persistent index of analyzed contracts for cross-contract search.
+    Each analysis is split into rows: the contract, its clauses, parties and
+    overall risk factors, with B-tree indexes on the filter columns and an
+    FTS5 full-text index over clause titles and text (plain LIKE search when
+    the SQLite build lacks FTS5). Queries run in SQLite and return one page of
+    rows, so the portfolio never has to fit in memory.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.PORTFOLIO_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS contracts (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT UNIQUE NOT NULL,
+                name TEXT,
+                contract_type TEXT,
+                contract_type_norm TEXT,
+                jurisdiction TEXT,
+                jurisdiction_norm TEXT,
+                status TEXT NOT NULL DEFAULT 'active',
+                risk_score REAL,
+                risk_level TEXT,
+                summary TEXT,
+                analysis BLOB NOT NULL, -- analysis_model.dumps()
+                added_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS clauses (
+                id INTEGER PRIMARY KEY,
+                contract_id INTEGER NOT NULL REFERENCES contracts(id),
+                clause_id TEXT,
+                title TEXT,
+                type TEXT,
+                type_norm TEXT,
+                risk_level TEXT,
+                risk_score INTEGER,
+                text TEXT
+            );
+            CREATE TABLE IF NOT EXISTS parties (contract_id INTEGER NOT NULL, party TEXT, party_norm TEXT);
+            CREATE TABLE IF NOT EXISTS risk_factors (contract_id INTEGER NOT NULL, factor TEXT, factor_norm TEXT);
+            CREATE INDEX IF NOT EXISTS idx_contracts_type ON contracts(contract_type_norm);
+            CREATE INDEX IF NOT EXISTS idx_contracts_jurisdiction ON contracts(jurisdiction_norm);
+            CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts(status);
+            CREATE INDEX IF NOT EXISTS idx_contracts_level ON contracts(risk_level);
+            CREATE INDEX IF NOT EXISTS idx_contracts_score ON contracts(risk_score);
+            CREATE INDEX IF NOT EXISTS idx_clauses_contract ON clauses(contract_id, type_norm, risk_score);
+            CREATE INDEX IF NOT EXISTS idx_clauses_type ON clauses(type_norm, risk_score);
+            CREATE INDEX IF NOT EXISTS idx_clauses_level ON clauses(risk_level, risk_score);
+            CREATE INDEX IF NOT EXISTS idx_clauses_score ON clauses(risk_score);
+            CREATE INDEX IF NOT EXISTS idx_parties ON parties(party_norm);
+            CREATE INDEX IF NOT EXISTS idx_parties_contract ON parties(contract_id);
+            CREATE INDEX IF NOT EXISTS idx_factors ON risk_factors(factor_norm);
+            CREATE INDEX IF NOT EXISTS idx_factors_contract ON risk_factors(contract_id);
+        """)
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS clauses_fts USING fts5("
+                "title, text, content='clauses', content_rowid='id')"
+            )
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self._conn.commit()
+
+    # Writing
+
+    def add(self, analysis: Dict[str, Any], content_hash: str, name: str = None, status: str = "active") -> int:
+        """Index an analysis; re-adding the same content hash replaces the earlier entry."""
+        with self._lock:
+            try:
+                contract_id = self._add_locked(analysis, content_hash, name, status)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return contract_id
+
+    def add_many(self, items: Iterable[Tuple[Dict[str, Any], str, Optional[str]]], status: str = "active") -> int:
+        """Index (analysis, content_hash, name) tuples in one transaction."""
+        count = 0
+        with self._lock:
+            try:
+                for analysis, content_hash, name in items:
+                    self._add_locked(analysis, content_hash, name, status)
+                    count += 1
+                self._conn.commit()
+                # Refresh planner statistics after bulk loads
+                self._conn.execute("PRAGMA optimize")
+            except Exception:
+                self._conn.rollback()
+                raise
+        return count
+
+    def _add_locked(self, analysis: Dict[str, Any], content_hash: str, name: str, status: str) -> int:
+        row = self._conn.execute("SELECT id FROM contracts WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is not None:
+            self._delete_locked(row[0])
+        risk_meta = analysis.get("risk_metadata", {})
+        cursor = self._conn.execute(
+            "INSERT INTO contracts (content_hash, name, contract_type, contract_type_norm, jurisdiction, "
+            "jurisdiction_norm, status, risk_score, risk_level, summary, analysis, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (content_hash, name, analysis.get("contract_type"), _norm(analysis.get("contract_type")),
+             analysis.get("jurisdiction"), _norm(analysis.get("jurisdiction")), status,
+             risk_meta.get("score"), risk_meta.get("level"), analysis.get("summary"),
+             analysis_model.dumps(analysis), time.time())
+        )
+        contract_id = cursor.lastrowid
+        for clause in analysis.get("clauses", []) or []:
+            clause_cursor = self._conn.execute(
+                "INSERT INTO clauses (contract_id, clause_id, title, type, type_norm, risk_level, risk_score, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (contract_id, str(clause.get("id", "")), clause.get("title"), clause.get("type"),
+                 _norm(clause.get("type")), clause.get("risk_level"), clause.get("risk_score"), clause.get("text"))
+            )
+            if self.has_fts:
+                self._conn.execute(
+                    "INSERT INTO clauses_fts (rowid, title, text) VALUES (?, ?, ?)",
+                    (clause_cursor.lastrowid, clause.get("title") or "", clause.get("text") or "")
+                )
+        self._conn.executemany(
+            "INSERT INTO parties (contract_id, party, party_norm) VALUES (?, ?, ?)",
+            [(contract_id, party, _norm(party)) for party in analysis.get("parties", []) or [] if party]
+        )
+        self._conn.executemany(
+            "INSERT INTO risk_factors (contract_id, factor, factor_norm) VALUES (?, ?, ?)",
+            [(contract_id, factor, _norm(factor)) for factor in analysis.get("overall_risk_factors", []) or [] if factor]
+        )
+        return contract_id
+
+    def _delete_locked(self, contract_id: int):
+        if self.has_fts:
+            # External-content FTS rows are removed with the special 'delete' command
+            self._conn.execute(
+                "INSERT INTO clauses_fts (clauses_fts, rowid, title, text) "
+                "SELECT 'delete', id, COALESCE(title, ''), COALESCE(text, '') FROM clauses WHERE contract_id = ?",
+                (contract_id,)
+            )
+        for table in ("clauses", "parties", "risk_factors"):
+            self._conn.execute(f"DELETE FROM {table} WHERE contract_id = ?", (contract_id,))
+        self._conn.execute("DELETE FROM contracts WHERE id = ?", (contract_id,))
+
+    def remove(self, contract_id: int):
+        with self._lock:
+            self._delete_locked(contract_id)
+            self._conn.commit()
+
+    def set_status(self, contract_id: int, status: str):
+        """E.g. mark a contract 'expired' so searches for active contracts skip it."""
+        with self._lock:
+            self._conn.execute("UPDATE contracts SET status = ? WHERE id = ?", (status, contract_id))
+            self._conn.commit()
+
+    # Querying
+
+    def _filters(self, text: str = None, clause_types: List[str] = None, risk_levels: List[str] = None,
+                 min_score: int = None, contract_type: str = None, jurisdiction: str = None, party: str = None,
+                 risk_factor: str = None, status: str = None) -> Tuple[List[str], List[Any], List[str], List[Any]]:
+        """SQL conditions on clauses (alias c) and on contracts (alias k), with their parameters."""
+        clause_conditions, clause_params = [], []
+        if text:
+            if self.has_fts:
+                clause_conditions.append("c.id IN (SELECT rowid FROM clauses_fts WHERE clauses_fts MATCH ?)")
+                clause_params.append(_fts_query(text))
+            else:
+                for word in text.split():
+                    clause_conditions.append("(c.text LIKE ? OR c.title LIKE ?)")
+                    clause_params.extend([f"%{word}%"] * 2)
+        if clause_types:
+            clause_conditions.append(f"c.type_norm IN ({', '.join('?' * len(clause_types))})")
+            clause_params.extend(_norm(t) for t in clause_types)
+        if risk_levels:
+            clause_conditions.append(f"c.risk_level IN ({', '.join('?' * len(risk_levels))})")
+            clause_params.extend(risk_levels)
+        if min_score is not None:
+            clause_conditions.append("c.risk_score >= ?")
+            clause_params.append(min_score)
+
+        contract_conditions, contract_params = [], []
+        if contract_type:
+            contract_conditions.append("k.contract_type_norm LIKE ?")
+            contract_params.append(f"%{_norm(contract_type)}%")
+        if jurisdiction:
+            contract_conditions.append("k.jurisdiction_norm LIKE ?")
+            contract_params.append(f"%{_norm(jurisdiction)}%")
+        if status:
+            contract_conditions.append("k.status = ?")
+            contract_params.append(status)
+        if party:
+            contract_conditions.append("k.id IN (SELECT contract_id FROM parties WHERE party_norm LIKE ?)")
+            contract_params.append(f"%{_norm(party)}%")
+        if risk_factor:
+            contract_conditions.append("k.id IN (SELECT contract_id FROM risk_factors WHERE factor_norm = ?)")
+            contract_params.append(_norm(risk_factor))
+        return clause_conditions, clause_params, contract_conditions, contract_params
+
+    def search_clauses(self, limit: int = 50, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        """
+        Clauses matching every filter, riskiest first.
+        Filters: text (full-text, all words), clause_types, risk_levels, min_score,
+        contract_type / jurisdiction / party (case-insensitive substring),
+        risk_factor (exact, case-insensitive) and status.
+        """
+        clause_conditions, clause_params, contract_conditions, contract_params = self._filters(**filters)
+        conditions = clause_conditions + contract_conditions
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('c.' + col for col in CLAUSE_COLUMNS)}, k.name, k.contract_type "
+                f"FROM clauses c JOIN contracts k ON k.id = c.contract_id{where} "
+                "ORDER BY c.risk_score DESC, c.id LIMIT ? OFFSET ?",
+                clause_params + contract_params + [limit, offset]
+            ).fetchall()
+        return [dict(zip(CLAUSE_COLUMNS + ("contract_name", "contract_type"), row)) for row in rows]
+
+    def search_contracts(self, limit: int = 50, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        """
+        Contracts matching the contract filters that have at least one clause
+        matching the clause filters (same filters as search_clauses), riskiest first.
+        """
+        clause_conditions, clause_params, contract_conditions, contract_params = self._filters(**filters)
+        clause_where = " AND ".join(clause_conditions) or "1"
+        conditions = list(contract_conditions)
+        params = list(contract_params)
+        if clause_conditions:
+            # Walk contracts in risk_score index order and stop after one page, probing
+            # each contract's clauses through the (contract_id, type_norm, ...) index
+            conditions.append(
+                f"EXISTS (SELECT 1 FROM clauses c INDEXED BY idx_clauses_contract WHERE c.contract_id = k.id AND {clause_where})"
+            )
+            params.extend(clause_params)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('k.' + col for col in CONTRACT_COLUMNS)}, "
+                f"(SELECT COUNT(*) FROM clauses c INDEXED BY idx_clauses_contract WHERE c.contract_id = k.id AND {clause_where}) "
+                f"FROM contracts k{where} ORDER BY k.risk_score DESC, k.id LIMIT ? OFFSET ?",
+                clause_params + params + [limit, offset]
+            ).fetchall()
+        return [dict(zip(CONTRACT_COLUMNS + ("matching_clauses",), row)) for row in rows]
+
+    def get(self, contract_id: int) -> Optional[Dict[str, Any]]:
+        """The stored analysis of one contract."""
+        with self._lock:
+            row = self._conn.execute("SELECT analysis FROM contracts WHERE id = ?", (contract_id,)).fetchone()
+        return analysis_model.loads(row[0]).to_dict() if row else None
+
+    def load_analyses(self, status: str = None, batch_size: int = 1000) -> List[analysis_model.ContractAnalysis]:
+        """
+        Every stored analysis (optionally only contracts with this status) as compact
+        ContractAnalysis objects, e.g. for analysis_model.clauses_frame / to_arrow.
+        """
+        query = "SELECT analysis FROM contracts" + (" WHERE status = ?" if status else "") + " ORDER BY id"
+        analyses = []
+        with self._lock:
+            cursor = self._conn.execute(query, (status,) if status else ())
+            for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+                analyses.extend(analysis_model.loads(row[0]) for row in rows)
+        return analyses
+
+    def facets(self) -> Dict[str, List[str]]:
+        """Distinct clause types, contract types and risk factors, most common first, for filter menus."""
+        queries = {
+            "clause_types": "SELECT type FROM clauses WHERE type IS NOT NULL GROUP BY type_norm ORDER BY COUNT(*) DESC LIMIT 200",
+            "contract_types": "SELECT contract_type FROM contracts WHERE contract_type IS NOT NULL "
+                              "GROUP BY contract_type_norm ORDER BY COUNT(*) DESC LIMIT 200",
+            "risk_factors": "SELECT factor FROM risk_factors GROUP BY factor_norm ORDER BY COUNT(*) DESC LIMIT 200",
+        }
+        with self._lock:
+            return {name: [row[0] for row in self._conn.execute(sql)] for name, sql in queries.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            contracts, high = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(risk_level = 'High'), 0) FROM contracts"
+            ).fetchone()
+            clauses = self._conn.execute("SELECT COUNT(*) FROM clauses").fetchone()[0]
+        return {"contracts": contracts, "high_risk_contracts": high, "clauses": clauses}
+
+def _norm(value) -> Optional[str]:
+    return storage.normalize_text(str(value)).lower() if value else None
+
+def _fts_query(text: str) -> str:
+    """Quote every word so user input is never parsed as FTS5 syntax; words are ANDed."""
+    words = re.findall(r'\w+', text)
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words) or '""'
@@ -0,0 +1,112 @@
+from typing import Any, Dict, List
+
+import config
+import segmenter
+from risk_scorer import RiskScorer
+
+# Clause category suggested by the first matching keyword, for the local dashboard
+KEYWORD_TYPES = {
+    "penalty": "Penalty",
+    "liquidated damages": "Penalty",
+    "late fee": "Payment",
+    "payment terms": "Payment",
+    "unilateral termination": "Termination",
+    "termination for convenience": "Termination",
+    "indemnify": "Indemnity",
+    "indemnification": "Indemnity",
+    "limitation of liability": "Liability",
+    "non-compete": "Non-Compete",
+    "non-solicitation": "Non-Solicitation",
+    "exclusivity": "Exclusivity",
+    "governing law": "Jurisdiction",
+    "arbitration": "Arbitration",
+    "auto-renewal": "Auto-Renewal",
+    "automatic renewal": "Auto-Renewal",
+    "confidentiality": "Confidentiality",
+    "force majeure": "Force Majeure",
+    "notices": "Notices",
+    "amendment": "Amendment",
+    "definitions": "Definitions",
+}
+
+def risk_level(score: int) -> str:
+    if score >= 7:
+        return "High"
+    if score >= 4:
+        return "Medium"
+    return "Low"
+
+def prescreen_contract(contract_text: str, scorer: RiskScorer = None, threshold: int = None) -> Dict[str, Any]:
+    """
+    Score every clause of the contract locally with RiskScorer.
+    Returns the segments, a local clause analysis for each, the ids of clauses
+    scoring at or above threshold, and a decision:
+    "skip" (nothing risky, no model call needed), "partial" (send only the
+    risky clauses) or "full" (risky enough to analyze the whole contract).
+    """
+    scorer = scorer or RiskScorer()
+    threshold = threshold if threshold is not None else config.PRESCREEN_THRESHOLD
+    segments = segmenter.split_clauses(contract_text)
+
+    clauses = []
+    risky_ids = set()
+    for seg in segments:
+        terms = []
+        for term in scorer.find_risk_terms(seg["text"]):
+            if term["keyword"] not in terms:
+                terms.append(term["keyword"])
+        score = scorer.calculate_clause_risk(f"{seg['text']} {seg['heading']}")
+        clause_type = next((KEYWORD_TYPES[t] for t in terms if t in KEYWORD_TYPES), "General")
+        clauses.append({
+            "id": seg["id"],
+            "title": seg["heading"] or ("Preamble" if seg["id"] == "preamble" else f"Clause {seg['id']}"),
+            "text": seg["text"],
+            "type": clause_type,
+            "risk_level": risk_level(score),
+            "risk_score": score,
+            "explanation": ("Heuristic match on: " + ", ".join(terms)) if terms else "No risk keywords found.",
+            "recommendation": "Review this clause with the full AI analysis or a lawyer." if score >= threshold else "",
+            "risk_terms": terms,
+        })
+        if score >= threshold:
+            risky_ids.add(seg["id"])
+
+    if not risky_ids:
+        decision = "skip"
+    elif len(segments) == 1 or len(risky_ids) / len(segments) > config.PRESCREEN_FULL_FRACTION:
+        decision = "full"
+    else:
+        decision = "partial"
+
+    return {
+        "decision": decision,
+        "threshold": threshold,
+        "segments": segments,
+        "clauses": clauses,
+        "risky_ids": risky_ids,
+        "scorer": scorer,
+    }
+
+def local_analysis(screen: Dict[str, Any], contract_type_hint: str = "General") -> dict:
+    """Dashboard-shaped analysis built from a prescreen_contract() result, without any model call."""
+    clauses = [dict(c) for c in screen["clauses"]]
+    factors = []
+    for clause in clauses:
+        for term in clause.pop("risk_terms"):
+            if term not in factors:
+                factors.append(term)
+    risky = len(screen["risky_ids"])
+    return {
+        "contract_type": contract_type_hint,
+        "summary": (
+            f"Local keyword pre-screen: {len(clauses)} clauses checked, {risky} at or above "
+            f"risk score {screen['threshold']}. No AI analysis was run."
+        ),
+        "parties": [],
+        "contract_date": "",
+        "jurisdiction": "",
+        "clauses": clauses,
+        "overall_risk_factors": factors,
+        "risk_metadata": screen["scorer"].calculate_composite_risk(clauses),
+        "analysis_mode": "local",
+    }
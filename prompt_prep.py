@@ -0,0 +1,94 @@
+import re
+from typing import Callable, List, Tuple
+
+import config
+import segmenter
+import storage
+
+# Bare page numbers: "12", "Page 3", "Page 3 of 10", "3/10", "- 4 -"
+PAGE_NUMBER_PATTERN = re.compile(
+    r'^[ \t]*(?:(?:page[ \t]*)?\d{1,4}(?:[ \t]*(?:of|/)[ \t]*\d{1,4})?|-[ \t]*\d{1,4}[ \t]*-)[ \t]*$',
+    re.IGNORECASE
+)
+
+def _line_shape(line: str) -> str:
+    """Header/footer lines differ only in their numbers from page to page."""
+    return re.sub(r'\d+', '#', line.strip().lower())
+
+def strip_page_furniture(lines: List[str], min_repeats: int = None) -> List[str]:
+    """
+    Drop page numbers and running headers/footers: short lines that recur at
+    least min_repeats times, never closer together than a page's worth of
+    lines. Clause headings are always kept, even when a title repeats.
+    """
+    min_repeats = min_repeats or config.PROMPT_FURNITURE_MIN_REPEATS
+    positions = {}
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if 0 < len(stripped) <= config.PROMPT_FURNITURE_MAX_CHARS and not segmenter.HEADING_PATTERN.match(stripped):
+            positions.setdefault(_line_shape(line), []).append(index)
+    furniture = {
+        shape for shape, found in positions.items()
+        if len(found) >= min_repeats
+        and min(b - a for a, b in zip(found, found[1:])) >= config.PROMPT_FURNITURE_MIN_GAP_LINES
+    }
+    return [line for line in lines if not PAGE_NUMBER_PATTERN.match(line) and _line_shape(line) not in furniture]
+
+def rejoin_lines(text: str) -> str:
+    """Undo PDF line wrapping: hyphenated word breaks and sentences broken across lines."""
+    text = re.sub(r'(\w)-\n[ \t]*([a-z])', r'\1\2', text)
+    # A line that does not end a sentence, followed by one starting in lower case, is the same sentence
+    return re.sub(r'(?<![.:;!?\n])\n[ \t]*(?=[a-z])', ' ', text)
+
+def dedupe_paragraphs(text: str, min_chars: int = None) -> str:
+    """Keep only the first copy of long paragraphs that appear more than once (repeated boilerplate)."""
+    min_chars = min_chars or config.PROMPT_DEDUPE_MIN_CHARS
+    seen = set()
+    kept = []
+    for paragraph in text.split("\n\n"):
+        key = storage.normalize_text(paragraph).lower()
+        if len(key) >= min_chars:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(paragraph)
+    return "\n\n".join(kept)
+
+def compact_text(text: str) -> str:
+    """
+    Prepare extracted contract text for the prompt: strip page furniture, rejoin
+    broken lines, collapse whitespace runs and drop duplicated boilerplate.
+    Line starts are kept, so clause headings still split with segmenter.
+    """
+    lines = strip_page_furniture(text.replace("\r\n", "\n").replace("\r", "\n").split("\n"))
+    text = "\n".join(re.sub(r'[ \t\u00a0]+', ' ', line).strip() for line in lines)
+    text = rejoin_lines(text)
+    text = re.sub(r'\n{3,}', '\n\n', text).strip()
+    return dedupe_paragraphs(text)
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate from the character count, for when a count_tokens call is not worth it."""
+    return len(text) // config.PROMPT_CHARS_PER_TOKEN + 1
+
+def token_budget(model_name: str) -> int:
+    """Max contract-text tokens per prompt for the model."""
+    return config.PROMPT_TOKEN_BUDGETS.get(model_name, config.DEFAULT_PROMPT_TOKEN_BUDGET)
+
+def fit_to_budget(text: str, budget: int, count_tokens: Callable[[str], int]) -> Tuple[str, int]:
+    """
+    Shorten text to at most budget tokens, cutting at a clause or paragraph
+    boundary. count_tokens is only called when the character estimate says the
+    text might not fit. Returns (text, tokens), tokens None if never counted.
+    """
+    if len(text) <= budget * config.PROMPT_CHARS_PER_TOKEN * 0.8:
+        return text, None
+    tokens = count_tokens(text)
+    while tokens > budget:
+        cut = int(len(text) * budget / tokens * 0.95)
+        # A paragraph break if one is in the second half, else a line break, else the cut itself
+        boundary = text.rfind("\n\n", 0, cut)
+        if boundary <= cut // 2:
+            boundary = text.rfind("\n", 0, cut)
+        text = text[:boundary if boundary > cut // 2 else cut].rstrip()
+        tokens = count_tokens(text)
+    return text, tokens
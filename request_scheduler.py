@@ -0,0 +1,205 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from google.api_core import exceptions as google_exceptions
+
+import config
+
+# Errors worth retrying: quota/rate limits and transient server-side failures
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+class QueueTimeout(Exception):
+    """Raised when a request waited longer than the scheduler's max_wait for budget."""
+
+def estimate_tokens(prompt: str) -> int:
+    """Cheap token estimate (~4 characters per token) plus the expected answer size."""
+    return len(prompt) // 4 + config.EXPECTED_OUTPUT_TOKENS
+
+class RequestScheduler:
+    """
+    Per-model request scheduler.
+    Keeps requests within a sliding one-minute requests/tokens budget by queueing
+    them (first come, first served) instead of failing, and retries retryable
+    errors with jittered exponential backoff. A rate-limit error from the API
+    also pauses the whole queue for the backoff period.
+    """
+
+    def __init__(self, model_name: str, rpm: int = None, tpm: int = None, max_retries: int = None,
+                 max_wait_seconds: float = None):
+        limits = config.MODEL_RATE_LIMITS.get(model_name, config.DEFAULT_RATE_LIMITS)
+        self.model_name = model_name
+        self.rpm = rpm or limits["rpm"]
+        self.tpm = tpm or limits["tpm"]
+        self.max_retries = max_retries if max_retries is not None else config.SCHEDULER_MAX_RETRIES
+        self.max_wait_seconds = max_wait_seconds or config.SCHEDULER_MAX_WAIT_SECONDS
+
+        self._lock = threading.Condition()
+        self._window = deque() # (timestamp, tokens) of requests sent in the last minute
+        self._waiting = deque() # tickets of queued requests, head is served first
+        self._next_ticket = 0
+        self._paused_until = 0.0
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "timeouts": 0,
+                       "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    # Budget bookkeeping
+
+    def _expire(self, now: float):
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+
+    def _delay_for(self, ticket: int, tokens: int, now: float) -> float:
+        """Seconds until this ticket may send; 0 means reserve now. Caller holds the lock."""
+        if self._waiting[0] != ticket:
+            return 0.05 # Not at the head of the queue yet
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._expire(now)
+        used_tokens = sum(t for _, t in self._window)
+        if len(self._window) >= self.rpm:
+            return 60 - (now - self._window[0][0])
+        if self._window and used_tokens + tokens > self.tpm:
+            # Wait until enough old requests leave the window
+            freed = 0
+            for sent_at, sent_tokens in self._window:
+                freed += sent_tokens
+                if used_tokens - freed + tokens <= self.tpm:
+                    return 60 - (now - sent_at)
+            # Larger than the whole budget: send once the window is empty
+            return 60 - (now - self._window[-1][0])
+        return 0.0
+
+    def _enqueue(self) -> int:
+        with self._lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting.append(ticket)
+            return ticket
+
+    def _try_reserve(self, ticket: int, tokens: int, enqueued_at: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._delay_for(ticket, tokens, now)
+            if delay > 0:
+                if now - enqueued_at + delay > self.max_wait_seconds:
+                    self._waiting.remove(ticket)
+                    self._stats["timeouts"] += 1
+                    self._lock.notify_all()
+                    raise QueueTimeout(
+                        f"Gemini request queue for {self.model_name} is saturated "
+                        f"(estimated wait {now - enqueued_at + delay:.0f}s)."
+                    )
+                return delay
+            self._waiting.popleft()
+            self._window.append((now, tokens))
+            waited = now - enqueued_at
+            self._stats["requests"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._lock.notify_all()
+            return 0.0
+
+    def _abandon(self, ticket: int):
+        """Drop a ticket whose waiter was interrupted so it doesn't block the queue head."""
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._lock.notify_all()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(config.SCHEDULER_MAX_BACKOFF_SECONDS,
+                                      config.SCHEDULER_BASE_BACKOFF_SECONDS * (2 ** attempt)))
+        if isinstance(error, RATE_LIMIT_ERRORS):
+            with self._lock:
+                self._stats["rate_limited"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        with self._lock:
+            self._stats["retries"] += 1
+        return delay
+
+    # Public API
+
+    def run(self, call: Callable[[], Any], tokens: int) -> Any:
+        """Run call() once the budget allows, retrying retryable errors. Blocks the calling thread."""
+        attempt = 0
+        while True:
+            ticket = self._enqueue()
+            enqueued_at = time.monotonic()
+            try:
+                while True:
+                    delay = self._try_reserve(ticket, tokens, enqueued_at)
+                    if not delay:
+                        break
+                    with self._lock:
+                        self._lock.wait(timeout=min(delay, 1.0))
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            try:
+                return call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    async def run_async(self, call: Callable[[], Any], tokens: int) -> Any:
+        """Async run(): call() must return an awaitable. Waits with asyncio.sleep, never blocking the loop."""
+        attempt = 0
+        while True:
+            ticket = self._enqueue()
+            enqueued_at = time.monotonic()
+            try:
+                while True:
+                    delay = self._try_reserve(ticket, tokens, enqueued_at)
+                    if not delay:
+                        break
+                    await asyncio.sleep(min(delay, 0.25))
+            except BaseException: # Includes task cancellation
+                self._abandon(ticket)
+                raise
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, current window usage and wait-time statistics."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            stats = dict(self._stats)
+            stats.update({
+                "model": self.model_name,
+                "queue_depth": len(self._waiting),
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": sum(t for _, t in self._window),
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "paused_seconds": max(0.0, self._paused_until - now),
+            })
+        stats["avg_wait_seconds"] = round(stats["total_wait_seconds"] / stats["requests"], 3) if stats["requests"] else 0.0
+        return stats
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(model_name: str) -> RequestScheduler:
+    """The process-wide scheduler for a model, so every analyzer shares its budget."""
+    with _schedulers_lock:
+        if model_name not in _schedulers:
+            _schedulers[model_name] = RequestScheduler(model_name)
+        return _schedulers[model_name]
@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+import segmenter
+import storage
+
+class RevisionStore:
+    """
+    Successive versions of the same contract (e.g. drafts exchanged during a
+    negotiation), grouped under a document name. Each version keeps its text
+    and final analysis so the next revision can be diffed against it.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.REVISIONS_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS revisions (
+                document TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (document, version)
+            );
+        """)
+        self._conn.commit()
+
+    def add(self, document: str, contract_text: str, analysis: Dict[str, Any]) -> int:
+        """
+        Store a new version and return its number. Re-adding the text of the
+        latest version replaces its analysis instead of creating a new version.
+        """
+        content_hash = storage.content_hash(storage.normalize_text(contract_text))
+        payload = json.dumps(analysis, ensure_ascii=False)
+        with self._lock:
+            latest = self._conn.execute(
+                "SELECT version, content_hash FROM revisions WHERE document = ? ORDER BY version DESC LIMIT 1",
+                (document,)
+            ).fetchone()
+            if latest is not None and latest[1] == content_hash:
+                version = latest[0]
+                self._conn.execute(
+                    "UPDATE revisions SET analysis = ?, created_at = ? WHERE document = ? AND version = ?",
+                    (payload, time.time(), document, version)
+                )
+            else:
+                version = latest[0] + 1 if latest is not None else 1
+                self._conn.execute(
+                    "INSERT INTO revisions (document, version, content_hash, text, analysis, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (document, version, content_hash, contract_text, payload, time.time())
+                )
+            self._conn.commit()
+        return version
+
+    def get(self, document: str, version: int = None) -> Optional[Dict[str, Any]]:
+        """One version (the latest if version is None) with its text and analysis, or None."""
+        query = "SELECT version, content_hash, text, analysis, created_at FROM revisions WHERE document = ?"
+        params = [document]
+        if version is None:
+            query += " ORDER BY version DESC LIMIT 1"
+        else:
+            query += " AND version = ?"
+            params.append(version)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        if row is None:
+            return None
+        return {
+            "document": document, "version": row[0], "content_hash": row[1], "text": row[2],
+            "analysis": json.loads(row[3]), "created_at": row[4],
+        }
+
+    def versions(self, document: str) -> List[Dict[str, Any]]:
+        """Version numbers, overall scores and times of one document, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, analysis, created_at FROM revisions WHERE document = ? ORDER BY version", (document,)
+            ).fetchall()
+        return [
+            {"version": version, "risk_score": json.loads(analysis).get("risk_metadata", {}).get("score"),
+             "created_at": created_at}
+            for version, analysis, created_at in rows
+        ]
+
+    def documents(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT document FROM revisions ORDER BY document").fetchall()
+        return [row[0] for row in rows]
+
+def _body_key(seg: Dict[str, Any]) -> str:
+    """Clause text without its number, so a clause that was only renumbered still matches."""
+    body = seg["text"]
+    match = segmenter.HEADING_PATTERN.match(body)
+    if match and seg["id"] != "preamble":
+        body = body[match.end():]
+    return storage.normalize_text(body).lower()
+
+def _title_key(seg: Dict[str, Any]) -> str:
+    return seg["heading"].lstrip("0123456789.) ").strip().lower()
+
+def diff_clauses(old_segments: List[Dict[str, Any]], new_segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compare two versions clause by clause (segmenter segments).
+    A new clause is unchanged if an old clause has the same text (ignoring
+    whitespace, case and numbering), modified if it replaces an old clause with
+    the same number or title, and added otherwise; old clauses left over were
+    removed. Returns {"unchanged": {new id: old id}, "modified": {new id: old id},
+    "added": [new ids], "removed": [old ids]}.
+    """
+    old_by_body = {}
+    for seg in old_segments:
+        old_by_body.setdefault(_body_key(seg), []).append(seg["id"])
+
+    unchanged, pending = {}, []
+    for seg in new_segments:
+        candidates = old_by_body.get(_body_key(seg))
+        if candidates:
+            # Prefer the old clause with the same number when the text appears more than once
+            old_id = seg["id"] if seg["id"] in candidates else candidates[0]
+            candidates.remove(old_id)
+            unchanged[seg["id"]] = old_id
+        else:
+            pending.append(seg)
+
+    matched = set(unchanged.values())
+    remaining = [seg for seg in old_segments if seg["id"] not in matched]
+    by_id = {seg["id"]: seg for seg in remaining}
+    by_title = {}
+    for seg in remaining:
+        if _title_key(seg):
+            by_title.setdefault(_title_key(seg), seg)
+
+    modified, added = {}, []
+    for seg in pending:
+        old = by_id.get(seg["id"])
+        if old is None or old["id"] in matched:
+            old = by_title.get(_title_key(seg)) if _title_key(seg) else None
+        if old is not None and old["id"] not in matched:
+            matched.add(old["id"])
+            modified[seg["id"]] = old["id"]
+        else:
+            added.append(seg["id"])
+
+    removed = [seg["id"] for seg in old_segments if seg["id"] not in matched]
+    return {"unchanged": unchanged, "modified": modified, "added": added, "removed": removed}
+
+def risk_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Change in the overall risk score, level and high-risk clause count between two analyses."""
+    before = previous.get("risk_metadata", {})
+    after = current.get("risk_metadata", {})
+    return {
+        "score_before": before.get("score", 0),
+        "score_after": after.get("score", 0),
+        "score_change": round(after.get("score", 0) - before.get("score", 0), 2),
+        "level_before": before.get("level"),
+        "level_after": after.get("level"),
+        "high_risk_change": after.get("high_risk_clauses", 0) - before.get("high_risk_clauses", 0),
+    }
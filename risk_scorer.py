@@ -1,7 +1,67 @@
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Iterable, Set, Tuple
+import numpy as np
+import pandas as pd
+
+class KeywordMatcher:
+    """
+    Finds every occurrence of a fixed set of lowercase keywords in one regex scan.
+    The keywords are compiled into a prefix-trie shaped pattern, so the work per
+    text position depends on how the keywords branch, not on how many there are.
+    Matching is plain substring matching, same as `keyword in text`.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        # The regex reports the longest keyword at each start position, so also
+        # remember which shorter keywords are prefixes of it.
+        self._prefixes = {k: [p for p in self.keywords if k.startswith(p)] for k in self.keywords}
+        self._pattern = re.compile(self._trie_pattern(self.keywords)) if self.keywords else None
+
+    @staticmethod
+    def _trie_pattern(keywords: List[str]) -> str:
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[""] = {} # End-of-keyword marker
+
+        def build(node) -> str:
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            # Greedy optional group: prefer the longer keyword, fall back to the one ending here
+            return f"(?:{body})?" if "" in node else body
+
+        return build(trie)
+
+    def find_all(self, text_lower: str) -> List[Tuple[str, int]]:
+        """Return (keyword, start) for every occurrence, including overlapping ones."""
+        hits = []
+        if self._pattern is None:
+            return hits
+        search = self._pattern.search
+        pos = 0
+        while True:
+            match = search(text_lower, pos)
+            if match is None:
+                return hits
+            start = match.start()
+            for keyword in self._prefixes[match.group()]:
+                hits.append((keyword, start))
+            pos = start + 1
+
+    def matched(self, text_lower: str) -> Set[str]:
+        """Set of keywords that occur anywhere in the text."""
+        return {keyword for keyword, _ in self.find_all(text_lower)}
 
 class RiskScorer:
-    def __init__(self):
+    # Phrases that add +1 on top of the clause score
+    BOOSTERS = ["shall pay", "liable for"]
+
+    def __init__(self, extra_patterns: Dict[str, List[str]] = None, extra_weights: Dict[str, int] = None):
         # Keywords to help identify risky clauses if not explicitly tagged by LLM
         # or to validate LLM output.
         self.risk_patterns = {
@@ -34,31 +94,64 @@ class RiskScorer:
             "jurisdiction": 5
         }
 
+        # In-house keyword lists extend the defaults
+        for tier, keywords in (extra_patterns or {}).items():
+            self.risk_patterns.setdefault(tier, []).extend(k for k in keywords if k not in self.risk_patterns[tier])
+        self.risk_weights.update(extra_weights or {})
+
+        self.rebuild_matchers()
+
+    def rebuild_matchers(self):
+        """Compile the keyword matchers. Call again after editing risk_patterns or risk_weights."""
+        self._keyword_tiers = {}
+        for tier, keywords in self.risk_patterns.items():
+            for keyword in keywords:
+                self._keyword_tiers.setdefault(keyword.lower(), set()).add(tier)
+        for keyword in self.BOOSTERS:
+            self._keyword_tiers.setdefault(keyword, set()).add("booster")
+        self._high = {k.lower() for k in self.risk_patterns.get("high", [])}
+        self._medium = {k.lower() for k in self.risk_patterns.get("medium", [])}
+        self._boosters = set(self.BOOSTERS)
+        self._weights = {k.lower(): w for k, w in self.risk_weights.items()}
+
+        self.text_matcher = KeywordMatcher(self._keyword_tiers)
+        self.type_matcher = KeywordMatcher(self._weights)
+
+        # Per-tier "any keyword present" patterns for the vectorized DataFrame path
+        self._tier_patterns = {
+            name: KeywordMatcher._trie_pattern(sorted(keywords)) if keywords else None
+            for name, keywords in (("high", self._high), ("medium", self._medium), ("booster", self._boosters))
+        }
+
+    def find_risk_terms(self, text: str) -> List[Dict[str, Any]]:
+        """Every risk keyword occurrence in text, with its tiers and position."""
+        return [
+            {"keyword": keyword, "tiers": sorted(self._keyword_tiers[keyword]), "start": start, "end": start + len(keyword)}
+            for keyword, start in self.text_matcher.find_all(text.lower())
+        ]
+
     def calculate_clause_risk(self, clause_text: str, clause_type: str = None) -> int:
         """
         Calculate risk score for a single clause (0-10).
         Uses clause_type if provided (from LLM), otherwise heuristic text analysis.
         """
         score = 1 # Minimum risk
-        text_lower = clause_text.lower()
         
         # 1. Use type-based base score if available
         if clause_type:
-            for key, weight in self.risk_weights.items():
-                if key in clause_type.lower():
-                    score = max(score, weight)
+            for key in self.type_matcher.matched(clause_type.lower()):
+                score = max(score, self._weights[key])
         
-        # 2. Text-based heuristic boost
-        for keyword in self.risk_patterns["high"]:
-            if keyword in text_lower:
-                score = max(score, 7)
+        # 2. Text-based heuristic boost (one pass over the text for all keyword tiers)
+        found = self.text_matcher.matched(clause_text.lower())
+        if found & self._high:
+            score = max(score, 7)
         
-        for keyword in self.risk_patterns["medium"]:
-            if keyword in text_lower and score < 5:
-                score = max(score, 5)
+        if found & self._medium:
+            score = max(score, 5)
                 
         # 3. Specific boosters
-        if "shall pay" in text_lower or "liable for" in text_lower:
+        if found & self._boosters:
             score += 1
             
         return min(10, score) # Cap at 10
@@ -103,3 +196,70 @@ class RiskScorer:
             "max_clause_score": max_clause_score,
             "high_risk_clauses": high_risk_count
         }
+
+    def score_frame(self, df: pd.DataFrame, text_col: str = "text", title_col: str = "title",
+                    type_col: str = "type") -> pd.DataFrame:
+        """
+        Vectorized calculate_clause_risk over a DataFrame of clauses.
+        Returns a copy of df with an integer 'risk_score' column, identical to
+        scoring each row with calculate_clause_risk(text + " " + title, type).
+        """
+        def column(name):
+            if name in df.columns:
+                return df[name].fillna("").astype(str)
+            return pd.Series("", index=df.index)
+
+        text_lower = (column(text_col) + " " + column(title_col)).str.lower()
+
+        def contains(series, pattern):
+            if pattern is None or series.empty:
+                return np.zeros(len(series), dtype=bool)
+            return series.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+        # 1. Type-based base score. LLM clause types repeat heavily, so match each distinct type once.
+        type_codes, type_values = pd.factorize(column(type_col).str.lower())
+        type_values = pd.Series(type_values)
+        type_score = np.ones(len(type_values), dtype=np.int64)
+        for key, weight in self._weights.items():
+            hit = type_values.str.contains(key, regex=False).to_numpy(dtype=bool)
+            type_score = np.where(hit, np.maximum(type_score, weight), type_score)
+        score = type_score[type_codes] if len(type_values) else np.ones(len(df), dtype=np.int64)
+
+        # 2. Text-based heuristic boost
+        score = np.where(contains(text_lower, self._tier_patterns["high"]), np.maximum(score, 7), score)
+        # Medium keywords can only change rows still below 5
+        below = score < 5
+        medium = np.zeros(len(df), dtype=bool)
+        medium[below] = contains(text_lower[below], self._tier_patterns["medium"])
+        score = np.where(medium, 5, score)
+
+        # 3. Specific boosters, then cap at 10
+        score = score + contains(text_lower, self._tier_patterns["booster"])
+        result = df.copy()
+        result["risk_score"] = np.minimum(score, 10)
+        return result
+
+    def calculate_composite_risk_bulk(self, df: pd.DataFrame, group_col: str = "contract_id",
+                                      score_col: str = "risk_score") -> pd.DataFrame:
+        """
+        calculate_composite_risk for many contracts at once.
+        df holds one row per clause; returns one row per group_col value with
+        score, level, max_clause_score and high_risk_clauses.
+        """
+        scores = df[score_col].fillna(0)
+        grouped = scores.groupby(df[group_col], sort=False)
+        total = grouped.sum()
+        count = grouped.size()
+        max_clause_score = grouped.max().clip(lower=0)
+        high_risk_clauses = (scores >= 7).groupby(df[group_col], sort=False).sum()
+
+        composite = (total / count) * 0.4 + max_clause_score * 0.6
+        levels = np.select([composite >= 7, composite >= 4], ["High", "Medium"], default="Low")
+
+        return pd.DataFrame({
+            # Python round() to match the scalar path exactly (numpy rounds differently on ties)
+            "score": [round(float(v), 1) for v in composite],
+            "level": levels,
+            "max_clause_score": max_clause_score.to_numpy(),
+            "high_risk_clauses": high_risk_clauses.to_numpy(),
+        }, index=composite.index)
@@ -0,0 +1,165 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Clause/section headings: "1.", "2.3", "12)", "ARTICLE IV", "Section 5", "Clause 7", "SCHEDULE A".
+# A numbered line is only a candidate; find_headings() decides whether it is a heading.
+HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'(?P<num>\d{1,3}(?:\.\d{1,3})*)(?P<term>[.)])?[ \t]+(?=\S)'
+    r'|(?P<word>(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|ANNEXURE|Annexure)[ \t]+[0-9A-Za-z.]+)'
+    r')',
+    re.MULTILINE
+)
+
+def _follows(number: Tuple[int, ...], last: Optional[Tuple[int, ...]]) -> bool:
+    """
+    Whether a clause number can come after the last one: the next number at
+    some level (one skipped number, e.g. a deleted clause, is tolerated) or the
+    first sub-clause, as 2 -> 3, 2.3 -> 2.4, 2.3 -> 3, 2 -> 2.1.
+    """
+    if last is None or number == last + (1,):
+        return True
+    depth = len(number)
+    return depth <= len(last) and number[:-1] == last[:depth - 1] and 0 < number[-1] - last[depth - 1] <= 2
+
+def find_headings(text: str) -> List[re.Match]:
+    """
+    The HEADING_PATTERN matches that really start a clause. A numbered line
+    with a "1." / "1)" terminator after a blank or heading line counts if its
+    number is higher than the previous heading's. Any other numbered line must
+    still look like a heading (a terminator, a multi-level number, or a blank
+    or heading line before it) and carry the next number, so a wrapped body
+    line such as "30 days of the invoice date" stays in its clause. Word
+    headings (ARTICLE, Section, ...) always count and restart the numbering.
+    """
+    headings, last = [], None
+    for match in HEADING_PATTERN.finditer(text):
+        if match.group("word"):
+            headings.append(match)
+            last = None
+            continue
+        number = tuple(int(part) for part in match.group("num").split("."))
+        line_start = match.start()
+        previous_start = text.rfind("\n", 0, max(line_start - 1, 0)) + 1
+        set_off = (line_start == 0 or not text[previous_start:line_start].strip()
+                   or (headings and headings[-1].start() == previous_start))
+        terminated = match.group("term") is not None
+        if terminated and set_off:
+            accepted = last is None or number > last
+        else:
+            accepted = (terminated or set_off or len(number) > 1) and _follows(number, last)
+        if accepted:
+            headings.append(match)
+            last = number
+    return headings
+
+def split_clauses(text: str) -> List[Dict]:
+    """
+    Split contract text into segments at numbered clause/section headings.
+    Returns a list of dicts with 'id', 'heading', 'text', 'start' and 'end'.
+    Text before the first heading (title, parties, recitals) becomes a 'preamble' segment.
+    Ids are unique: a repeated heading number gets a suffix ("4-2").
+    """
+    segments = []
+    matches = find_headings(text)
+    seen = {}
+
+    if not matches or matches[0].start() > 0:
+        end = matches[0].start() if matches else len(text)
+        preamble = text[:end].strip()
+        if preamble:
+            segments.append({"id": "preamble", "heading": "", "text": preamble, "start": 0, "end": end})
+
+    for i, match in enumerate(matches):
+        start = match.start()
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[start:end].strip()
+        if not body:
+            continue
+        heading = body.splitlines()[0].strip()
+        seg_id = match.group("num") or match.group("word")
+        seen[seg_id] = seen.get(seg_id, 0) + 1
+        if seen[seg_id] > 1:
+            seg_id = f"{seg_id}-{seen[seg_id]}"
+        segments.append({"id": seg_id, "heading": heading, "text": body, "start": start, "end": end})
+
+    return segments
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Break a single over-long segment at paragraph, then sentence, then hard boundaries."""
+    pieces = []
+    current = ""
+    for unit in re.split(r'(?<=\n\n)|(?<=[.;:])\s+', text):
+        if not unit:
+            continue
+        while len(unit) > max_chars:
+            pieces.append(unit[:max_chars])
+            unit = unit[max_chars:]
+        if current and len(current) + len(unit) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_segments(segments: List[Dict], max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """
+    Pack consecutive segments into chunks of at most max_chars.
+    Each chunk after the first repeats trailing segments of the previous one
+    (up to overlap_chars) so clauses that straddle a boundary keep their context.
+    """
+    units = []
+    for seg in segments:
+        if len(seg["text"]) > max_chars:
+            units.extend(_split_oversized(seg["text"], max_chars))
+        else:
+            units.append(seg["text"])
+
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        if current and size + len(unit) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            # Carry trailing units forward as overlap
+            carried = []
+            carried_size = 0
+            for prev in reversed(current):
+                if carried_size + len(prev) > overlap_chars or carried_size + len(prev) + len(unit) > max_chars:
+                    break
+                carried.insert(0, prev)
+                carried_size += len(prev) + 2
+            current = carried
+            size = carried_size
+        current.append(unit)
+        size += len(unit) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def chunk_text(text: str, max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """Split text at clause boundaries into overlapping chunks of at most max_chars."""
+    return chunk_segments(split_clauses(text), max_chars, overlap_chars)
+
+def iter_chunks(pages: Iterable[str], max_chars: int, overlap_chars: int = 0) -> Iterator[str]:
+    """
+    Streaming counterpart of chunk_text for text that arrives page by page.
+    Chunks are yielded as soon as enough text has arrived; the last, possibly
+    unfinished chunk is held back until the next pages complete it, so memory
+    stays around a few chunks no matter how long the document is.
+    """
+    pending = []
+    pending_size = 0
+    for page in pages:
+        pending.append(page)
+        pending_size += len(page) + 1
+        if pending_size < 2 * max_chars:
+            continue
+        chunks = chunk_text("\n".join(pending), max_chars, overlap_chars)
+        yield from chunks[:-1]
+        pending = [chunks[-1]] if chunks else []
+        pending_size = sum(len(p) + 1 for p in pending)
+
+    if pending:
+        yield from chunk_text("\n".join(pending), max_chars, overlap_chars)
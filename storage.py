@@ -0,0 +1,31 @@
+import hashlib
+import os
+import re
+import sqlite3
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially re-flowed copies of a document hash the same."""
+    return re.sub(r'\s+', ' ', text or "").strip()
+
+def content_hash(*parts: str) -> str:
+    """Stable SHA-256 hex digest over one or more string parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x1f") # Unit separator so ("ab", "c") != ("a", "bc")
+    return digest.hexdigest()
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database for the local stores.
+    WAL mode lets readers proceed while a writer is active; the busy timeout
+    makes concurrent writers wait instead of failing with 'database is locked'.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
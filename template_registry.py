@@ -0,0 +1,236 @@
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import analysis_model
+import config
+import segmenter
+import storage
+import template_generator
+from clause_store import NUMBERING_PATTERN, simhash
+
+# Fill-in-the-blank markers in template text: [Amount], [Date], [Employer Name]
+PLACEHOLDER_PATTERN = re.compile(r'\[[^\[\]\n]{1,60}\]')
+
+# Values accepted in place of a placeholder, by a keyword of its name; a clause
+# whose value does not fit deviates from the template and goes to the model
+_MONEY = r'(?:(?:rs\.?|inr|usd|eur|gbp|[$₹€£])\s*)?\d[\d,]*(?:\.\d+)?(?:\s*(?:lakhs?|crores?|thousand|million|billion))?'
+FILL_PATTERNS = (
+    ("amount", _MONEY + r'(?:\s*(?:/-|rupees|dollars|inr|usd))?(?:\s*\([a-z .,-]{1,80}\))?'),
+    ("number", r'\d+(?:\.\d+)?|[a-z]+(?:-[a-z]+)?(?:\s*\(\d+(?:\.\d+)?\))?'),
+    ("percentage", r'\d+(?:\.\d+)?|[a-z]+(?:-[a-z]+)?(?:\s*\(\d+(?:\.\d+)?\))?'),
+    ("date", r'[\w ./-]{1,30}?(?:,\s*\d{4})?'),
+)
+# Names, titles, places: short and without clause punctuation
+TEXT_FILL = r'[^;:!?()\[\]\n]{{1,{}}}?'
+
+BUILTIN_TEMPLATES = {
+    "Employment Agreement": template_generator.get_employment_agreement_template,
+    "Vendor Agreement": template_generator.get_vendor_service_template,
+    "Office Lease": template_generator.get_lease_template,
+}
+
+def _normalize(seg: Dict[str, Any]) -> str:
+    """Clause text with collapsed whitespace, straight quotes and no leading clause number."""
+    text = storage.normalize_text(seg["text"])
+    text = text.translate(str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'}))
+    return text if seg["id"] == "preamble" else NUMBERING_PATTERN.sub("", text, count=1)
+
+def clause_pattern(seg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A regex matching the template clause with a value of the right kind in
+    place of each placeholder (case-insensitive), and the placeholder names in order.
+    """
+    text = _normalize(seg)
+    literals = PLACEHOLDER_PATTERN.split(text)
+    names = [name[1:-1] for name in PLACEHOLDER_PATTERN.findall(text)]
+    pattern = re.escape(literals[0])
+    for name, literal in zip(names, literals[1:]):
+        # A blank left unfilled matches itself
+        pattern += f"({re.escape(f'[{name}]')}|{fill_pattern(name)})" + re.escape(literal)
+    return {"id": seg["id"], "pattern": pattern, "placeholders": names}
+
+def fill_pattern(placeholder: str) -> str:
+    """The regex for values of one placeholder, chosen by its name."""
+    for keyword, pattern in FILL_PATTERNS:
+        if keyword in placeholder.lower():
+            return pattern
+    return TEXT_FILL.format(config.TEMPLATE_MAX_FILL_CHARS)
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class TemplateRegistry:
+    """
+    Known contract templates (the built-in ones plus any registered house
+    templates), each stored with its clause segmentation, a placeholder-aware
+    pattern per clause, a SimHash fingerprint of the whole text and a cached
+    risk analysis per model. An incoming contract is aligned to its closest
+    template so only the clauses that deviate from it need the model.
+    """
+
+    def __init__(self, path: str = None, builtins: bool = True):
+        self.path = path or config.TEMPLATE_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS templates (
+                name TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                simhash INTEGER NOT NULL,
+                segments TEXT NOT NULL,
+                patterns TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS template_analyses (
+                name TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                analysis BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (name, scope)
+            );
+        """)
+        self._conn.commit()
+        self._index = {} # name -> template with compiled patterns, for matching without a query
+        if builtins:
+            for name, build in BUILTIN_TEMPLATES.items():
+                self.register(name, build())
+        self._load()
+
+    def _load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT name, text, simhash, segments, patterns FROM templates").fetchall()
+        self._index = {
+            name: {
+                "name": name,
+                "text": text,
+                "simhash": fingerprint & ((1 << 64) - 1),
+                "segments": json.loads(segments),
+                "patterns": [
+                    dict(p, regex=re.compile(p["pattern"], re.IGNORECASE | re.DOTALL)) for p in json.loads(patterns)
+                ],
+            }
+            for name, text, fingerprint, segments, patterns in rows
+        }
+
+    def register(self, name: str, template_text: str):
+        """
+        Add or update a template. Segmentation, clause patterns and the
+        fingerprint are computed here once; changing the text of an existing
+        template drops its cached analyses.
+        """
+        content_hash = storage.content_hash(storage.normalize_text(template_text))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, segments, patterns FROM templates WHERE name = ?", (name,)
+            ).fetchone()
+        if row is not None and row[0] == content_hash:
+            patterns = json.dumps([clause_pattern(seg) for seg in json.loads(row[1])], ensure_ascii=False)
+            if patterns != row[2]:
+                # The fill rules changed, not the template, so its cached analyses still apply
+                with self._lock:
+                    self._conn.execute("UPDATE templates SET patterns = ? WHERE name = ?", (patterns, name))
+                    self._conn.commit()
+                self._load()
+            return
+        segments = segmenter.split_clauses(template_text)
+        fingerprint = simhash(PLACEHOLDER_PATTERN.sub(" ", storage.normalize_text(template_text).lower()))
+        with self._lock:
+            self._conn.execute("DELETE FROM template_analyses WHERE name = ?", (name,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO templates (name, content_hash, text, simhash, segments, patterns, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, content_hash, template_text, fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint,
+                 json.dumps(segments, ensure_ascii=False),
+                 json.dumps([clause_pattern(seg) for seg in segments], ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+        self._load()
+
+    def remove(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM templates WHERE name = ?", (name,))
+            self._conn.execute("DELETE FROM template_analyses WHERE name = ?", (name,))
+            self._conn.commit()
+        self._load()
+
+    def names(self) -> List[str]:
+        return sorted(self._index)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """A template's text and segments, or None."""
+        template = self._index.get(name)
+        return {"name": name, "text": template["text"], "segments": template["segments"]} if template else None
+
+    def analysis(self, name: str, scope: str) -> Optional[Dict[str, Any]]:
+        """The cached analysis of a template for one model/prompt scope, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM template_analyses WHERE name = ? AND scope = ?", (name, scope)
+            ).fetchone()
+        return analysis_model.loads(row[0]).to_dict() if row else None
+
+    def store_analysis(self, name: str, scope: str, analysis: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO template_analyses (name, scope, analysis, created_at) VALUES (?, ?, ?, ?)",
+                (name, scope, analysis_model.dumps(analysis), time.time())
+            )
+            self._conn.commit()
+
+    def match(self, contract_text: str, segments: List[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Align a contract to its closest template.
+        The TEMPLATE_CANDIDATES templates nearest by fingerprint are aligned
+        clause by clause; a clause conforms when it equals a template clause
+        with any values filled into its placeholders. Returns the best alignment
+        ({"template", "coverage", "conforming": {segment id: template clause id},
+        "deviating": [segment ids], "missing": [template clause ids],
+        "fills": {placeholder: value}}), or None if less than
+        TEMPLATE_MIN_COVERAGE of the contract's clauses conform.
+        """
+        if not self._index:
+            return None
+        segments = segments if segments is not None else segmenter.split_clauses(contract_text)
+        if not segments:
+            return None
+        fingerprint = simhash(storage.normalize_text(contract_text).lower())
+        candidates = sorted(self._index.values(), key=lambda t: _hamming(fingerprint, t["simhash"]))
+        best = None
+        for template in candidates[:config.TEMPLATE_CANDIDATES]:
+            aligned = self._align(template, segments)
+            if best is None or aligned["coverage"] > best["coverage"]:
+                best = aligned
+        return best if best["coverage"] >= config.TEMPLATE_MIN_COVERAGE else None
+
+    @staticmethod
+    def _align(template: Dict[str, Any], segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        conforming, fills, used = {}, {}, set()
+        for seg in segments:
+            body = _normalize(seg)
+            # Try the template clause with the same number first, then any other
+            ordered = sorted(template["patterns"], key=lambda p: p["id"] != seg["id"])
+            for pattern in ordered:
+                if pattern["id"] in used or (pattern["id"] == "preamble") != (seg["id"] == "preamble"):
+                    continue
+                found = pattern["regex"].fullmatch(body)
+                if found:
+                    used.add(pattern["id"])
+                    conforming[seg["id"]] = pattern["id"]
+                    for name, value in zip(pattern["placeholders"], found.groups()):
+                        if value.strip().lower() != f"[{name}]".lower():
+                            fills.setdefault(name, value.strip())
+                    break
+        deviating = [seg["id"] for seg in segments if seg["id"] not in conforming]
+        return {
+            "template": template["name"],
+            "coverage": round(len(conforming) / len(segments), 3),
+            "conforming": conforming,
+            "deviating": deviating,
+            # Template clauses with neither a conforming nor a rewritten counterpart
+            "missing": [p["id"] for p in template["patterns"] if p["id"] not in used and p["id"] not in deviating],
+            "fills": fills,
+        }
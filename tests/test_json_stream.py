@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from json_stream import AnswerRepair
+
+HEADER = '"contract_type": "Service Agreement", "summary": "Vendor services.", "parties": ["Acme", "Beta"]'
+
+def clause(clause_id: str, risk: str = "Low") -> str:
+    return json.dumps({"id": clause_id, "title": f"Clause {clause_id}", "risk_level": risk})
+
+def answer(*clauses: str) -> str:
+    return "{" + HEADER + ', "clauses": [' + ", ".join(clauses) + "]}"
+
+def ids(analysis):
+    return [c["id"] for c in analysis["clauses"]]
+
+def test_complete_answer_needs_no_follow_up():
+    repair = AnswerRepair(answer(clause("1"), clause("2")))
+    assert repair.follow_up_note() is None
+    result = repair.result()
+    assert ids(result) == ["1", "2"]
+    assert result["summary"] == "Vendor services."
+    assert "warnings" not in result
+
+def test_truncated_answer_asks_for_the_tail():
+    text = answer(clause("1"), clause("2"), clause("3"))
+    repair = AnswerRepair(text[:text.index('{"id": "3"') + 12])
+    assert ids(repair.result()) == ["1", "2"]
+    note = repair.follow_up_note()
+    # Clause 3 was cut off mid-object, so everything after the last complete clause is asked for
+    assert "every clause after clause 2" in note
+
+def test_follow_up_completes_truncated_answer():
+    text = answer(clause("1"), clause("2"), clause("3"))
+    repair = AnswerRepair(text[:text.index('{"id": "3"')])
+    assert repair.add(answer(clause("3"), clause("4"))) == 2
+    assert repair.follow_up_note() is None
+    result = repair.result()
+    assert ids(result) == ["1", "2", "3", "4"]
+    assert "warnings" not in result
+
+def test_malformed_clause_is_requested_by_id_and_merged_in_place():
+    broken = '{"id": "2", "title": "Clause 2" "risk_level": "High"}'
+    repair = AnswerRepair(answer(clause("1"), broken, clause("3")))
+    assert ids(repair.result()) == ["1", "3"]
+    note = repair.follow_up_note()
+    assert "the clauses with ids 2" in note
+    assert "every clause after" not in note
+
+    assert repair.add(answer(clause("2", "High"))) == 1
+    result = repair.result()
+    assert ids(result) == ["1", "2", "3"]
+    assert result["clauses"][1]["risk_level"] == "High"
+    assert "warnings" not in result
+
+def test_follow_up_does_not_duplicate_clauses():
+    text = answer(clause("1"), clause("2"))
+    repair = AnswerRepair(text[:text.index('{"id": "2"')])
+    # The model repeats clause 1 despite being asked not to
+    assert repair.add(answer(clause("1"), clause("2"))) == 1
+    assert ids(repair.result()) == ["1", "2"]
+
+def test_unrecovered_clauses_are_reported():
+    broken = '{"id": "2", "title": "Clause 2" "risk_level": "High"}'
+    repair = AnswerRepair(answer(clause("1"), broken))
+    assert repair.add("still not json") == 0
+    assert repair.result()["warnings"] == ["1 clause(s) could not be recovered from a malformed or cut-off model answer."]
+
+def test_nothing_usable_raises():
+    repair = AnswerRepair("I cannot analyze this contract.")
+    with pytest.raises(json.JSONDecodeError):
+        repair.result()
@@ -0,0 +1,69 @@
+import segmenter
+from revisions import diff_clauses
+
+OLD = """SERVICE AGREEMENT between Acme and Beta.
+
+1. SERVICES
+The Vendor shall provide software maintenance.
+
+2. PAYMENT
+The Client shall pay Rs 50,000 per month.
+
+3. CONFIDENTIALITY
+Each party shall keep the other's information confidential.
+
+4. TERMINATION
+Either party may terminate with 30 days notice.
+"""
+
+def diff(old_text: str, new_text: str):
+    return diff_clauses(segmenter.split_clauses(old_text), segmenter.split_clauses(new_text))
+
+def test_identical_versions_are_unchanged():
+    result = diff(OLD, OLD)
+    assert result["unchanged"] == {"preamble": "preamble", "1": "1", "2": "2", "3": "3", "4": "4"}
+    assert result["modified"] == {} and result["added"] == [] and result["removed"] == []
+
+def test_changed_clause_is_modified():
+    new = OLD.replace("Rs 50,000 per month", "Rs 75,000 per month")
+    result = diff(OLD, new)
+    assert result["modified"] == {"2": "2"}
+    assert "2" not in result["unchanged"]
+    assert result["added"] == [] and result["removed"] == []
+
+def test_whitespace_and_case_changes_are_unchanged():
+    new = OLD.replace("The Vendor shall provide", "THE VENDOR  shall\nprovide")
+    assert diff(OLD, new)["unchanged"]["1"] == "1"
+
+def test_added_clause():
+    new = OLD + "\n5. ARBITRATION\nDisputes go to arbitration in Mumbai.\n"
+    result = diff(OLD, new)
+    assert result["added"] == ["5"]
+    assert result["removed"] == []
+
+def test_removed_clause():
+    new = OLD.replace("3. CONFIDENTIALITY\nEach party shall keep the other's information confidential.\n\n", "")
+    new = new.replace("4. TERMINATION", "3. TERMINATION")
+    result = diff(OLD, new)
+    # Termination moved from 4 to 3 with the same text
+    assert result["unchanged"]["3"] == "4"
+    assert result["removed"] == ["3"]
+    assert result["added"] == [] and result["modified"] == {}
+
+def test_renumbered_clauses_are_unchanged():
+    new = OLD.replace("1. SERVICES", "1. DEFINITIONS\nTerms have their usual meaning.\n\n2. SERVICES")
+    new = new.replace("2. PAYMENT", "3. PAYMENT").replace("3. CONFIDENTIALITY", "4. CONFIDENTIALITY")
+    new = new.replace("4. TERMINATION", "5. TERMINATION")
+    result = diff(OLD, new)
+    assert result["unchanged"] == {"preamble": "preamble", "2": "1", "3": "2", "4": "3", "5": "4"}
+    assert result["added"] == ["1"]
+    assert result["removed"] == [] and result["modified"] == {}
+
+def test_renumbered_and_edited_clause_is_matched_by_title():
+    new = OLD.replace("1. SERVICES", "1. DEFINITIONS\nTerms have their usual meaning.\n\n2. SERVICES")
+    new = new.replace("2. PAYMENT\nThe Client shall pay Rs 50,000", "3. PAYMENT\nThe Client shall pay Rs 90,000")
+    new = new.replace("3. CONFIDENTIALITY", "4. CONFIDENTIALITY").replace("4. TERMINATION", "5. TERMINATION")
+    result = diff(OLD, new)
+    assert result["modified"] == {"3": "2"}
+    assert result["added"] == ["1"]
+    assert result["removed"] == []
@@ -0,0 +1,76 @@
+import re
+
+from segmenter import chunk_text, split_clauses
+
+def contract(clauses: int, words: int = 30) -> str:
+    body = " ".join(["The parties agree to the terms set out here."] * (words // 9 + 1))
+    return "MASTER AGREEMENT\n\n" + "\n\n".join(f"{n}. HEADING {n}\n{body}" for n in range(1, clauses + 1))
+
+def clause_ids(chunk: str):
+    return re.findall(r'^(\d+)\. HEADING', chunk, re.MULTILINE)
+
+def test_split_clauses_keeps_preamble_and_numbers():
+    segments = split_clauses(contract(3))
+    assert [seg["id"] for seg in segments] == ["preamble", "1", "2", "3"]
+    assert segments[1]["heading"] == "1. HEADING 1"
+
+def test_short_text_is_one_chunk():
+    text = contract(2)
+    assert chunk_text(text, 10_000) == ["\n\n".join(seg["text"] for seg in split_clauses(text))]
+
+def test_chunks_respect_size_and_clause_boundaries():
+    text = contract(20)
+    chunks = chunk_text(text, 600)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= 600
+        # Every chunk after the first starts at a clause heading, never mid-clause
+        assert chunk.startswith("MASTER AGREEMENT") or re.match(r'\d+\. HEADING', chunk)
+
+def test_without_overlap_each_clause_appears_once():
+    chunks = chunk_text(contract(20), 600)
+    ids = [clause_id for chunk in chunks for clause_id in clause_ids(chunk)]
+    assert ids == [str(n) for n in range(1, 21)]
+
+def test_overlap_repeats_trailing_clauses():
+    text = contract(20)
+    clause_size = len(split_clauses(text)[1]["text"])
+    chunks = chunk_text(text, 600, overlap_chars=clause_size + 2)
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # The next chunk opens with the last clause of the previous one
+        assert clause_ids(chunk)[0] == clause_ids(previous)[-1]
+        assert len(chunk) <= 600
+    ids = {clause_id for chunk in chunks for clause_id in clause_ids(chunk)}
+    assert ids == {str(n) for n in range(1, 21)}
+
+def test_overlap_never_exceeds_overlap_chars():
+    text = contract(20)
+    clause_size = len(split_clauses(text)[1]["text"])
+    chunks = chunk_text(text, 600, overlap_chars=clause_size - 1)
+    ids = [clause_id for chunk in chunks for clause_id in clause_ids(chunk)]
+    assert ids == [str(n) for n in range(1, 21)]
+
+def test_oversized_clause_is_split_at_sentences():
+    text = contract(1, words=400)
+    chunks = chunk_text(text, 500)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= 500
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+
+def test_wrapped_lines_starting_with_numbers_stay_in_their_clause():
+    text = ("1. PAYMENT\nThe Client shall pay each invoice within\n30 days of the invoice date.\n"
+            "2. TERM\nThis Agreement runs for\n2 years and renews for\n1.5 further years.\n3. NOTICE\nIn writing.")
+    segments = split_clauses(text)
+    assert [seg["id"] for seg in segments] == ["1", "2", "3"]
+    assert "30 days of the invoice date" in segments[0]["text"]
+
+def test_headings_need_a_heading_shape_and_the_next_number():
+    text = "1. SCOPE\nServices.\n\n2 PAYMENT\nFees.\n2.1 Late fees\nInterest.\n5 OTHER\nMisc.\n3) TERM\nOne year."
+    assert [seg["id"] for seg in split_clauses(text)] == ["1", "2", "2.1", "3"]
+
+def test_segment_ids_are_unique():
+    text = "ARTICLE I\n1. Scope\nA.\n2. Fees\nB.\nARTICLE II\n1. Scope\nC.\n2. Fees\nD."
+    ids = [seg["id"] for seg in split_clauses(text)]
+    assert ids == ["ARTICLE I", "1", "2", "ARTICLE II", "1-2", "2-2"]
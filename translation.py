@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+import segmenter
+import storage
+import utils
+
+# Runs of non-blank lines; a clause heading and its body usually form one
+_PARAGRAPH = re.compile(r'(?:[^\n]*\S[^\n]*(?:\n|$))+')
+
+def language_units(contract_text: str) -> List[Dict[str, Any]]:
+    """
+    The paragraphs of each clause, with their span in the text and language
+    ("Hindi" when at least TRANSLATION_MIN_RATIO of their letters are
+    Devanagari, else "English"), so bilingual contracts are routed piece by piece.
+    """
+    units = []
+    for seg in segmenter.split_clauses(contract_text) or [{"start": 0, "end": len(contract_text)}]:
+        for found in _PARAGRAPH.finditer(contract_text, seg["start"], seg["end"]):
+            text = found.group().strip()
+            if not text:
+                continue
+            start = found.start() + found.group().index(text[0])
+            ratio = utils.devanagari_ratio(text)
+            units.append({
+                "start": start,
+                "end": start + len(text),
+                "text": text,
+                "language": "Hindi" if ratio >= config.TRANSLATION_MIN_RATIO else "English",
+            })
+    return units
+
+def language_summary(contract_text: str) -> Dict[str, int]:
+    """Number of paragraphs per language."""
+    summary = {"Hindi": 0, "English": 0}
+    for unit in language_units(contract_text):
+        summary[unit["language"]] += 1
+    return summary
+
+def apply_translations(contract_text: str, units: List[Dict[str, Any]], translations: Dict[str, str]) -> str:
+    """The text with every unit whose text has a translation replaced by it."""
+    pieces, position = [], 0
+    for unit in units:
+        translated = translations.get(unit["text"])
+        if translated:
+            pieces.append(contract_text[position:unit["start"]])
+            pieces.append(translated)
+            position = unit["end"]
+    pieces.append(contract_text[position:])
+    return "".join(pieces)
+
+class TranslationCache:
+    """
+    English translations of Hindi contract paragraphs, keyed by the hash of
+    the normalized source text, so boilerplate repeated across contracts and
+    re-analyses is only translated once.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.TRANSLATION_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = storage.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS translations (
+                hash TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def key(source_text: str) -> str:
+        return storage.content_hash(storage.normalize_text(source_text))
+
+    def get(self, source_text: str) -> Optional[str]:
+        key = self.key(source_text)
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE hash = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE translations SET hits = hits + 1 WHERE hash = ?", (key,))
+            self._conn.commit()
+        return row[0]
+
+    def put(self, source_text: str, translation: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (hash, translation, created_at) VALUES (?, ?, ?)",
+                (self.key(source_text), translation, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM translations").fetchone()
+        return {"entries": entries, "hits": hits}
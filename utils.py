@@ -1,33 +1,73 @@
 import io
+import mmap
+import os
 import re
+import threading
 import PyPDF2
 import docx
-import spacy
-from typing import Tuple
-import pandas as pd
-import streamlit as st
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+import config
+import metrics
+import segmenter
+
+# spaCy is loaded on first use, not at import, so extraction-only callers never pay for it
+_nlp = None
+_nlp_lock = threading.Lock()
+
+# Only NER is needed; skipping these components makes loading and inference much cheaper
+NLP_EXCLUDED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
 
-# Load spaCy model
-@st.cache_resource
 def load_nlp():
+    import spacy
     try:
-        return spacy.load("en_core_web_sm")
+        return spacy.load(config.SPACY_MODEL, exclude=NLP_EXCLUDED_PIPES)
     except OSError:
         # Download if not present (although usually should be pre-installed)
         from spacy.cli import download
-        download("en_core_web_sm")
-        return spacy.load("en_core_web_sm")
+        download(config.SPACY_MODEL)
+        return spacy.load(config.SPACY_MODEL, exclude=NLP_EXCLUDED_PIPES)
+
+def get_nlp():
+    """The shared NER-only spaCy pipeline, loaded once on first call."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = load_nlp()
+    return _nlp
+
+def iter_pdf_pages(source: Union[str, bytes, io.IOBase], max_pages: int = None,
+                   max_chars: int = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) one page at a time, starting at 1.
+    source may be a file path (memory-mapped, so the file is never copied into
+    memory), raw bytes, or a seekable binary file object.
+    Stops after max_pages pages or once max_chars characters have been yielded.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter_pdf_pages(mapped, max_pages=max_pages, max_chars=max_chars)
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
 
-nlp = load_nlp()
+    pdf_reader = PyPDF2.PdfReader(source)
+    remaining = max_chars
+    for page_number, page in enumerate(pdf_reader.pages, start=1):
+        if max_pages is not None and page_number > max_pages:
+            return
+        text = page.extract_text() or ""
+        if remaining is not None:
+            text = text[:remaining]
+            remaining -= len(text)
+        yield page_number, text
+        if remaining is not None and remaining <= 0:
+            return
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
     """Extract text from a PDF file."""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(text + "\n" for _, text in iter_pdf_pages(file_bytes))
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
@@ -42,27 +82,50 @@ def extract_text_from_docx(file_bytes: bytes) -> str:
     except Exception as e:
         return f"Error reading DOCX: {str(e)}"
 
+def is_extraction_error(text: str) -> bool:
+    """Whether extract_text returned one of its error messages instead of the document's text."""
+    return text.startswith(("Error reading PDF: ", "Error reading DOCX: ", "Unsupported file format."))
+
 def extract_text(file_obj) -> str:
     """Dispatcher for text extraction based on file type."""
-    if file_obj.name.lower().endswith('.pdf'):
-        return extract_text_from_pdf(file_obj.getvalue())
-    elif file_obj.name.lower().endswith('.docx'):
-        return extract_text_from_docx(file_obj.getvalue())
-    elif file_obj.name.lower().endswith('.txt'):
-        return file_obj.getvalue().decode("utf-8")
-    else:
-        return "Unsupported file format."
+    with metrics.span("extract_text"):
+        if file_obj.name.lower().endswith('.pdf'):
+            return extract_text_from_pdf(file_obj.getvalue())
+        elif file_obj.name.lower().endswith('.docx'):
+            return extract_text_from_docx(file_obj.getvalue())
+        elif file_obj.name.lower().endswith('.txt'):
+            return file_obj.getvalue().decode("utf-8", errors="replace")
+        else:
+            return "Unsupported file format."
+
+# Every byte except ASCII letters, deleted with bytes.translate to count letters at C speed
+_ASCII_NON_LETTERS = bytes(b for b in range(256) if not (65 <= b <= 90 or 97 <= b <= 122))
+
+def script_counts(text: Union[str, Iterable[str]]) -> Tuple[int, int]:
+    """
+    (Devanagari characters, Latin letters) counted in one pass, without
+    building match lists. text may be a string or an iterable of chunks (pages).
+    """
+    devanagari = latin = 0
+    for chunk in [text] if isinstance(text, str) else text:
+        if chunk.isascii():
+            latin += len(chunk.encode("ascii").translate(None, _ASCII_NON_LETTERS))
+            continue
+        for ch in chunk:
+            if "\u0900" <= ch <= "\u097f":
+                devanagari += 1
+            elif "a" <= ch <= "z" or "A" <= ch <= "Z":
+                latin += 1
+    return devanagari, latin
+
+def devanagari_ratio(text: Union[str, Iterable[str]]) -> float:
+    """Share of the script characters (Devanagari plus Latin letters) that are Devanagari."""
+    devanagari, latin = script_counts(text)
+    return devanagari / (devanagari + latin) if devanagari + latin else 0.0
 
 def detect_language(text: str) -> str:
     """Simple heuristic to detect Hindi content."""
-    # Check for Devanagari script range
-    hindi_chars = len(re.findall(r'[\u0900-\u097F]', text))
-    total_chars = len(text)
-    if total_chars == 0:
-        return "English"
-    
-    ratio = hindi_chars / total_chars
-    if ratio > 0.05: # Threshold for considering it Hindi
+    if devanagari_ratio(text) > 0.05: # Threshold for considering it Hindi
         return "Hindi"
     return "English"
 
@@ -72,28 +135,48 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
+ENTITY_LABELS = {
+    "DATE": "dates",
+    "ORG": "orgs",
+    "MONEY": "money",
+    "GPE": "gpe" # Geo-political entities (jurisdicton usually)
+}
+
+def extract_entities_batch(texts: Iterable[str], n_process: int = None, batch_size: int = None) -> List[Dict[str, List[str]]]:
+    """
+    Entity extraction for many documents with nlp.pipe.
+    Long documents are split at clause boundaries instead of being truncated,
+    and all pieces go through one pipe so n_process workers share the corpus.
+    Returns one entity dict per input text, in order.
+    """
+    pieces = []
+    results = []
+    for index, text in enumerate(texts):
+        results.append({key: [] for key in ENTITY_LABELS.values()})
+        for piece in segmenter.chunk_text(text, config.SPACY_MAX_CHARS) if text else []:
+            pieces.append((piece, index))
+
+    if not pieces:
+        return results
+
+    n_process = n_process or config.SPACY_N_PROCESS
+    if len(pieces) < 2 * config.SPACY_BATCH_SIZE:
+        n_process = 1 # Worker start-up costs more than it saves on small inputs
+    docs = get_nlp().pipe(pieces, as_tuples=True, n_process=n_process,
+                          batch_size=batch_size or config.SPACY_BATCH_SIZE)
+    for doc, index in docs:
+        for ent in doc.ents:
+            key = ENTITY_LABELS.get(ent.label_)
+            if key:
+                results[index][key].append(ent.text)
+
+    # Deduplicate, keeping first-seen order
+    for entities in results:
+        for key in entities:
+            entities[key] = list(dict.fromkeys(entities[key]))
+
+    return results
+
 def extract_entities_spacy(text: str):
     """Fallback entity extraction using spaCy if Claude fails or for augmentation."""
-    doc = nlp(text[:100000]) # Limit to avoid memory issues
-    entities = {
-        "dates": [],
-        "orgs": [],
-        "money": [],
-        "gpe": [] # Geo-political entities (jurisdicton usually)
-    }
-    
-    for ent in doc.ents:
-        if ent.label_ == "DATE":
-            entities["dates"].append(ent.text)
-        elif ent.label_ == "ORG":
-            entities["orgs"].append(ent.text)
-        elif ent.label_ == "MONEY":
-            entities["money"].append(ent.text)
-        elif ent.label_ == "GPE":
-            entities["gpe"].append(ent.text)
-            
-    # Deduplicate
-    for key in entities:
-        entities[key] = list(set(entities[key]))
-        
-    return entities
+    return extract_entities_batch([text], n_process=1)[0]